@@ -0,0 +1,222 @@
+"""
+Price alerts for large watchlists, evaluated a whole batch of ticks at a time
+
+Rules live in flat arrays (symbol, kind, level), and so does the per-symbol
+state: last price, the last 50 closes and running sums for the MA20/MA50
+lines the GUI draws. A batch of ticks updates that state with a few
+fancy-indexed NumPy operations and evaluates every rule in one go.
+
+Every rule fires on the tick where its condition turns true (an edge),
+not on every tick while it stays true. The first tick that can be
+evaluated only primes it, so a price that is already above a level when
+the rule is added is not reported as a crossing.
+
+    engine = AlertEngine(symbols)
+    engine.add_rule('AAPL', 'price_above', 200.0)
+    engine.add_rules(symbols, 'ma50_above')          # golden-cross style alert for all
+    engine.set_predictions(['AAPL'], [212.0])
+    for timestamp, index, prices in ReplayFeed(bars_by_symbol, symbols):
+        for alert in engine.describe(engine.on_ticks(index, prices)):
+            print(timestamp, alert)
+"""
+import numpy as np
+import pandas as pd
+
+# price_*: price vs level; ma20_/ma50_*: price vs that moving average;
+# change_*: predicted change in percent (set_predictions) vs level
+KINDS = ('price_above', 'price_below', 'ma20_above', 'ma20_below', 'ma50_above', 'ma50_below',
+         'change_above', 'change_below')
+_NEEDS_LEVEL = ('price', 'change')
+_HISTORY = 50
+
+
+class AlertEngine:
+    """Array-backed alert rules and tick state for a fixed list of symbols"""
+
+    def __init__(self, symbols):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+
+        self.price = np.full(n, np.nan)
+        self.predicted = np.full(n, np.nan)
+        self.history = np.zeros((n, _HISTORY))
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.sum20 = np.zeros(n)
+        self.sum50 = np.zeros(n)
+        self._positions = np.arange(n)
+
+        self.rule_symbol = np.zeros(0, dtype=np.int64)
+        self.rule_kind = np.zeros(0, dtype=np.int8)
+        self.rule_level = np.zeros(0)
+        self.rule_active = np.zeros(0, dtype=bool)
+        self.rule_state = np.zeros(0, dtype=bool)
+        self.rule_primed = np.zeros(0, dtype=bool)
+
+    def _indices(self, symbols):
+        return np.array([self.index[symbol.upper()] for symbol in symbols], dtype=np.int64)
+
+    def add_rules(self, symbols, kind, levels=None):
+        """Add one rule per symbol; returns their ids"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown alert kind: {kind}")
+        if kind.startswith(_NEEDS_LEVEL) and levels is None:
+            raise ValueError(f"{kind} needs a level")
+        index = self._indices(symbols)
+        levels = np.broadcast_to(np.nan if levels is None else np.asarray(levels, dtype=np.float64),
+                                 index.shape)
+
+        first = len(self.rule_symbol)
+        self.rule_symbol = np.concatenate([self.rule_symbol, index])
+        self.rule_kind = np.concatenate([self.rule_kind, np.full(len(index), KINDS.index(kind), dtype=np.int8)])
+        self.rule_level = np.concatenate([self.rule_level, levels])
+        self.rule_active = np.concatenate([self.rule_active, np.ones(len(index), dtype=bool)])
+        self.rule_state = np.concatenate([self.rule_state, np.zeros(len(index), dtype=bool)])
+        self.rule_primed = np.concatenate([self.rule_primed, np.zeros(len(index), dtype=bool)])
+        self._compile()
+        return np.arange(first, first + len(index))
+
+    def add_rule(self, symbol, kind, level=None):
+        return int(self.add_rules([symbol], kind, None if level is None else [level])[0])
+
+    def remove_rules(self, rule_ids):
+        self.rule_active[np.asarray(rule_ids)] = False
+
+    def _compile(self):
+        # Each rule compares two entries of the table _evaluate builds per batch:
+        # [price, predicted change, ma20, ma50] per symbol, then each rule's level
+        n, names = len(self.symbols), np.array(KINDS)[self.rule_kind]
+        self._sign = np.where(np.char.endswith(names, 'above'), 1.0, -1.0)
+        self._left = np.where(np.char.startswith(names, 'change'), n, 0) + self.rule_symbol
+        self._right = np.select([np.char.startswith(names, 'ma20'), np.char.startswith(names, 'ma50')],
+                                [2 * n + self.rule_symbol, 3 * n + self.rule_symbol],
+                                4 * n + np.arange(len(names)))
+
+    def set_predictions(self, symbols, predicted_prices):
+        """Latest forecast price per symbol, for the change_* rules"""
+        self.predicted[self._indices(symbols)] = predicted_prices
+
+    def moving_averages(self):
+        """(ma20, ma50) per symbol, NaN until there are enough ticks"""
+        ma20 = self.sum20 / 20
+        ma20[self.ticks < 20] = np.nan
+        ma50 = self.sum50 / 50
+        ma50[self.ticks < 50] = np.nan
+        return ma20, ma50
+
+    def _update(self, index, prices):
+        # Each symbol appears at most once in index
+        rows = slice(None) if len(index) == len(self.symbols) and np.array_equal(index, self._positions) else index
+        ticks = self.ticks[rows]
+        history = self.history.reshape(-1)
+        row, slot = index * _HISTORY, ticks % _HISTORY
+        # The slot about to be overwritten holds the close from 50 ticks ago
+        self.sum20[rows] += prices - np.where(ticks >= 20, history[row + (slot - 20) % _HISTORY], 0.0)
+        self.sum50[rows] += prices - np.where(ticks >= 50, history[row + slot], 0.0)
+        history[row + slot] = prices
+        self.ticks[rows] += 1
+        self.price[rows] = prices
+
+    def _evaluate(self, touched=None):
+        # Rules on symbols that just ticked (all of them when touched is None)
+        n = len(self.symbols)
+        table = np.empty(4 * n + len(self.rule_level))
+        table[:n] = self.price
+        with np.errstate(invalid='ignore', divide='ignore'):
+            np.divide(self.predicted - self.price, self.price, out=table[n:2 * n])
+        table[n:2 * n] *= 100
+        table[2 * n:3 * n], table[3 * n:4 * n] = self.moving_averages()
+        table[4 * n:] = self.rule_level
+
+        difference = table[self._left]
+        difference -= table[self._right]
+        difference *= self._sign
+        condition = difference > 0
+
+        eligible = self.rule_active if touched is None else self.rule_active & touched[self.rule_symbol]
+        fired = np.flatnonzero(condition & ~self.rule_state & self.rule_primed & eligible)
+        np.copyto(self.rule_state, condition, where=eligible)
+        self.rule_primed |= eligible & ~np.isnan(difference)
+        return fired
+
+    def on_ticks(self, index, prices):
+        """Apply a batch of ticks (symbol positions and prices); returns ids of rules that fired
+
+        A symbol may appear more than once; its ticks are applied in order.
+        """
+        index = np.asarray(index, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        touched = np.zeros(len(self.symbols), dtype=bool)
+        touched[index] = True
+        unique = np.count_nonzero(touched)
+        if unique == len(index):
+            self._update(index, prices)
+            return self._evaluate(None if unique == len(self.symbols) else touched)
+
+        # Repeated symbols: apply the ticks in rounds, first occurrences first
+        order = np.argsort(index, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(index[order]) != 0])
+        occurrence = np.empty(len(index), dtype=np.int64)
+        occurrence[order] = np.arange(len(index)) - np.repeat(starts, np.diff(np.r_[starts, len(index)]))
+        fired = []
+        for round_ in range(occurrence.max() + 1):
+            part = occurrence == round_
+            touched[:] = False
+            touched[index[part]] = True
+            self._update(index[part], prices[part])
+            fired.append(self._evaluate(touched))
+        return np.concatenate(fired)
+
+    def on_symbol_ticks(self, symbols, prices):
+        """on_ticks with symbol names instead of positions"""
+        return self.on_ticks(self._indices(symbols), prices)
+
+    def warm_up(self, closes):
+        """Seed prices and moving averages from a (symbols, bars) close history
+
+        Rules are primed from the last bar, so nothing fires for it.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        for column in closes.T:
+            present = np.flatnonzero(~np.isnan(column))
+            self._update(present, column[present])
+        self._evaluate()
+
+    def describe(self, rule_ids):
+        """Dicts for fired rules: rule, symbol, kind, level, price"""
+        return [{
+            'rule': int(rule),
+            'symbol': self.symbols[self.rule_symbol[rule]],
+            'kind': KINDS[self.rule_kind[rule]],
+            'level': None if np.isnan(self.rule_level[rule]) else float(self.rule_level[rule]),
+            'price': float(self.price[self.rule_symbol[rule]]),
+        } for rule in rule_ids]
+
+
+class ReplayFeed:
+    """Bars replayed as tick batches: one batch per timestamp, in time order
+
+    Iterating yields (timestamp, symbol positions, closes) for the symbols
+    that have a bar at that timestamp; positions follow `symbols`, so the
+    batches feed straight into AlertEngine.on_ticks. The same bars always
+    replay the same way.
+    """
+
+    def __init__(self, bars_by_symbol, symbols=None, column='Close'):
+        self.symbols = list(symbols or bars_by_symbol)
+        closes = pd.concat({symbol: bars_by_symbol[symbol][column] for symbol in self.symbols}, axis=1)
+        self.timestamps = closes.index
+        self.closes = closes.to_numpy(dtype=np.float64)
+
+    @classmethod
+    def from_store(cls, store, symbols, start, end):
+        """Replay bars from a BarStore (e.g. one with a SyntheticSource or LocalFileSource)"""
+        return cls({symbol: store.get(symbol, start, end) for symbol in symbols}, symbols)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        for timestamp, row in zip(self.timestamps, self.closes):
+            present = np.flatnonzero(~np.isnan(row))
+            yield timestamp, present, row[present]
@@ -0,0 +1,190 @@
+"""
+Walk-forward backtest over rolling forecast origins
+
+At every origin the model is refit on the rows before it and forecasts
+`horizon` days ahead, for every symbol at once. The refits are not done
+from scratch: the normal-equation sums X'X and X'y only change by the
+rows that enter (and, with a window, leave) between origins, so they are
+carried forward as running sums and all origins in a chunk are solved as
+one batch. Forecasts for every (symbol, origin) pair go through
+forecast_linear together.
+
+    predictions, actuals, origins = walk_forward(features_list, horizon=30)
+    table = horizon_metrics(predictions, actuals, symbols)
+"""
+import numpy as np
+import pandas as pd
+
+from forecast import FEATURE_COLUMNS, forecast_linear
+
+
+def _stack(features_list, feature_names):
+    """(S, T, k) features and (S, T) prices, zero padded, plus real lengths"""
+    lengths = np.array([len(f) for f in features_list])
+    n_rows = lengths.max()
+    X = np.zeros((len(features_list), n_rows, len(feature_names)))
+    price = np.zeros((len(features_list), n_rows))
+    for i, features in enumerate(features_list):
+        X[i, :lengths[i]] = features[list(feature_names)].to_numpy(dtype=np.float64)
+        price[i, :lengths[i]] = features['price'].to_numpy(dtype=np.float64)
+    return X, price, lengths
+
+
+def _standardize(X, lengths):
+    """Intercept column plus standardized, decorrelated features
+
+    Only a preconditioner: a regression with an intercept gives the same
+    fit on shifted, rescaled and rotated columns, so using every row here
+    leaks nothing. Directions a symbol never varies in (e.g. high and low
+    always a fixed multiple of each other) are dropped, which gives the
+    minimum-norm fit instead of an arbitrary one.
+    Returns (aug, mean, scale, rotation, dead) where dead marks dropped columns.
+    """
+    mask = (np.arange(X.shape[1]) < lengths[:, None])[:, :, None]
+    mean = (X * mask).sum(axis=1) / lengths[:, None]
+    scale = np.sqrt((((X - mean[:, None]) * mask) ** 2).sum(axis=1) / lengths[:, None])
+    scale[scale == 0] = 1.0
+    Z = (X - mean[:, None]) / scale[:, None] * mask
+
+    _, singular, vt = np.linalg.svd(Z, full_matrices=False)
+    dead = singular <= singular[:, :1] * 1e-8
+    rotation = vt.transpose(0, 2, 1) * ~dead[:, None, :]
+
+    ones = mask.astype(np.float64)
+    return np.concatenate([ones, np.matmul(Z, rotation)], axis=2), mean, scale, rotation, dead
+
+
+class _RunningSums:
+    """Sum of left[:, i]' right[:, i] over rows i < stop, for increasing stops"""
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.position = 0
+        self.total = np.zeros((left.shape[0], left.shape[2], right.shape[2]))
+
+    def at(self, stops):
+        """(S, len(stops), p, q) sums; stops must not go backwards"""
+        start, end = self.position, stops[-1]
+        products = np.einsum('sti,stj->stij', self.left[:, start:end], self.right[:, start:end])
+        running = np.concatenate([self.total[:, None], self.total[:, None] + np.cumsum(products, axis=1)],
+                                 axis=1)
+        self.position, self.total = end, running[:, -1]
+        return running[:, stops - start]
+
+
+def _solve(gram, rhs):
+    try:
+        return np.linalg.solve(gram, rhs)
+    except np.linalg.LinAlgError:
+        # A singular window somewhere, fall back to the SVD solve
+        return np.matmul(np.linalg.pinv(gram), rhs)
+
+
+def walk_forward(features_list, horizon=30, min_train=120, step=1, window=None, mode='recursive',
+                 feature_names=FEATURE_COLUMNS, chunk_values=4_000_000):
+    """Refit and forecast at every `step`-th row of every symbol
+
+    Each origin o trains on the rows whose targets are known by day o (the
+    last `window` of them, or all), then forecasts days o+1..o+horizon, as
+    train_model/predict_future_prices would in the given mode.
+
+    Returns (predictions, actuals, origins): predictions and actuals are
+    (symbols, origins, horizon) arrays, NaN where a symbol's history does
+    not reach that origin, and origins are the row positions.
+    """
+    if mode not in ('recursive', 'direct'):
+        raise ValueError(f"Unknown mode: {mode}")
+    names = list(feature_names)
+    X, price, lengths = _stack(features_list, names)
+    n_symbols, n_rows, n_features = X.shape
+
+    # Rows i < end(o) are trainable at origin o: their targets price[i+lag] are known
+    lag = 1 if mode == 'recursive' else horizon
+    first = max(min_train + lag - 1, (window or 0) + lag - 1)
+    origins = np.arange(first, n_rows - horizon, step)
+    predictions = np.full((n_symbols, len(origins), horizon), np.nan)
+    actuals = np.full((n_symbols, len(origins), horizon), np.nan)
+    if len(origins) == 0:
+        return predictions, actuals, origins
+
+    # Targets: the next price, or the next `horizon` prices for a direct model
+    future = np.lib.stride_tricks.sliding_window_view(price[:, 1:], horizon, axis=1)
+    target = np.zeros((n_symbols, n_rows, 1 if mode == 'recursive' else horizon))
+    target[:, :future.shape[1]] = future[:, :, :target.shape[2]]
+
+    aug, mean, scale, rotation, dead = _standardize(X, lengths)
+    grams = _RunningSums(aug, aug)
+    moments = _RunningSums(aug, target)
+    if window:
+        old_grams = _RunningSums(aug, aug)
+        old_moments = _RunningSums(aug, target)
+
+    # Bound the temporary (symbols, rows, p, q) products of each chunk
+    width = aug.shape[2] * max(aug.shape[2], target.shape[2])
+    per_chunk = max(1, chunk_values // (n_symbols * width * step))
+    eye = np.eye(aug.shape[2])
+    for c in range(0, len(origins), per_chunk):
+        chunk_origins = origins[c:c + per_chunk]
+        ends = chunk_origins - lag + 1
+        gram = grams.at(ends)
+        rhs = moments.at(ends)
+        if window:
+            gram = gram - old_grams.at(ends - window)
+            rhs = rhs - old_moments.at(ends - window)
+
+        # Only symbols whose history covers origin + horizon; the rest get a dummy
+        # system, as do dropped columns (their coefficient comes out as zero)
+        valid = chunk_origins[None, :] + horizon < lengths[:, None]
+        gram[~valid] = eye
+        gram[:, :, 1:, 1:] += dead[:, None, None, :] * eye[1:, 1:]
+
+        # Back from rotated, standardized columns to raw feature coefficients
+        beta = _solve(gram, rhs)
+        coef = np.matmul(rotation[:, None], beta[:, :, 1:]) / scale[:, None, :, None]
+        intercept = beta[:, :, 0] - np.einsum('sokq,sk->soq', coef, mean)
+
+        s, o = np.nonzero(valid)
+        rows = X[s, chunk_origins[o]]
+        if mode == 'recursive':
+            paths = forecast_linear(coef[s, o, :, 0], intercept[s, o, 0], rows, price[s, chunk_origins[o]],
+                                    horizon, names)
+        else:
+            paths = np.matmul(rows[:, None, :], coef[s, o])[:, 0] + intercept[s, o]
+        predictions[s, c + o] = paths
+        actuals[s, c + o] = future[s, chunk_origins[o]]
+
+    return predictions, actuals, origins
+
+
+def horizon_metrics(predictions, actuals, symbols=None):
+    """Tidy per-symbol, per-horizon errors: symbol, horizon, n, mae, rmse, mape"""
+    n_symbols, _, horizon = predictions.shape
+    if symbols is None:
+        symbols = list(range(n_symbols))
+
+    error = predictions - actuals
+    n = np.sum(~np.isnan(error), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = np.nansum(np.abs(error), axis=1) / n
+        rmse = np.sqrt(np.nansum(error ** 2, axis=1) / n)
+        mape = np.nansum(np.abs(error / actuals), axis=1) / n * 100
+
+    return pd.DataFrame({
+        'symbol': np.repeat(np.asarray(symbols, dtype=object), horizon),
+        'horizon': np.tile(np.arange(1, horizon + 1), n_symbols),
+        'n': n.ravel(),
+        'mae': mae.ravel(),
+        'rmse': rmse.ravel(),
+        'mape': mape.ravel(),
+    })
+
+
+def backtest(bars_by_symbol, horizon=30, **kwargs):
+    """Walk-forward errors for {symbol: bars}; kwargs go to walk_forward"""
+    from prediction import prepare_features_many
+
+    symbols = list(bars_by_symbol)
+    features_list = prepare_features_many([bars_by_symbol[symbol] for symbol in symbols])
+    predictions, actuals, _ = walk_forward(features_list, horizon, **kwargs)
+    return horizon_metrics(predictions, actuals, symbols)
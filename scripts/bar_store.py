@@ -0,0 +1,227 @@
+"""
+Local on-disk store for daily OHLCV bars
+
+Each symbol is kept as one NumPy file per column so a repeat request only
+needs to download the days that are missing at the end (or start) of what
+is already on disk.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metrics import count
+
+COLUMNS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+
+def _empty_frame():
+    data = pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+    return data.astype({col: 'float64' for col in COLUMNS})
+
+
+def exchange_now():
+    """Current New York wall-clock time, the time zone the bars are stored in"""
+    return pd.Timestamp.now(tz='America/New_York').tz_localize(None)
+
+
+def has_trading_days(start, end):
+    """Whether [start, end) holds a weekday, i.e. a fetch of it should return bars"""
+    return len(pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))) > 0
+
+
+def _normalize_day(value):
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_localize(None)
+    return value.normalize()
+
+
+class YahooSource:
+    """Downloads bars from Yahoo Finance
+
+    Download errors and rate limits raise instead of returning an empty
+    frame, so the stores never record a failed request as fetched.
+    """
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        import yfinance as yf
+
+        data = yf.Ticker(symbol).history(start=start, end=end, interval=interval, raise_errors=True)
+
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = [col[0] for col in data.columns.values]
+
+        return data
+
+
+class LocalFileSource:
+    """Reads bars from <directory>/<SYMBOL>.csv, e.g. files saved with DataFrame.to_csv
+
+    Intraday bars come from <directory>/<SYMBOL>_<interval>.csv (e.g.
+    AAPL_5m.csv), read in pieces so only the requested range is kept.
+    """
+
+    def __init__(self, directory, chunksize=100_000):
+        self.directory = directory
+        self.chunksize = chunksize
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        name = symbol if interval == '1d' else f"{symbol}_{interval}"
+        path = os.path.join(self.directory, f"{name}.csv")
+        if not os.path.exists(path):
+            return _empty_frame()
+
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if interval == '1d':
+            pieces = [pd.read_csv(path, index_col=0, parse_dates=True)]
+        else:
+            pieces = pd.read_csv(path, index_col=0, parse_dates=True, chunksize=self.chunksize)
+        kept = []
+        for data in pieces:
+            data.index.name = 'Date'
+            kept.append(data.loc[(data.index >= start) & (data.index < end)])
+        return pd.concat(kept) if len(kept) > 1 else kept[0]
+
+
+class BarStore:
+    """Columnar bar cache that tops itself up from a data source
+
+    Coverage never runs past today (today's bar is fetched again until the
+    day is over) and never moves past a window that came back empty although
+    it held weekdays, so a failed download is retried on the next request.
+    clock returns the current exchange time (tests pass a fixed one).
+    """
+
+    def __init__(self, root, source=None, clock=exchange_now):
+        self.root = root
+        self.source = source if source is not None else YahooSource()
+        self.clock = clock
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, symbol):
+        # One lock per symbol so different symbols can download in parallel
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.root, symbol.upper())
+
+    def load(self, symbol):
+        """Return (bars, meta) for everything stored for symbol"""
+        path = self._symbol_dir(symbol)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return _empty_frame(), None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        index = pd.DatetimeIndex(np.load(os.path.join(path, 'dates.npy')), name='Date')
+        data = pd.DataFrame(
+            {col: np.load(os.path.join(path, f"{col}.npy")) for col in COLUMNS},
+            index=index)
+        return data, meta
+
+    def save(self, symbol, data, meta):
+        path = self._symbol_dir(symbol)
+        os.makedirs(path, exist_ok=True)
+
+        columns = {'dates': data.index.values.astype('datetime64[ns]')}
+        for col in COLUMNS:
+            columns[col] = data[col].to_numpy()
+
+        # Write to temporary files first so readers never see half a symbol
+        for name, values in columns.items():
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, values)
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+        tmp = os.path.join(path, 'meta.tmp.json')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+    def _fetch(self, symbol, start, end):
+        data = self.source.fetch(symbol, start.to_pydatetime(), end.to_pydatetime())
+        if data is None or len(data) == 0:
+            return _empty_frame()
+
+        data = data[COLUMNS].copy()
+        dates = pd.DatetimeIndex(data.index).tz_localize(None)
+        data.index = pd.DatetimeIndex(dates.values.astype('datetime64[ns]'), name='Date')
+        return data
+
+    def get(self, symbol, start, end):
+        """Return bars in [start, end), downloading only the days not on disk"""
+        symbol = symbol.upper()
+        start = _normalize_day(start)
+        end = _normalize_day(end)
+
+        with self._lock(symbol):
+            stored, meta = self.load(symbol)
+            # Days before today are complete
+            today = _normalize_day(self.clock())
+
+            if meta is None:
+                count('bar_cache', 'miss', symbol)
+                data = self._fetch(symbol, start, end)
+                if len(data) == 0:
+                    return data
+                meta = {'fetched_from': str(start.date()), 'fetched_to': str(max(min(end, today), start).date())}
+                stored = data
+                self.save(symbol, stored, meta)
+            else:
+                fetched_from = pd.Timestamp(meta['fetched_from'])
+                fetched_to = pd.Timestamp(meta['fetched_to'])
+                pieces = [stored]
+
+                # Missing days before what we have
+                if start < fetched_from:
+                    data = self._fetch(symbol, start, fetched_from)
+                    pieces.insert(0, data)
+                    if len(data) or not has_trading_days(start, fetched_from):
+                        meta['fetched_from'] = str(start.date())
+
+                # Missing trailing days
+                if end > fetched_to:
+                    data = self._fetch(symbol, fetched_to, end)
+                    pieces.append(data)
+                    if len(data) or not has_trading_days(fetched_to, min(end, today)):
+                        meta['fetched_to'] = str(max(min(end, today), fetched_to).date())
+
+                count('bar_cache', 'topup' if len(pieces) > 1 else 'hit', symbol)
+                if len(pieces) > 1:
+                    pieces = [piece for piece in pieces if len(piece) > 0]
+                    stored = pd.concat(pieces)
+                    stored = stored[~stored.index.duplicated(keep='last')].sort_index()
+                    self.save(symbol, stored, meta)
+
+        mask = (stored.index >= start) & (stored.index < end)
+        return stored.loc[mask].copy()
+
+
+def default_store_dir():
+    return os.environ.get(
+        'STOCK_PREDICTOR_DATA_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'stock_predictor', 'bars'))
+
+
+_default_store = None
+
+
+def get_default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = BarStore(default_store_dir())
+    return _default_store
+
+
+def set_default_store(store):
+    """Swap the store used by get_stock_data, e.g. for a LocalFileSource"""
+    global _default_store
+    _default_store = store
+
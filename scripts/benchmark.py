@@ -0,0 +1,394 @@
+"""
+Benchmarks for the prediction pipeline on synthetic, offline data
+
+Times prepare_features, train_model and predict_future_prices across
+history lengths (one symbol) and across symbol counts (250 bars each),
+plus the NumPy indicator kernels and feature registry against pandas,
+recursive vs direct forecasting, the Monte Carlo confidence band, the
+walk-forward backtest, the alert engine, the portfolio covariance and the
+chart pyramid. Saves the results as JSON and flags
+regressions against a baseline. --memory also reports the peak memory
+of building features as DataFrames vs compact float32 blocks, and of
+training on a minute history loaded whole vs streamed in chunks.
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json      # compare a later run
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from features import FeatureTable, FEATURE_SETS
+from prediction import prepare_features, prepare_features_many, train_model, predict_future_prices
+from regression import train_models_batch
+from simulation import confidence_band
+from backtest import walk_forward
+from alerts import AlertEngine, ReplayFeed
+from portfolio import ShrinkageCovariance, min_variance_weights
+from pyramid import BarPyramid
+from synthetic import generate_bars, generate_universe
+
+HISTORY_SIZES = [250, 2_500, 25_000, 250_000, 1_000_000]
+SYMBOL_COUNTS = [1, 10, 100, 1_000]
+PREDICTION_DAYS = 30
+SECTIONS = ['history', 'symbols', 'indicators', 'feature_sets', 'modes', 'bands', 'backtest', 'alerts',
+            'portfolio', 'pyramid']
+
+
+def best_time(fn, repeat):
+    """Best of `repeat` runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(fn):
+    """(peak, retained) bytes allocated while running fn"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+def bench_memory(n_symbols=500, n_bars=2_500):
+    """Peak and retained MiB for features (and training) of a universe"""
+    universe = list(generate_universe(n_symbols, n_bars).values())
+    runs = {
+        'pandas': lambda: [prepare_features(data) for data in universe],
+        'frames': lambda: prepare_features_many(universe),
+        'compact': lambda: prepare_features_many(universe, compact=True),
+        'frames+train': lambda: [train_model(f) for f in prepare_features_many(universe)],
+        'compact+train': lambda: [train_model(f) for f in prepare_features_many(universe, compact=True)],
+    }
+    results = {}
+    for name, fn in runs.items():
+        peak, retained = peak_memory(fn)
+        results[f"memory/{name}/symbols={n_symbols}"] = (peak / 2 ** 20, retained / 2 ** 20)
+    return results
+
+
+def bench_intraday_memory(days=250, interval='1m', chunk_bars=50_000):
+    """Peak and retained MiB for training on an intraday history, whole vs chunked"""
+    from intraday import ChunkedFeatures, IntradayStore, StreamingTrainer
+    from synthetic import SyntheticSource
+
+    start = pd.Timestamp('2024-01-01')
+    end = start + pd.Timedelta(days=days)
+    with tempfile.TemporaryDirectory() as root:
+        store = IntradayStore(root, SyntheticSource())
+        n_bars = store.ingest('AAA', start, end, interval)
+
+        def chunked():
+            features = ChunkedFeatures()
+            trainer = StreamingTrainer(n_bars - 20)
+            for chunk in store.iter_chunks('AAA', start, end, interval, chunk_bars):
+                trainer.update(features.update(chunk))
+            return trainer
+
+        runs = {
+            'whole': lambda: train_model(prepare_features(store.get('AAA', start, end, interval, max_bars=None))),
+            'chunked': chunked,
+        }
+        results = {}
+        for name, fn in runs.items():
+            peak, retained = peak_memory(fn)
+            results[f"memory/intraday/{name}/bars={n_bars}"] = (peak / 2 ** 20, retained / 2 ** 20)
+    return results
+
+
+def bench_history(sizes, repeat):
+    results = {}
+    for n_bars in sizes:
+        # A million business days would run past the year 2262, so long histories use minute bars
+        data = generate_bars(n_bars, seed=n_bars, freq='B' if n_bars <= 25_000 else 'min')
+        features = prepare_features(data)
+        model, _, names = train_model(features)
+
+        results[f"prepare_features/bars={n_bars}"] = best_time(lambda: prepare_features(data), repeat)
+        results[f"train_model/bars={n_bars}"] = best_time(lambda: train_model(features), repeat)
+        results[f"predict_future_prices/bars={n_bars}"] = best_time(
+            lambda: predict_future_prices(model, features, names, PREDICTION_DAYS), repeat)
+    return results
+
+
+def bench_symbols(counts, repeat, n_bars=250):
+    results = {}
+    for n_symbols in counts:
+        universe = list(generate_universe(n_symbols, n_bars).values())
+        features_list = [prepare_features(data) for data in universe]
+        fits = [train_model(features) for features in features_list]
+
+        def predict_all():
+            for features, (model, _, names) in zip(features_list, fits):
+                predict_future_prices(model, features, names, PREDICTION_DAYS)
+
+        results[f"prepare_features/symbols={n_symbols}"] = best_time(
+            lambda: [prepare_features(data) for data in universe], repeat)
+        results[f"prepare_features_many/symbols={n_symbols}"] = best_time(
+            lambda: prepare_features_many(universe), repeat)
+        results[f"train_model/symbols={n_symbols}"] = best_time(
+            lambda: [train_model(features) for features in features_list], repeat)
+        results[f"train_models_batch/symbols={n_symbols}"] = best_time(
+            lambda: train_models_batch(features_list), repeat)
+        results[f"predict_future_prices/symbols={n_symbols}"] = best_time(predict_all, repeat)
+    return results
+
+
+def bench_indicators(repeat, n_symbols=100, n_bars=2_500):
+    """Each indicator kernel over a (symbols, bars) array vs pandas one symbol at a time"""
+    universe = list(generate_universe(n_symbols, n_bars).values())
+    close = np.vstack([data['Close'].to_numpy() for data in universe])
+    high = np.vstack([data['High'].to_numpy() for data in universe])
+    low = np.vstack([data['Low'].to_numpy() for data in universe])
+    series = [data['Close'] for data in universe]
+
+    def pandas_atr():
+        for data in universe:
+            previous = data['Close'].shift()
+            true_range = pd.concat([data['High'] - data['Low'], (data['High'] - previous).abs(),
+                                    (data['Low'] - previous).abs()], axis=1).max(axis=1)
+            true_range.ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+
+    def pandas_rsi():
+        for s in series:
+            delta = s.diff()
+            gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+            loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+            100 - 100 / (1 + gain / loss)
+
+    kernels = {
+        'sma': (lambda: indicators.sma(close, 20), lambda: [s.rolling(20).mean() for s in series]),
+        'ema': (lambda: indicators.ema(close, span=12), lambda: [s.ewm(span=12, adjust=False).mean() for s in series]),
+        'rolling_std': (lambda: indicators.rolling_std(close, 20), lambda: [s.rolling(20).std() for s in series]),
+        'pct_change': (lambda: indicators.pct_change(close), lambda: [s.pct_change() for s in series]),
+        'rsi': (lambda: indicators.rsi(close), pandas_rsi),
+        'bollinger': (lambda: indicators.bollinger(close),
+                      lambda: [(s.rolling(20).mean(), s.rolling(20).std()) for s in series]),
+        'atr': (lambda: indicators.atr(high, low, close), pandas_atr),
+    }
+    results = {}
+    for name, (numpy_fn, pandas_fn) in kernels.items():
+        results[f"indicator/{name}/numpy/symbols={n_symbols}"] = best_time(numpy_fn, repeat)
+        results[f"indicator/{name}/pandas/symbols={n_symbols}"] = best_time(pandas_fn, repeat)
+    return results
+
+
+def bench_feature_sets(repeat, n_symbols=100, n_bars=2_500):
+    """Features for two model families: pandas per symbol and model vs one shared FeatureTable"""
+    universe = list(generate_universe(n_symbols, n_bars).values())
+
+    def pandas_notebook(data):
+        df = pd.DataFrame(index=data.index)
+        df['price'] = data['Close']
+        df['volume'] = data['Volume']
+        df['price_change'] = data['Close'].pct_change()
+        df['volume_change'] = data['Volume'].pct_change()
+        df['ma5'] = data['Close'].rolling(5).mean()
+        df['ma20'] = data['Close'].rolling(20).mean()
+        df['volatility'] = df['price_change'].rolling(20).std()
+        return df.dropna()
+
+    def shared_table():
+        table = FeatureTable(universe)
+        table.frames(FEATURE_SETS['linear'])
+        table.frames(FEATURE_SETS['notebook'])
+
+    return {
+        f"feature_sets/pandas/symbols={n_symbols}": best_time(
+            lambda: [(prepare_features(data), pandas_notebook(data)) for data in universe], repeat),
+        f"feature_sets/registry/symbols={n_symbols}": best_time(shared_table, repeat),
+    }
+
+
+def bench_modes(repeat, n_bars=2_500, horizons=(30, 252)):
+    """Recursive next-day model vs direct multi-horizon model, train and serve"""
+    features = prepare_features(generate_bars(n_bars, seed=2))
+    results = {}
+    for days in horizons:
+        for mode in ('recursive', 'direct'):
+            model, _, names = train_model(features, mode, days)
+            results[f"train_model/mode={mode}/days={days}"] = best_time(
+                lambda: train_model(features, mode, days), repeat)
+            results[f"predict_future_prices/mode={mode}/days={days}"] = best_time(
+                lambda: predict_future_prices(model, features, names, days), repeat)
+    return results
+
+
+def bench_backtest(repeat, n_symbols=10, n_bars=1_000, horizon=30):
+    """Walk-forward refit at every origin, both modes"""
+    features_list = [prepare_features(data) for data in generate_universe(n_symbols, n_bars).values()]
+    return {f"walk_forward/mode={mode}/symbols={n_symbols}/bars={n_bars}": best_time(
+        lambda: walk_forward(features_list, horizon, mode=mode), repeat)
+        for mode in ('recursive', 'direct')}
+
+
+def bench_bands(repeat, n_paths=10_000, horizons=(30, 252)):
+    data = generate_bars(500, seed=1)
+    features = prepare_features(data)
+    model, _, names = train_model(features)
+    return {f"confidence_band/paths={n_paths}/days={days}": best_time(
+        lambda: confidence_band(model, features, names, days, n_paths, seed=0), repeat)
+        for days in horizons}
+
+
+def bench_alerts(repeat, n_symbols=5_000, n_bars=60):
+    """One tick batch for a whole watchlist with four rules per symbol"""
+    universe = generate_universe(n_symbols, n_bars)
+    symbols = list(universe)
+    engine = AlertEngine(symbols)
+    engine.add_rules(symbols, 'ma20_above')
+    engine.add_rules(symbols, 'ma50_below')
+    engine.add_rules(symbols, 'price_above', [bars['Close'].iloc[0] * 1.1 for bars in universe.values()])
+    engine.add_rules(symbols, 'change_above', 5.0)
+    engine.set_predictions(symbols, [bars['Close'].iloc[-1] * 1.05 for bars in universe.values()])
+    batches = list(ReplayFeed(universe))
+    for _, index, prices in batches:
+        engine.on_ticks(index, prices)
+
+    _, index, prices = batches[-1]
+    return {f"alerts/on_ticks/symbols={n_symbols}": best_time(lambda: engine.on_ticks(index, prices), repeat * 10)}
+
+
+def bench_portfolio(repeat, n_assets=3_000, n_days=500):
+    """A new day of returns: pandas .cov() rebuild vs incremental shrunk covariance"""
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.0005, 0.02, (n_days + 1, n_assets)) + rng.normal(0, 0.01, (n_days + 1, 1))
+    estimate = ShrinkageCovariance(n_assets)
+    estimate.update(returns[:n_days])
+    out = np.empty((n_assets, n_assets))
+
+    def incremental():
+        # Slide the window forward one day and back again, so every repeat starts the same
+        estimate.update(returns[n_days:])
+        estimate.downdate(returns[:1])
+        estimate.covariance(out)
+        estimate.update(returns[:1])
+        estimate.downdate(returns[n_days:])
+
+    return {
+        f"portfolio/pandas_cov/assets={n_assets}": best_time(
+            lambda: pd.DataFrame(returns[1:]).cov(), repeat),
+        f"portfolio/incremental_shrunk_cov/assets={n_assets}": best_time(incremental, repeat),
+        f"portfolio/min_variance/assets={n_assets}": best_time(lambda: min_variance_weights(out), repeat),
+    }
+
+
+def bench_pyramid(repeat, n_bars=1_000_000, max_points=1_000):
+    """A chart refresh: rolling MAs and stats over raw bars vs a BarPyramid view and summary"""
+    bars = generate_bars(n_bars + 1, seed=1, freq='min')
+    history, new_bar = bars.iloc[:-1], bars.iloc[-1:]
+    pyramid = BarPyramid(history, interval='1m')
+
+    def raw():
+        data = history.copy()
+        data['MA20'] = data['Close'].rolling(window=20).mean()
+        data['MA50'] = data['Close'].rolling(window=50).mean()
+        return data['Close'].iloc[-1] / data['Close'].iloc[0], data['Volume'].mean()
+
+    return {
+        f"pyramid/raw_refresh/bars={n_bars}": best_time(raw, repeat),
+        f"pyramid/view_and_summary/bars={n_bars}": best_time(
+            lambda: (pyramid.view(max_points=max_points), pyramid.summary()), repeat),
+        # The same bar every time, so each repeat replaces it instead of growing the history
+        f"pyramid/update_one_bar/bars={n_bars}": best_time(lambda: pyramid.update(new_bar), repeat),
+    }
+
+
+def run_benchmarks(sizes=HISTORY_SIZES, counts=SYMBOL_COUNTS, repeat=3, sections=SECTIONS):
+    runs = {
+        'history': lambda: bench_history(sizes, repeat),
+        'symbols': lambda: bench_symbols(counts, repeat),
+        'indicators': lambda: bench_indicators(repeat),
+        'feature_sets': lambda: bench_feature_sets(repeat),
+        'modes': lambda: bench_modes(repeat),
+        'bands': lambda: bench_bands(repeat),
+        'backtest': lambda: bench_backtest(repeat),
+        'alerts': lambda: bench_alerts(repeat),
+        'portfolio': lambda: bench_portfolio(repeat),
+        'pyramid': lambda: bench_pyramid(repeat),
+    }
+    results = {}
+    for section in sections:
+        results.update(runs[section]())
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, min_seconds=0.001):
+    """Return [(name, baseline, current)] for timings more than tolerance slower
+
+    Timings under min_seconds in both runs are ignored as noise.
+    """
+    regressions = []
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None or max(before, seconds) < min_seconds:
+            continue
+        if seconds > before * (1 + tolerance):
+            regressions.append((name, before, seconds))
+    return regressions
+
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timings': results,
+        }, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['timings']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=HISTORY_SIZES)
+    parser.add_argument('--symbols', type=int, nargs='+', default=SYMBOL_COUNTS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS, default=SECTIONS)
+    parser.add_argument('--memory', action='store_true', help='also report peak memory of the feature modes')
+    parser.add_argument('--output', help='write timings to this JSON file')
+    parser.add_argument('--baseline', help='JSON file from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown before flagging, e.g. 0.25 = 25%%')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.symbols, args.repeat, args.sections)
+    for name, seconds in results.items():
+        print(f"{name:45s} {seconds * 1000:10.2f} ms")
+    if args.memory:
+        for name, (peak, retained) in {**bench_memory(), **bench_intraday_memory()}.items():
+            print(f"{name:45s} {peak:10.1f} MiB peak {retained:10.1f} MiB kept")
+
+    if args.output:
+        save_results(args.output, results)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, load_results(args.baseline), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
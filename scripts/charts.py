@@ -0,0 +1,220 @@
+"""
+Price chart for the GUI that keeps one figure and canvas for its lifetime
+
+Every refresh only swaps line data (set_data) and, when the axes limits
+have not moved, blits the changed lines over a cached background instead
+of redrawing the whole figure. Long series are downsampled to about one
+point per pixel and re-sampled from the full data when the user zooms (scroll
+wheel, or the toolbar from toolbar()). With a BarPyramid, zooming instead
+reads the visible range from the pyramid level that fits the canvas.
+"""
+import matplotlib.dates as mdates
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from downsample import lttb, visible_slice
+
+HISTORY_DAYS = 60
+# Share of the view one scroll step keeps when zooming in
+ZOOM_STEP = 0.8
+
+
+class PriceChart:
+    def __init__(self, master=None, canvas_factory=None, figsize=(10, 6)):
+        # A plain Figure is not tracked by pyplot, so nothing piles up in memory
+        self.figure = Figure(figsize=figsize, layout='tight')
+        self.ax = self.figure.add_subplot()
+        self.ax.xaxis_date()
+        self.ax.tick_params(axis='x', labelrotation=45)
+        self.ax.set_xlabel('Date')
+        self.ax.set_ylabel('Price ($)')
+        self.ax.grid(True, alpha=0.3)
+
+        if canvas_factory is None:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.canvas = FigureCanvasTkAgg(self.figure, master)
+        else:
+            self.canvas = canvas_factory(self.figure)
+
+        # Artists are created once and animated so the cached background leaves them out
+        self.lines = {
+            'price': self.ax.plot([], [], linewidth=2, color='blue', animated=True)[0],
+            'ma20': self.ax.plot([], [], alpha=0.7, color='orange', animated=True)[0],
+            'ma50': self.ax.plot([], [], alpha=0.7, color='green', animated=True)[0],
+            'prediction': self.ax.plot([], [], linewidth=2, color='red', linestyle='--',
+                                       animated=True)[0],
+        }
+        self.series = {}
+        self.pyramid = None
+        self.band = None
+        self.background = None
+        self._legend_key = None
+        self._autoscaling = False
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('scroll_event', self._on_scroll)
+        self.ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+        # Animated lines are left out of savefig, so the toolbar's Save goes through ours
+        self._savefig = self.figure.savefig
+        self.figure.savefig = self.savefig
+
+    def widget(self):
+        return self.canvas.get_tk_widget()
+
+    def toolbar(self, master):
+        """Pan/zoom/save toolbar for the Tk canvas, for the caller to pack"""
+        from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
+        toolbar = NavigationToolbar2Tk(self.canvas, master, pack_toolbar=False)
+        toolbar.update()
+        return toolbar
+
+    def savefig(self, *args, **kwargs):
+        """Figure.savefig with the lines and band in the file"""
+        artists = self._artists()
+        for artist in artists:
+            artist.set_animated(False)
+        try:
+            return self._savefig(*args, **kwargs)
+        finally:
+            for artist in artists:
+                artist.set_animated(True)
+            self.canvas.draw_idle()
+
+    def _set_line(self, name, x=None, y=None, label=None):
+        line = self.lines[name]
+        if x is None:
+            self.series.pop(name, None)
+            line.set_data([], [])
+            line.set_visible(False)
+            line.set_label('_hidden')
+        else:
+            # Keep the full resolution series; the line only gets what fits on screen
+            self.series[name] = (np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+            self._resample(name)
+            line.set_visible(True)
+            line.set_label(label)
+
+    def _target_points(self):
+        return max(int(self.ax.bbox.width), 100)
+
+    def _resample(self, name, view=None):
+        x, y = self.series[name]
+        if view is not None:
+            start, end = visible_slice(x, *view)
+            x, y = x[start:end], y[start:end]
+        keep = lttb(x, y, self._target_points())
+        self.lines[name].set_data(x[keep], y[keep])
+
+    def _on_xlim_changed(self, ax):
+        # Zoom or pan: re-sample the visible range at full resolution
+        if self._autoscaling or not self.series:
+            return
+        view = ax.get_xlim()
+        if self.pyramid is not None:
+            self._history_lines(self._pyramid_view(view))
+        else:
+            for name in self.series:
+                self._resample(name, view)
+        self.canvas.draw_idle()
+
+    def _on_scroll(self, event):
+        # Zoom the dates around the pointer; xlim_changed re-samples
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        scale = ZOOM_STEP if event.button == 'up' else 1 / ZOOM_STEP
+        left, right = self.ax.get_xlim()
+        self.ax.set_xlim(event.xdata - (event.xdata - left) * scale, event.xdata + (right - event.xdata) * scale)
+
+    def _pyramid_view(self, view):
+        start, end = (pd.Timestamp(d).tz_localize(None) for d in mdates.num2date(view))
+        # One row either side of the view, so the lines run to the edges
+        return self.pyramid.view(start, end, self._target_points(), pad=1)
+
+    def _history_lines(self, data):
+        x = mdates.date2num(data.index)
+        self._set_line('price', x, data['Close'], 'Stock Price')
+        self._set_line('ma20', x, data['MA20'], '20-day Average')
+        self._set_line('ma50', x, data['MA50'], '50-day Average')
+
+    def set_band(self, x=None, lower=None, upper=None, label='Confidence Band'):
+        """Replace the shaded band around the prediction (None removes it)"""
+        if self.band is not None:
+            self.band.remove()
+            self.band = None
+        if x is not None:
+            self.band = self.ax.fill_between(x, lower, upper, color='red', alpha=0.2,
+                                             label=label, animated=True)
+
+    def show_history(self, data, pyramid=None):
+        """Plot Close/MA20/MA50; with a pyramid, zooming reads the matching level from it"""
+        self.pyramid = pyramid
+        self._history_lines(data)
+        self._set_line('prediction')
+        self.set_band()
+        self.refresh('Stock Price Analysis')
+
+    def show_prediction(self, data, predictions, future_dates, lower=None, upper=None):
+        self.pyramid = None
+        recent_data = data.tail(HISTORY_DAYS)
+        x = mdates.date2num(recent_data.index)
+        future_x = mdates.date2num(future_dates)
+        predictions = np.asarray(predictions, dtype=float)
+
+        self._set_line('price', x, recent_data['Close'], 'Historical Price')
+        if 'MA20' in data.columns:
+            self._set_line('ma20', x, recent_data['MA20'], '20-day MA')
+        else:
+            self._set_line('ma20')
+        self._set_line('ma50')
+        self._set_line('prediction', future_x, predictions, 'Predicted Price')
+
+        if lower is None:
+            self.set_band()
+        else:
+            self.set_band(future_x, np.asarray(lower), np.asarray(upper))
+        self.refresh('Stock Price Analysis with Prediction')
+
+    def _artists(self):
+        artists = [line for line in self.lines.values() if line.get_visible()]
+        if self.band is not None:
+            artists.insert(0, self.band)
+        return artists
+
+    def refresh(self, title=None):
+        # Our own autoscaling must not look like a user zoom
+        self._autoscaling = True
+        try:
+            old_limits = (self.ax.get_xlim(), self.ax.get_ylim())
+            self.ax.relim()
+            if self.band is not None:
+                # relim() skips collections, so add the band's extent by hand
+                self.ax.update_datalim(self.band.get_datalim(self.ax.transData).get_points())
+            self.ax.autoscale_view()
+            limits_moved = old_limits != (self.ax.get_xlim(), self.ax.get_ylim())
+        finally:
+            self._autoscaling = False
+        legend_key = (title, tuple(artist.get_label() for artist in self._artists()))
+
+        if self.background is None or limits_moved or legend_key != self._legend_key:
+            # Full draw; the draw_event handler recaptures the background
+            if title is not None:
+                self.ax.set_title(title, pad=20)
+            self.ax.legend()
+            self._legend_key = legend_key
+            self.canvas.draw()
+        else:
+            # Only the data changed: blit the lines over the cached background
+            self.canvas.restore_region(self.background)
+            self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self._artists():
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.figure.bbox)
+
+    def _on_draw(self, event):
+        # savefig draws on a canvas of its own; there is nothing to cache then
+        if event.canvas is not self.canvas:
+            return
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
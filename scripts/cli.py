@@ -0,0 +1,153 @@
+"""
+Headless command line predictor, for cron jobs and short-lived workers
+
+    python cli.py AAPL MSFT GOOGL --days 30 --json
+    python cli.py AAPL --chart-dir charts --format svg
+    python cli.py AAPL MSFT --source csv:data/bars --json
+    python cli.py AAPL --interval 5m --days 78 --history 60
+    python cli.py AAPL --log-json --profile profile.txt
+
+Never opens a window. Matplotlib is only imported when a chart is
+requested, and then renders with the Agg backend.
+"""
+import argparse
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+from bar_store import BarStore, LocalFileSource, default_store_dir, get_default_store
+from metrics import log_to_stderr, profile_run, start_metrics_server
+from model_registry import ModelRegistry, default_registry_dir
+
+
+def make_store(source, interval='1d'):
+    """'yahoo' (default), 'csv:<directory>' or 'synthetic'; an IntradayStore for intraday intervals"""
+    if interval == '1d':
+        store_class, root, default = BarStore, default_store_dir(), get_default_store
+    else:
+        from intraday import IntradayStore, default_intraday_dir, get_default_intraday_store
+        store_class, root, default = IntradayStore, default_intraday_dir(), get_default_intraday_store
+
+    if source in (None, 'yahoo'):
+        return default()
+    if source.startswith('csv:'):
+        directory = source[len('csv:'):]
+        return store_class(os.path.join(root, 'csv-' + os.path.basename(os.path.abspath(directory))),
+                           LocalFileSource(directory))
+    if source == 'synthetic':
+        from synthetic import SyntheticSource
+        return store_class(os.path.join(root, 'synthetic'), SyntheticSource())
+    raise ValueError(f"Unknown source: {source}")
+
+
+def add_monitoring_args(parser):
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='export Prometheus metrics on this port (needs prometheus_client)')
+    parser.add_argument('--log-json', action='store_true', help='log timings and cache events to stderr as JSON')
+
+
+def start_monitoring(args):
+    if args.log_json:
+        log_to_stderr()
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+
+def to_json(symbol, result):
+    if 'error' in result:
+        return {'symbol': symbol, 'error': result['error']}
+    # Intraday forecasts have a time on every date
+    intraday = any(d.hour or d.minute for d in result['dates'])
+    date_format = '%Y-%m-%d %H:%M' if intraday else '%Y-%m-%d'
+    return {
+        'symbol': symbol,
+        'current_price': result['current_price'],
+        'predicted_price': result['predicted_price'],
+        'change_percent': result['change_percent'],
+        'accuracy': result['accuracy'],
+        'predictions': [float(p) for p in result['predictions']],
+        'dates': [d.strftime(date_format) for d in result['dates']],
+        'lower': None if result['lower'] is None else [float(p) for p in result['lower']],
+        'upper': None if result['upper'] is None else [float(p) for p in result['upper']],
+    }
+
+
+def run(symbols, prediction_days=30, history_days=365, store=None, chart_dir=None, chart_format='png',
+        mode='recursive', registry=None, interval='1d'):
+    """Yield (symbol, result) for each symbol; failures give {'error': ...}
+
+    For intraday intervals prediction_days counts bars, not days.
+    """
+    from prediction import forecast_symbol, plot_prediction
+
+    for symbol in symbols:
+        try:
+            if interval == '1d':
+                data, result = forecast_symbol(symbol, prediction_days, history_days, store, mode=mode,
+                                               registry=registry)
+            else:
+                from intraday import forecast_intraday
+                data, result = forecast_intraday(symbol, prediction_days, history_days, interval, store)
+            if chart_dir:
+                os.makedirs(chart_dir, exist_ok=True)
+                path = os.path.join(chart_dir, f"{symbol}.{chart_format}")
+                plot_prediction(symbol, data, result['predictions'], result['dates'], path,
+                                result['lower'], result['upper'])
+                result['chart'] = path
+        except Exception as e:
+            result = {'error': str(e)}
+        yield symbol, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Predict stock prices without a GUI')
+    parser.add_argument('symbols', nargs='+', help='ticker symbols, e.g. AAPL MSFT')
+    parser.add_argument('--days', type=int, default=30, help='days to predict (bars, for intraday intervals)')
+    parser.add_argument('--history', type=int, default=365, help='days of history to train on')
+    parser.add_argument('--source', default='yahoo', help="'yahoo', 'csv:<dir>' or 'synthetic'")
+    parser.add_argument('--interval', default='1d', choices=['1d', '1m', '5m', '15m', '1h'],
+                        help='bar size; intraday bars are streamed through the model in chunks')
+    parser.add_argument('--mode', default='recursive', choices=['recursive', 'direct'],
+                        help='feed each day into the next, or fit every day ahead at once')
+    parser.add_argument('--json', action='store_true', help='print one JSON document with every result')
+    parser.add_argument('--chart-dir', help='save a chart per symbol into this directory')
+    parser.add_argument('--format', default='png', choices=['png', 'svg'], help='chart file format')
+    parser.add_argument('--profile', default=os.environ.get('STOCK_PREDICTOR_PROFILE'), metavar='FILE',
+                        help='sample the run and write collapsed stacks here (default: $STOCK_PREDICTOR_PROFILE)')
+    add_monitoring_args(parser)
+    args = parser.parse_args(argv)
+    start_monitoring(args)
+
+    store = make_store(args.source, args.interval)
+    symbols = [symbol.upper() for symbol in args.symbols]
+    registry = ModelRegistry(default_registry_dir())
+    results = run(symbols, args.days, args.history, store, args.chart_dir, args.format, args.mode, registry,
+                  args.interval)
+
+    failed = 0
+    output = []
+    # run() is a generator, so the forecasts happen inside this block
+    with profile_run(args.profile) if args.profile else nullcontext():
+        for symbol, result in results:
+            failed += 'error' in result
+            if args.json:
+                entry = to_json(symbol, result)
+                if 'chart' in result:
+                    entry['chart'] = result['chart']
+                output.append(entry)
+            elif 'error' in result:
+                print(f"{symbol}: failed - {result['error']}")
+            else:
+                print(f"{symbol}: ${result['current_price']:.2f} -> ${result['predicted_price']:.2f} "
+                      f"({result['change_percent']:+.1f}%), accuracy {result['accuracy']:.1%}")
+
+    if args.json:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    return 1 if failed == len(symbols) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Visual downsampling for long price series
+
+Plotting 20 years of daily bars (or months of minute bars) draws far more
+points than the canvas has pixels. These functions reduce a series to
+roughly the canvas width while keeping its visual shape.
+"""
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """Largest-triangle-three-buckets: return indices of the points to keep
+
+    Always keeps the first and last point. NaNs (e.g. the start of a moving
+    average) are skipped.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if n_out >= n or n_out < 3:
+        return valid
+
+    xv = x[valid]
+    yv = y[valid]
+
+    # Bucket edges for the n_out - 2 middle buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average of each bucket, used as the third triangle point for the previous bucket
+    sums_x = np.add.reduceat(xv[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(yv[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, xv[-1])
+    avg_y = np.append(sums_y / counts, yv[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Triangle area with the previous kept point and the next bucket's average
+        area = np.abs((xv[a] - avg_x[i + 1]) * (yv[start:end] - yv[a])
+                      - (xv[a] - xv[start:end]) * (avg_y[i + 1] - yv[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    keep[-1] = n - 1
+
+    return valid[keep]
+
+
+def minmax(x, y, n_buckets):
+    """Keep the min and max of each bucket (cheaper than LTTB, keeps spikes)"""
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return valid
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    yv = y[valid]
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = yv[start:end]
+        keep.extend(sorted({start + int(np.argmin(bucket)), start + int(np.argmax(bucket))}))
+    return valid[np.array(keep, dtype=np.int64)]
+
+
+def visible_slice(x, lo, hi):
+    """Indices [start, end) of sorted x inside the view, plus one point either side"""
+    start = max(int(np.searchsorted(x, lo, side='left')) - 1, 0)
+    end = min(int(np.searchsorted(x, hi, side='right')) + 1, len(x))
+    return start, end
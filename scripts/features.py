@@ -0,0 +1,317 @@
+"""
+Declarative feature registry
+
+Each feature is registered with the names of the columns it is computed
+from, so the features a model asks for form a small DAG over the raw
+bars. A FeatureTable resolves that DAG for just the requested columns,
+computes every node once for all symbols (through the indicators
+kernels) and keeps the results, so a second model on the same bars only
+computes what the first one did not need.
+
+    table = FeatureTable(list_of_bars)
+    linear = table.frames(FEATURE_SETS['linear'])      # same as prepare_features
+    notebook = table.frames(FEATURE_SETS['notebook'])  # reuses price_change, ma5, ma20
+
+For very large universes, table.compact(names) stores the same rows as
+one float32 block (int8 for calendar columns) instead of DataFrames.
+"""
+import numpy as np
+import pandas as pd
+
+import indicators
+from forecast import FEATURE_COLUMNS
+
+# Raw inputs and the bars column each comes from
+RAW_COLUMNS = {
+    'price': 'Close',
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'volume': 'Volume',
+}
+
+# Small-integer columns, kept as int8 codes in compact mode
+CALENDAR_COLUMNS = ('day_of_week',)
+
+FEATURES = {}
+
+
+def feature(name, *inputs):
+    """Register fn(*input_arrays) -> (symbols, bars) array as feature `name`"""
+    def register(fn):
+        FEATURES[name] = (inputs, fn)
+        return fn
+    return register
+
+
+@feature('ma5', 'price')
+def _ma5(price):
+    return indicators.sma(price, 5)
+
+
+@feature('ma20', 'price')
+def _ma20(price):
+    return indicators.sma(price, 20)
+
+
+@feature('ma50', 'price')
+def _ma50(price):
+    return indicators.sma(price, 50)
+
+
+@feature('price_change', 'price')
+def _price_change(price):
+    return indicators.pct_change(price)
+
+
+@feature('volume_change', 'volume')
+def _volume_change(volume):
+    return indicators.pct_change(volume)
+
+
+@feature('trend', 'ma5', 'ma20')
+def _trend(ma5, ma20):
+    return (ma5 - ma20) / ma20
+
+
+@feature('volatility', 'price_change')
+def _volatility(price_change):
+    return indicators.rolling_std(price_change, 20)
+
+
+@feature('price_diff', 'price')
+def _price_diff(price):
+    out = np.full(price.shape, np.nan)
+    out[:, 1:] = np.diff(price, axis=1)
+    return out
+
+
+@feature('close_ma5_ratio', 'price', 'ma5')
+def _close_ma5_ratio(price, ma5):
+    return price / ma5
+
+
+@feature('high_low_ratio', 'high', 'low')
+def _high_low_ratio(high, low):
+    return high / low
+
+
+@feature('rsi14', 'price')
+def _rsi14(price):
+    return indicators.rsi(price, 14)
+
+
+@feature('atr14', 'high', 'low', 'price')
+def _atr14(high, low, price):
+    return indicators.atr(high, low, price, 14)
+
+
+# Columns each model family is trained on
+FEATURE_SETS = {
+    'linear': ['price'] + FEATURE_COLUMNS,
+    'notebook': ['price', 'volume', 'price_change', 'volume_change', 'ma5', 'ma20', 'volatility'],
+}
+
+
+def resolve(names):
+    """Every feature needed for `names`, each after its inputs"""
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Feature cycle: {' -> '.join(path + [name])}")
+        if name in RAW_COLUMNS or name in CALENDAR_COLUMNS:
+            state[name] = 'done'
+            order.append(name)
+            return
+        if name not in FEATURES:
+            raise KeyError(f"Unknown feature: {name}")
+        state[name] = 'visiting'
+        for dependency in FEATURES[name][0]:
+            visit(dependency, path + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for name in names:
+        visit(name, [])
+    return order
+
+
+class FeatureTable:
+    """Features for a list of bars frames, computed on demand and kept
+
+    Shorter histories are padded with NaN at the start, as in
+    prediction.prepare_features_many.
+    """
+
+    def __init__(self, data_list):
+        self.data_list = list(data_list)
+        self.n_bars = max((len(data) for data in self.data_list), default=0)
+        self.values = {}
+        self.computed = []
+
+    def _raw(self, name):
+        values = np.full((len(self.data_list), self.n_bars), np.nan)
+        for i, data in enumerate(self.data_list):
+            if name == 'day_of_week':
+                column = pd.DatetimeIndex(data.index).dayofweek
+            else:
+                column = data[RAW_COLUMNS[name]]
+            values[i, self.n_bars - len(data):] = np.asarray(column, dtype=np.float64)
+        return values
+
+    def get(self, name):
+        """(symbols, bars) array for one feature, computing what it needs"""
+        if name in self.values:
+            return self.values[name]
+        for node in resolve([name]):
+            if node in self.values or not self._needed(node, name):
+                continue
+            if node in FEATURES:
+                inputs, fn = FEATURES[node]
+                self.values[node] = fn(*(self.values[dependency] for dependency in inputs))
+            else:
+                self.values[node] = self._raw(node)
+            self.computed.append(node)
+        return self.values[name]
+
+    def _needed(self, node, name):
+        # Whether `name` reaches `node` without passing through a kept value
+        if node == name:
+            return True
+        if name in self.values:
+            return False
+        return any(self._needed(node, dependency) for dependency in FEATURES.get(name, ((), None))[0])
+
+    def frames(self, names):
+        """One DataFrame per symbol with `names` as columns, incomplete rows dropped"""
+        arrays = {name: self.get(name) for name in names}
+        complete = np.ones((len(self.data_list), self.n_bars), dtype=bool)
+        for values in arrays.values():
+            complete &= ~np.isnan(values)
+
+        frames = []
+        for i, data in enumerate(self.data_list):
+            part = slice(self.n_bars - len(data), self.n_bars)
+            keep = complete[i, part]
+            index = data.index[keep]
+            columns = {}
+            for name in names:
+                # Raw columns keep their own dtype (e.g. int64 volume)
+                if name in RAW_COLUMNS:
+                    columns[name] = data[RAW_COLUMNS[name]].to_numpy()[keep]
+                elif name == 'day_of_week':
+                    columns[name] = pd.DatetimeIndex(index).dayofweek
+                else:
+                    columns[name] = arrays[name][i, part][keep]
+            frames.append(pd.DataFrame(columns, index=index))
+        return frames
+
+    def compact(self, names):
+        """One CompactFeatures per symbol with `names` as columns, incomplete rows dropped
+
+        Every column is written straight into a shared float32 block as it
+        is computed (calendar columns into an int8 block), and float64
+        nodes this call computed are freed once nothing else needs them.
+        """
+        names = list(names)
+        floats = [name for name in names if name not in CALENDAR_COLUMNS]
+        calendar = [name for name in names if name in CALENDAR_COLUMNS]
+        n_symbols = len(self.data_list)
+        block = np.empty((n_symbols, self.n_bars, len(floats)), dtype=np.float32)
+        codes = np.empty((n_symbols, self.n_bars, len(calendar)), dtype=np.int8)
+        complete = np.ones((n_symbols, self.n_bars), dtype=bool)
+
+        order = resolve(names)
+        uses = {node: names.count(node) for node in order}
+        for node in order:
+            for dependency in FEATURES.get(node, ((), None))[0]:
+                uses[dependency] += 1
+        cached = set(self.values)
+
+        for node in order:
+            values = self.get(node)
+            if node in floats:
+                block[:, :, floats.index(node)] = values
+            elif node in calendar:
+                codes[:, :, calendar.index(node)] = np.nan_to_num(values, nan=-1)
+            if node in names:
+                complete &= ~np.isnan(values)
+
+            # Drop what this call computed as soon as its last user has run
+            for used in ([node] if node in names else []) + list(FEATURES.get(node, ((), None))[0]):
+                uses[used] -= 1
+                if uses[used] == 0 and used not in cached:
+                    del self.values[used]
+                    self.computed.remove(used)
+
+        result = []
+        for i, data in enumerate(self.data_list):
+            offset = self.n_bars - len(data)
+            rows = np.flatnonzero(complete[i, offset:])
+            if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+                # The usual case: complete rows are one run, so this is a view
+                part = slice(offset + rows[0], offset + rows[-1] + 1)
+                index = data.index[rows[0]:rows[-1] + 1]
+            else:
+                part = offset + rows
+                index = data.index[rows]
+            result.append(CompactFeatures(block[i, part], codes[i, part], index, floats, calendar))
+        return result
+
+
+class CompactFeatures:
+    """Feature rows of one symbol as a float32 matrix plus int8 calendar codes
+
+    `values` has one column per name in `columns`, `codes` one per name in
+    `calendar`; both are usually views into the block FeatureTable.compact
+    filled, and slicing (split, tail) never copies. Float32 keeps about 7
+    significant digits, enough for prices, averages and ratios.
+    """
+
+    def __init__(self, values, codes, index, columns, calendar):
+        self.values = values
+        self.codes = codes
+        self.index = index
+        self.columns = list(columns)
+        self.calendar = list(calendar)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.codes.nbytes
+
+    def column(self, name):
+        """View of one column"""
+        if name in self.calendar:
+            return self.codes[:, self.calendar.index(name)]
+        return self.values[:, self.columns.index(name)]
+
+    def rows(self, start=None, stop=None):
+        """CompactFeatures for rows start:stop, sharing memory with this one"""
+        part = slice(start, stop)
+        return CompactFeatures(self.values[part], self.codes[part], self.index[part], self.columns, self.calendar)
+
+    def split(self, fraction=0.8):
+        """(train, test) views at int(len * fraction), as train_model splits"""
+        split_point = int(len(self) * fraction)
+        return self.rows(None, split_point), self.rows(split_point, None)
+
+    def matrix(self, names, dtype=np.float32):
+        """(rows, len(names)) design matrix, filled column by column"""
+        out = np.empty((len(self), len(names)), dtype=dtype)
+        for j, name in enumerate(names):
+            out[:, j] = self.column(name)
+        return out
+
+    def to_frame(self):
+        """The same rows as a DataFrame (float32 and int8 columns)"""
+        columns = {}
+        for name in self.columns + self.calendar:
+            columns[name] = self.column(name)
+        return pd.DataFrame(columns, index=self.index)
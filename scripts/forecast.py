@@ -0,0 +1,102 @@
+"""
+Array version of the recursive forecast in prediction.predict_future_prices
+
+The whole horizon for one or many symbols is produced from the fitted
+coefficients of a linear model, without building a DataFrame or calling
+model.predict for every day.
+"""
+import numpy as np
+
+FEATURE_COLUMNS = ['volume', 'high', 'low', 'ma5', 'ma20', 'price_change', 'volume_change', 'trend', 'day_of_week']
+
+
+def forecast_linear(coef, intercept, last_rows, last_prices, days=30, feature_names=FEATURE_COLUMNS, shocks=None,
+                    weekdays=None):
+    """Forecast `days` prices for each row of last_rows
+
+    coef is (n_features,) for one shared model or (n_symbols, n_features) for
+    one model per symbol. last_rows is the final feature row of each symbol
+    and last_prices its last close. Returns an (n_symbols, days) array, or a
+    (days,) array when a single row is passed.
+
+    shocks, an (n_symbols, days) array, is added to each day's prediction
+    before it feeds the next day's features; simulation uses it to push
+    many noisy paths through the same recurrence.
+
+    weekdays, a (days,) array, overrides the weekday of each forecast step;
+    intraday bars only move to the next weekday at a session boundary.
+    """
+    single = np.ndim(last_rows) == 1
+    rows = np.array(last_rows, dtype=np.float64, ndmin=2)
+    coef = np.asarray(coef, dtype=np.float64)
+    intercept = np.asarray(intercept, dtype=np.float64)
+    last_prices = np.asarray(last_prices, dtype=np.float64).reshape(-1)
+    n_symbols = rows.shape[0]
+
+    col = {name: i for i, name in enumerate(feature_names)}
+    volume_change = col['volume_change']
+    day_of_week = col['day_of_week']
+
+    # Day-major history: history[t] holds day t for every symbol, and
+    # history[t-4:t+1] is the ma5 window, so no prediction list is kept
+    history = np.empty((days, n_symbols))
+    dot = np.empty(n_symbols)
+    # The weekday only ever steps by one, so the whole schedule is known up front
+    if weekdays is None:
+        weekdays = np.remainder(rows[:, day_of_week] + np.arange(1, days + 1)[:, None], 7)
+    else:
+        weekdays = np.broadcast_to(np.asarray(weekdays, dtype=np.float64)[:, None], (days, n_symbols))
+
+    for t in range(days):
+        pred = history[t]
+        if coef.ndim == 1:
+            np.matmul(rows, coef, out=dot)
+        else:
+            # Batched (1, k) @ (k, 1) products, summed in the same order as model.predict
+            np.matmul(rows[:, None, :], coef[:, :, None], out=dot[:, None, None])
+        np.add(dot, intercept, out=pred)
+        if shocks is not None:
+            pred += shocks[:, t]
+
+        ma5 = _window_mean(history[t - 4:t + 1]) if t >= 4 else pred
+        ma20 = _window_mean(history[t - 19:t + 1]) if t >= 19 else pred
+        previous = history[t - 1] if t > 0 else last_prices
+
+        # Volume is carried forward unchanged
+        np.multiply(pred, 1.02, out=rows[:, col['high']])
+        np.multiply(pred, 0.98, out=rows[:, col['low']])
+        rows[:, col['ma5']] = ma5
+        rows[:, col['ma20']] = ma20
+        np.divide(pred - previous, last_prices, out=rows[:, col['price_change']])
+        rows[:, volume_change] = 0
+        np.divide(ma5 - ma20, ma20, out=rows[:, col['trend']])
+        rows[:, day_of_week] = weekdays[t]
+
+    out = history.T
+    return out[0] if single else out
+
+
+def _window_mean(window):
+    """Mean over axis 0 of a (width, n_symbols) block
+
+    Adds the days in the same order np.mean uses along one contiguous row
+    (a running sum below 8 values, eight interleaved partial sums above),
+    so the forecast stays bit-identical to the per-day model.predict loop
+    while every step works on whole contiguous rows.
+    """
+    width = len(window)
+    if width < 8:
+        total = window[0].copy()
+        for day in window[1:]:
+            total += day
+    else:
+        partial = window[:8].copy()
+        stop = width - width % 8
+        for i in range(8, stop, 8):
+            partial += window[i:i + 8]
+        total = ((partial[0] + partial[1]) + (partial[2] + partial[3])) + \
+                ((partial[4] + partial[5]) + (partial[6] + partial[7]))
+        for day in window[stop:]:
+            total += day
+    total /= width
+    return total
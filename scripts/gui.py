@@ -1,13 +1,14 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import yfinance as yf
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime, timedelta
 import pandas as pd
-from prediction import get_stock_data, prepare_features, train_model, predict_future_prices
-import numpy as np
+from prediction import get_stock_data, prepare_features, get_trained_model, predict_future_prices
+from simulation import confidence_band
+from bar_store import get_default_store
+from task_runner import TaskRunner
+from charts import PriceChart
+from pyramid import PyramidCache
 
 class SimpleStockGUI:
     def __init__(self):
@@ -20,6 +21,9 @@ class SimpleStockGUI:
                         font=('Arial', 24), pady=10)
         title.pack()
         
+        # Downloads and model fits run in the background
+        self.tasks = TaskRunner(self.window)
+        
         # Sections
         self.create_input_section()
         self.create_chart_area()
@@ -63,12 +67,33 @@ class SimpleStockGUI:
         self.predict_btn = ttk.Button(input_frame, text="Predict Future Price", 
                                     command=self.predict_stock)
         self.predict_btn.pack(pady=5)
+        
+        # Progress and cancel for background work
+        progress_frame = ttk.Frame(input_frame)
+        progress_frame.pack(fill='x', pady=5)
+        
+        self.progress = ttk.Progressbar(progress_frame, mode='indeterminate', length=200)
+        self.progress.pack(side='left', padx=5)
+        
+        self.cancel_btn = ttk.Button(progress_frame, text="Cancel", 
+                                   command=self.cancel_work, state='disabled')
+        self.cancel_btn.pack(side='left', padx=5)
+        
+        self.status_label = ttk.Label(progress_frame, text="")
+        self.status_label.pack(side='left', padx=5)
+        self.progress_running = False
     
     def create_chart_area(self):
         self.chart_frame = ttk.LabelFrame(self.window, text="Stock Price Chart", 
                         padding=10)
         self.chart_frame.pack(fill='both', expand=True, padx=10, pady=5)
-        self.canvas = None
+        
+        # One figure and canvas, reused for every chart
+        self.chart = PriceChart(self.chart_frame)
+        # Packed first so a small window squeezes the chart, not the toolbar;
+        # its zoom/pan and the scroll wheel re-sample the visible range
+        self.chart.toolbar(self.chart_frame).pack(side='bottom', fill='x')
+        self.chart.widget().pack(fill='both', expand=True)
     
     def create_info_section(self):
         self.info_frame = ttk.LabelFrame(self.window, text="Stock Information", 
@@ -93,62 +118,61 @@ class SimpleStockGUI:
         self.accuracy_label.pack()
     
     def analyze_stock(self):
-        try:
-            # Get values from inputs
-            symbol = self.symbol_entry.get().upper()
-            start = self.start_date.get()
-            end = self.end_date.get()
-            
-            # Download data
-            self.analyze_btn.config(text="Downloading...", state='disabled')
-            data = yf.download(symbol, start=start, end=end)
-            
-            if len(data) == 0:
-                messagebox.showerror("Error", "No data found for this stock!")
-                return
-            
-            # Calculate moving averages
-            data['MA20'] = data['Close'].rolling(window=20).mean()
-            data['MA50'] = data['Close'].rolling(window=50).mean()
-            
-            # Update chart
-            self.update_chart(data)
-            
-            # Update information
-            self.update_info(data)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
-        finally:
-            self.analyze_btn.config(text="Analyze Stock", state='normal')
-    
-    def update_chart(self, data):
-        if self.canvas:
-            self.canvas.get_tk_widget().destroy()
-        # Create new chart
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Plot stock price and moving averages
-        ax.plot(data.index, data['Close'], label='Stock Price', linewidth=2)
-        ax.plot(data.index, data['MA20'], label='20-day Average', alpha=0.7)
-        ax.plot(data.index, data['MA50'], label='50-day Average', alpha=0.7)
-        
-        ax.set_title(f'Stock Price Analysis', pad=20)
-        ax.set_xlabel('Date')
-        ax.set_ylabel('Price ($)')
-        ax.grid(True, alpha=0.3)
-        ax.legend()
-        
-        # Add chart
-        self.canvas = FigureCanvasTkAgg(fig, self.chart_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill='both', expand=True)
-    
-    def update_info(self, data):
-        current_price = float(data['Close'].iloc[-1])
-        first_price = float(data['Close'].iloc[0])
-        price_change = ((current_price - first_price) / first_price) * 100
-        avg_volume = float(data['Volume'].mean()) / 1_000_000
+        # Get values from inputs
+        symbol = self.symbol_entry.get().upper()
+        start = self.start_date.get()
+        end = self.end_date.get()
+        
+        # A newer analysis replaces any that is still running
+        self.tasks.submit('chart', load_chart_data, symbol, start, end,
+                          on_done=self.show_analysis,
+                          on_error=lambda e: messagebox.showerror("Error", f"An error occurred: {str(e)}"),
+                          label=f"{symbol} chart")
+        self.update_progress()
+    
+    def show_analysis(self, result):
+        data, pyramid, info = result
+        if info is None:
+            messagebox.showerror("Error", "No data found for this stock!")
+            return
+        
+        # Update chart
+        self.update_chart(data, pyramid)
+        
+        # Update information
+        self.update_info(info)
+    
+    def cancel_work(self):
+        self.tasks.cancel()
+        self.update_progress()
+    
+    def update_progress(self):
+        labels = self.tasks.pending_labels()
+        self.status_label.config(text="Working on " + ", ".join(labels) + "..." if labels else "")
+        
+        if labels and not self.progress_running:
+            self.progress_running = True
+            self.progress.start(10)
+            self.cancel_btn.config(state='normal')
+            self.window.after(100, self.watch_progress)
+        elif not labels and self.progress_running:
+            self.progress_running = False
+            self.progress.stop()
+            self.cancel_btn.config(state='disabled')
+    
+    def watch_progress(self):
+        self.update_progress()
+        if self.progress_running:
+            self.window.after(100, self.watch_progress)
+    
+    def update_chart(self, data, pyramid=None):
+        self.chart.show_history(data, pyramid)
+    
+    def update_info(self, info):
+        # From BarPyramid.summary, which never scans the whole range
+        current_price = info['current_price']
+        price_change = info['change_percent']
+        avg_volume = info['average_volume'] / 1_000_000
         
         self.current_price_label.config(
             text=f"Current Price: ${current_price:.2f}")
@@ -158,88 +182,77 @@ class SimpleStockGUI:
             text=f"Average Daily Volume: {avg_volume:.1f}M shares")
     
     def predict_stock(self):
-        try:
-            symbol = self.symbol_entry.get().upper()
-            
-            self.predict_btn.config(text="Predicting...", state='disabled')
-            
-            # Get data using prediction module
-            data = get_stock_data(symbol, 365)
-            
-            if len(data) == 0:
-                messagebox.showerror("Error", "No data found for prediction!")
-                return
-            
-            # Prepare features and train model
-            features = prepare_features(data)
-            model, accuracy, feature_names = train_model(features)
-            
-            # Make 30-day predictions
-            predictions = predict_future_prices(model, features, feature_names, 30)
-            
-            # Create prediction dates
-            last_date = data.index[-1]
-            future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=30, freq='B')
-            
-            # Update chart with predictions
-            self.update_chart_with_prediction(data, predictions, future_dates)
-            
-            # Update prediction info
-            current_price = float(data['Close'].iloc[-1])
-            predicted_price = predictions[-1]
-            change_percent = ((predicted_price - current_price) / current_price) * 100
-            
-            self.prediction_label.config(
-                text=f"30-day Prediction: ${predicted_price:.2f} ({change_percent:+.1f}%)")
-            self.accuracy_label.config(
-                text=f"Model Accuracy: {accuracy:.1%}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Prediction failed: {str(e)}")
-        finally:
-            self.predict_btn.config(text="Predict Future Price", state='normal')
-    
-    def update_chart_with_prediction(self, data, predictions, future_dates):
-        if self.canvas:
-            self.canvas.get_tk_widget().destroy()
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Plot historical data (last 60 days)
-        recent_data = data.tail(60)
-        ax.plot(recent_data.index, recent_data['Close'], label='Historical Price', 
-                linewidth=2, color='blue')
-        
-        # Plot moving averages
-        if 'MA20' in data.columns:
-            ax.plot(recent_data.index, recent_data['MA20'], label='20-day MA', 
-                    alpha=0.7, color='orange')
-        
-        # Plot predictions
-        ax.plot(future_dates, predictions, label='Predicted Price', 
-                linewidth=2, color='red', linestyle='--')
-        
-        # Add confidence band
-        confidence = np.array(predictions) * 0.1
-        ax.fill_between(future_dates, 
-                       np.array(predictions) - confidence, 
-                       np.array(predictions) + confidence, 
-                       color='red', alpha=0.2, label='Confidence Band')
-        
-        ax.set_title('Stock Price Analysis with Prediction', pad=20)
-        ax.set_xlabel('Date')
-        ax.set_ylabel('Price ($)')
-        ax.grid(True, alpha=0.3)
-        ax.legend()
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        self.canvas = FigureCanvasTkAgg(fig, self.chart_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        symbol = self.symbol_entry.get().upper()
+        
+        self.tasks.submit('prediction', run_prediction, symbol,
+                          on_done=self.show_prediction,
+                          on_error=lambda e: messagebox.showerror("Error", f"Prediction failed: {str(e)}"),
+                          label=f"{symbol} prediction")
+        self.update_progress()
+    
+    def show_prediction(self, result):
+        if result is None:
+            messagebox.showerror("Error", "No data found for prediction!")
+            return
+        
+        data, predictions, future_dates, accuracy, lower, upper = result
+        
+        # Update chart with predictions
+        self.update_chart_with_prediction(data, predictions, future_dates, lower, upper)
+        
+        # Update prediction info
+        current_price = float(data['Close'].iloc[-1])
+        predicted_price = predictions[-1]
+        change_percent = ((predicted_price - current_price) / current_price) * 100
+        
+        self.prediction_label.config(
+            text=f"30-day Prediction: ${predicted_price:.2f} ({change_percent:+.1f}%)")
+        self.accuracy_label.config(
+            text=f"Model Accuracy: {accuracy:.1%}")
+    
+    def update_chart_with_prediction(self, data, predictions, future_dates, lower=None, upper=None):
+        self.chart.show_prediction(data, predictions, future_dates, lower, upper)
     
     def run(self):
         self.window.mainloop()
+        self.tasks.shutdown()
+
+# These run on worker threads, so they must not touch any Tk widgets
+_pyramids = None
+
+def load_chart_data(symbol, start, end, max_points=1000):
+    # Bars and MA20/MA50 at every resolution, built once per symbol; ranges
+    # already covered skip the store, later ones only add the new bars
+    global _pyramids
+    if _pyramids is None:
+        _pyramids = PyramidCache(get_default_store())
+    pyramid = _pyramids.get(symbol, start, end)
+    
+    # Only the level that fits the chart, and only the requested range
+    data = pyramid.view(start, end, max_points)
+    return data, pyramid, pyramid.summary(start, end)
+
+def run_prediction(symbol, days=30):
+    # Get data using prediction module
+    data = get_stock_data(symbol, 365)
+    
+    if len(data) == 0:
+        return None
+    
+    # Prepare features and train model (or reuse the one trained on these bars)
+    features = prepare_features(data)
+    model, accuracy, feature_names = get_trained_model(symbol, data, features, window=365)
+    
+    # Make 30-day predictions
+    predictions = predict_future_prices(model, features, feature_names, days)
+    
+    # 90% band from 10k simulated paths
+    lower, upper = confidence_band(model, features, feature_names, days)
+    
+    # Create prediction dates
+    last_date = data.index[-1]
+    future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=days, freq='B')
+    return data, predictions, future_dates, accuracy, lower, upper
 
 if __name__ == "__main__":
     app = SimpleStockGUI()
@@ -0,0 +1,168 @@
+"""
+Technical indicators as NumPy kernels over (symbols, bars) arrays
+
+Every function takes a 2-D float array with one row per symbol (a 1-D
+array is treated as one symbol and returned 1-D) and computes all rows in
+one call: rolling windows from cumulative sums, exponential averages as
+a linear filter along the time axis. Results match the pandas versions
+(rolling().mean(), ewm(adjust=False), ...) to floating point tolerance,
+with NaN wherever pandas would give NaN for a full window.
+
+    close = np.vstack([bars['Close'].to_numpy() for bars in universe])
+    ma20 = sma(close, 20)
+"""
+import numpy as np
+
+
+def _as_rows(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.atleast_2d(values), values.ndim == 1
+
+
+def _result(rows, single):
+    return rows[0] if single else rows
+
+
+def _centre(x, missing):
+    # Shift each row by its mean so long cumulative sums keep their precision
+    mean = np.nanmean(x, axis=1, keepdims=True) if missing is not None else x.mean(axis=1, keepdims=True)
+    return x - mean, mean
+
+
+def _window_sums(x, window, missing=None):
+    """Sum of x over each trailing window (NaN until the window is full)
+
+    Entries marked in `missing` count as NaN: any window holding one is NaN.
+    """
+    if missing is not None:
+        x = np.where(missing, 0.0, x)
+    cumulative = np.zeros((x.shape[0], x.shape[1] + 1))
+    np.cumsum(x, axis=1, out=cumulative[:, 1:])
+
+    sums = np.full(x.shape, np.nan)
+    np.subtract(cumulative[:, window:], cumulative[:, :-window], out=sums[:, window - 1:])
+    if missing is not None:
+        gaps = np.zeros((x.shape[0], x.shape[1] + 1), dtype=np.int32)
+        np.cumsum(missing, axis=1, out=gaps[:, 1:])
+        sums[:, window - 1:][gaps[:, window:] > gaps[:, :-window]] = np.nan
+    return sums
+
+
+def _missing(x):
+    missing = np.isnan(x)
+    return missing if missing.any() else None
+
+
+def sma(values, window):
+    """Simple moving average, like rolling(window).mean()"""
+    x, single = _as_rows(values)
+    missing = _missing(x)
+    centred, mean = _centre(x, missing)
+    out = _window_sums(centred, window, missing)
+    out /= window
+    out += mean
+    return _result(out, single)
+
+
+def rolling_std(values, window, ddof=1):
+    """Rolling standard deviation, like rolling(window).std()"""
+    x, single = _as_rows(values)
+    missing = _missing(x)
+    # Centring also keeps the squared sums small
+    centred, _ = _centre(x, missing)
+    sums = _window_sums(centred, window, missing)
+    squares = _window_sums(centred * centred, window, missing)
+    with np.errstate(invalid='ignore'):
+        variance = (squares - sums * sums / window) / (window - ddof)
+    out = np.sqrt(np.maximum(variance, 0.0, where=~np.isnan(variance), out=variance))
+    return _result(out, single)
+
+
+def pct_change(values, periods=1):
+    """Relative change over `periods` bars, like pct_change()"""
+    x, single = _as_rows(values)
+    out = np.full(x.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[:, periods:] = x[:, periods:] / x[:, :-periods] - 1
+    return _result(out, single)
+
+
+def volatility(values, window=20):
+    """Rolling std of daily returns, the notebook's 'Volatility' feature"""
+    x, single = _as_rows(values)
+    return _result(rolling_std(pct_change(x), window), single)
+
+
+def ema(values, span=None, alpha=None, min_periods=0):
+    """Exponential moving average, like ewm(span or alpha, adjust=False).mean()
+
+    Leading NaNs are skipped per row, as pandas does; the average starts
+    at each row's first value. NaNs after that are not supported.
+    """
+    from scipy.signal import lfilter
+
+    if alpha is None:
+        alpha = 2.0 / (span + 1)
+    x, single = _as_rows(values)
+    n_symbols, n_bars = x.shape
+    if n_bars == 0:
+        return _result(x.copy(), single)
+
+    # Hold each row at its first value until it starts, so the filter's
+    # state is already that value when real data arrives
+    valid = ~np.isnan(x)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), n_bars)
+    before = np.arange(n_bars) < first[:, None]
+    seed = x[np.arange(n_symbols), np.minimum(first, n_bars - 1)]
+    seeded = np.where(before, seed[:, None], x)
+
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], seeded, axis=1, zi=(1 - alpha) * seed[:, None])
+    out[before] = np.nan
+    if min_periods > 1:
+        out[np.arange(n_bars) < (first + min_periods - 1)[:, None]] = np.nan
+    return _result(out, single)
+
+
+def rsi(close, window=14):
+    """Wilder's relative strength index (0-100)
+
+    Same as averaging gains and losses with
+    ewm(alpha=1/window, adjust=False, min_periods=window).
+    """
+    x, single = _as_rows(close)
+    delta = np.full(x.shape, np.nan)
+    delta[:, 1:] = np.diff(x, axis=1)
+
+    gain = ema(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)),
+               alpha=1.0 / window, min_periods=window)
+    loss = ema(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)),
+               alpha=1.0 / window, min_periods=window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100.0 - 100.0 / (1.0 + gain / loss)
+    # No losses in the window at all is an RSI of 100
+    out[(loss == 0) & (gain > 0)] = 100.0
+    return _result(out, single)
+
+
+def bollinger(close, window=20, k=2.0, ddof=1):
+    """(middle, upper, lower) bands: SMA +- k rolling standard deviations"""
+    x, single = _as_rows(close)
+    middle = sma(x, window)
+    width = k * rolling_std(x, window, ddof)
+    return _result(middle, single), _result(middle + width, single), _result(middle - width, single)
+
+
+def true_range(high, low, close):
+    high, single = _as_rows(high)
+    low, _ = _as_rows(low)
+    close, _ = _as_rows(close)
+    out = high - low
+    previous = close[:, :-1]
+    np.maximum(out[:, 1:], np.abs(high[:, 1:] - previous), out=out[:, 1:])
+    np.maximum(out[:, 1:], np.abs(low[:, 1:] - previous), out=out[:, 1:])
+    return _result(out, single)
+
+
+def atr(high, low, close, window=14):
+    """Average true range, Wilder smoothed (ewm alpha=1/window, adjust=False)"""
+    return ema(true_range(high, low, close), alpha=1.0 / window, min_periods=window)
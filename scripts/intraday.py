@@ -0,0 +1,391 @@
+"""
+Intraday bars (1m/5m/15m/1h), stored and processed a chunk at a time
+
+A minute history of a few months is too big to hold as one float64
+DataFrame per symbol, so nothing here ever builds one:
+
+- IntradayStore downloads at most FETCH_DAYS of bars per request and
+  writes them to disk as one file per session (<root>/<SYMBOL>/<interval>/
+  <date>.npz), then reads them back as chunks of about chunk_bars bars.
+- ChunkedFeatures turns each chunk into the prepare_features rows for it,
+  carrying the last few bars over so rolling windows continue across
+  chunk boundaries.
+- StreamingTrainer fits train_model's regression (same 80/20 split)
+  from those chunks with OnlineLinearModel, which only keeps k x k sums.
+
+    data, result = forecast_intraday('AAPL', bars_ahead=78, days=30, interval='5m')
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bar_store import COLUMNS, YahooSource, _empty_frame, exchange_now, has_trading_days
+from forecast import FEATURE_COLUMNS, forecast_linear
+from metrics import count, span
+
+INTERVALS = {
+    '1m': pd.Timedelta(minutes=1),
+    '5m': pd.Timedelta(minutes=5),
+    '15m': pd.Timedelta(minutes=15),
+    '1h': pd.Timedelta(hours=1),
+}
+# Days one download may cover (Yahoo's limits per interval); also bounds ingestion memory
+FETCH_DAYS = {'1m': 7, '5m': 60, '15m': 60, '1h': 365}
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+SESSION_CLOSE = pd.Timedelta(hours=16)
+
+# Bars a feature row looks back over (ma20 needs the 19 before it)
+CARRY_BARS = 19
+# Most bars IntradayStore.get returns as one frame; longer ranges go through iter_chunks
+MAX_FRAME_BARS = 50_000
+
+
+def _check_interval(interval):
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown interval: {interval} (expected one of {', '.join(INTERVALS)})")
+
+
+def session_times(days, interval):
+    """Start time of every bar in the regular sessions on `days`"""
+    _check_interval(interval)
+    offsets = pd.timedelta_range(SESSION_OPEN, SESSION_CLOSE - pd.Timedelta(1), freq=INTERVALS[interval])
+    days = pd.DatetimeIndex(days).normalize()
+    return pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel(), name='Date')
+
+
+def future_times(last, n_bars, interval):
+    """The n_bars bar times after `last`, skipping nights and weekends"""
+    last = pd.Timestamp(last)
+    n_days = n_bars // len(session_times([last], interval)) + 2
+    days = pd.bdate_range(last.normalize(), periods=n_days)
+    times = session_times(days, interval)
+    return times[times > last][:n_bars]
+
+
+class IntradayStore:
+    """On-disk intraday bars, one file per symbol, interval and session
+
+    Only sessions that have closed count as fetched, so a session that was
+    still trading when it was downloaded is fetched again next time, and a
+    window with weekdays that comes back empty is not counted at all.
+    clock returns the current New York time (tests pass a fixed one).
+    """
+
+    def __init__(self, root, source=None, clock=exchange_now):
+        self.root = root
+        self.source = source if source is not None else YahooSource()
+        self.clock = clock
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _dir(self, symbol, interval):
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def _load_meta(self, symbol, interval):
+        try:
+            with open(os.path.join(self._dir(symbol, interval), 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, symbol, interval, meta):
+        path = os.path.join(self._dir(symbol, interval), 'meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def _save_sessions(self, symbol, interval, data, meta):
+        directory = self._dir(symbol, interval)
+        days = data.index.normalize()
+        for day in days.unique():
+            session = data[days == day]
+            name = str(day.date())
+            tmp = os.path.join(directory, f"{name}.tmp.npz")
+            np.savez(tmp, dates=session.index.values.astype('datetime64[ns]'),
+                     **{col: session[col].to_numpy(dtype=np.float64) for col in COLUMNS})
+            os.replace(tmp, os.path.join(directory, f"{name}.npz"))
+            meta['sessions'][name] = len(session)
+
+    def _fetch(self, symbol, start, end, interval):
+        data = self.source.fetch(symbol, start.to_pydatetime(), end.to_pydatetime(), interval)
+        if data is None or len(data) == 0:
+            return _empty_frame()
+        data = data[COLUMNS]
+        index = pd.DatetimeIndex(data.index)
+        if index.tz is not None:
+            # Exchange wall-clock time, like the daily bars
+            index = index.tz_convert('America/New_York').tz_localize(None)
+        data = data.set_axis(pd.DatetimeIndex(index.values.astype('datetime64[ns]'), name='Date'))
+        return data[(data.index >= start) & (data.index < end)]
+
+    def _closed_before(self):
+        # Sessions on days before this are complete
+        now = pd.Timestamp(self.clock())
+        return now.normalize() + pd.Timedelta(days=1 if now - now.normalize() >= SESSION_CLOSE else 0)
+
+    def _download(self, symbol, start, end, interval, meta, backwards=False):
+        # One request per FETCH_DAYS window. Each window's sessions and the
+        # coverage they extend are saved before the next request, so an
+        # interrupted ingest resumes from the last finished window. Filling
+        # in before fetched_from walks backwards to keep the coverage contiguous.
+        step = pd.Timedelta(days=FETCH_DAYS[interval])
+        windows = []
+        window_start = start
+        while window_start < end:
+            windows.append((window_start, min(window_start + step, end)))
+            window_start = windows[-1][1]
+        for window_start, window_end in (reversed(windows) if backwards else windows):
+            data = self._fetch(symbol, window_start, window_end, interval)
+            if len(data):
+                self._save_sessions(symbol, interval, data, meta)
+            elif has_trading_days(window_start, min(window_end, self._closed_before())):
+                # A failed download; leave the coverage for the next ingest to retry
+                break
+            if backwards:
+                meta['fetched_from'] = str(window_start.date())
+            else:
+                meta['fetched_to'] = str(max(min(window_end, self._closed_before()), window_start).date())
+            self._save_meta(symbol, interval, meta)
+
+    def ingest(self, symbol, start, end, interval='5m'):
+        """Make sure every session in [start, end) is on disk; returns the stored bar count"""
+        _check_interval(interval)
+        symbol = symbol.upper()
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+
+        with self._lock(symbol):
+            os.makedirs(self._dir(symbol, interval), exist_ok=True)
+            meta = self._load_meta(symbol, interval)
+            if meta is None:
+                count('intraday_cache', 'miss', symbol)
+                meta = {'fetched_from': str(start.date()), 'fetched_to': str(start.date()), 'sessions': {}}
+                self._download(symbol, start, end, interval, meta)
+            else:
+                fetched_from = pd.Timestamp(meta['fetched_from'])
+                fetched_to = pd.Timestamp(meta['fetched_to'])
+                topup = start < fetched_from or end > fetched_to
+                if start < fetched_from:
+                    self._download(symbol, start, fetched_from, interval, meta, backwards=True)
+                if end > fetched_to:
+                    self._download(symbol, fetched_to, end, interval, meta)
+                count('intraday_cache', 'topup' if topup else 'hit', symbol)
+        return self.count(symbol, start, end, interval)
+
+    def _sessions(self, symbol, start, end, interval):
+        meta = self._load_meta(symbol, interval) or {'sessions': {}}
+        first, last = str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date())
+        return [(name, n) for name, n in sorted(meta['sessions'].items()) if first <= name < last]
+
+    def count(self, symbol, start, end, interval='5m'):
+        """Bars stored for sessions in [start, end)"""
+        return sum(n for _, n in self._sessions(symbol.upper(), start, end, interval))
+
+    def _read(self, symbol, interval, names):
+        columns = {col: [] for col in ['dates'] + COLUMNS}
+        for name in names:
+            with np.load(os.path.join(self._dir(symbol, interval), f"{name}.npz")) as saved:
+                for col in columns:
+                    columns[col].append(saved[col])
+        index = pd.DatetimeIndex(np.concatenate(columns.pop('dates')), name='Date')
+        return pd.DataFrame({col: np.concatenate(values) for col, values in columns.items()}, index=index)
+
+    def iter_chunks(self, symbol, start, end, interval='5m', chunk_bars=50_000):
+        """Yield the bars in [start, end) as DataFrames of whole sessions, about chunk_bars each"""
+        symbol = symbol.upper()
+        self.ingest(symbol, start, end, interval)
+        names, size = [], 0
+        for name, n in self._sessions(symbol, start, end, interval):
+            names.append(name)
+            size += n
+            if size >= chunk_bars:
+                yield self._read(symbol, interval, names)
+                names, size = [], 0
+        if names:
+            yield self._read(symbol, interval, names)
+
+    def get(self, symbol, start, end, interval='5m', max_bars=MAX_FRAME_BARS):
+        """All bars in [start, end) as one DataFrame
+
+        Raises ValueError for more than max_bars bars (None for no limit);
+        stream those with iter_chunks instead.
+        """
+        symbol = symbol.upper()
+        n_bars = self.ingest(symbol, start, end, interval)
+        if max_bars is not None and n_bars > max_bars:
+            raise ValueError(f"{n_bars} {interval} bars is more than max_bars={max_bars}; "
+                             f"use iter_chunks or forecast_intraday for long histories")
+        names = [name for name, _ in self._sessions(symbol, start, end, interval)]
+        return self._read(symbol, interval, names) if names else _empty_frame()
+
+
+class ChunkedFeatures:
+    """prepare_features for a stream of consecutive bar chunks
+
+    The last CARRY_BARS bars of each chunk are kept and put in front of the
+    next one, so the rolling averages and changes at the start of a chunk
+    see the same history they would in one big frame.
+    """
+
+    def __init__(self):
+        self.carry = None
+
+    def update(self, chunk):
+        """Feature rows for the bars of `chunk`"""
+        from prediction import prepare_features
+
+        data = chunk if self.carry is None else pd.concat([self.carry, chunk])
+        features = prepare_features(data)
+        if self.carry is not None:
+            features = features[features.index >= chunk.index[0]]
+        self.carry = data.iloc[-CARRY_BARS:]
+        return features
+
+
+def finite_rows(features, feature_names=FEATURE_COLUMNS):
+    """Feature rows the model can use: a zero-volume bar makes volume_change inf"""
+    values = features[list(feature_names) + ['price']].to_numpy(dtype=np.float64)
+    return features[np.isfinite(values).all(axis=1)]
+
+
+class StreamingTrainer:
+    """train_model's regression and holdout score, fitted from feature chunks
+
+    Rows with non-finite values are skipped (finite_rows). n_rows is the
+    number of training rows (kept feature rows minus one) the stream will
+    produce, which fixes the 80/20 split before any data is seen; rows
+    before the split update the model, rows after it are scored.
+    """
+
+    def __init__(self, n_rows, feature_names=FEATURE_COLUMNS):
+        from regression import OnlineLinearModel
+
+        self.feature_names = list(feature_names)
+        self.model = OnlineLinearModel(len(self.feature_names))
+        self.split_point = int(n_rows * 0.8)
+        self.position = 0
+        self.last_features = None
+        # Holdout: squared residuals plus a running mean / sum of squares of the targets
+        self._residuals = 0.0
+        self._test_n = 0
+        self._test_mean = 0.0
+        self._test_m2 = 0.0
+
+    def update(self, features):
+        features = finite_rows(features, self.feature_names)
+        if len(features) == 0:
+            return
+        X = features[self.feature_names].to_numpy(dtype=np.float64)
+        price = features['price'].to_numpy(dtype=np.float64)
+        if self.last_features is not None:
+            # The previous chunk's last row is paired with this chunk's first price
+            X = np.vstack([self.last_features[self.feature_names].to_numpy(dtype=np.float64), X])
+            y = price
+        else:
+            y = price[1:]
+        X = X[:len(y)]
+        self.last_features = features.iloc[-1:]
+
+        train = max(0, min(len(y), self.split_point - self.position))
+        if train:
+            self.model.partial_fit(X[:train], y[:train])
+        if train < len(y):
+            self._score(X[train:], y[train:])
+        self.position += len(y)
+
+    def _score(self, X, y):
+        residual = y - self.model.predict(X)
+        self._residuals += residual @ residual
+        n = self._test_n + len(y)
+        delta = y.mean() - self._test_mean
+        self._test_m2 += ((y - y.mean()) ** 2).sum() + delta ** 2 * self._test_n * len(y) / n
+        self._test_mean += delta * len(y) / n
+        self._test_n = n
+
+    @property
+    def score(self):
+        """Holdout R^2, as train_model reports it"""
+        return 1 - self._residuals / self._test_m2 if self._test_m2 else float('nan')
+
+
+def forecast_intraday(symbol, bars_ahead=78, days=30, interval='5m', store=None, chunk_bars=50_000):
+    """Intraday counterpart of prediction.forecast_symbol; returns (recent bars, result)
+
+    The history is streamed through the store chunk by chunk, so only one
+    chunk of bars and features is in memory at a time. `recent` is the
+    last chunk, for charts.
+    """
+    _check_interval(interval)
+    store = store or get_default_intraday_store()
+    end = datetime.now() + timedelta(days=1)
+    start = end - timedelta(days=days + 1)
+
+    with span('download', symbol):
+        n_bars = store.ingest(symbol, start, end, interval)
+    if n_bars <= CARRY_BARS + 10:
+        raise ValueError(f"Not enough {interval} bars for {symbol}: {n_bars}")
+
+    # A first pass counts the usable rows, which fixes the 80/20 split
+    features = ChunkedFeatures()
+    n_rows = sum(len(finite_rows(features.update(chunk)))
+                 for chunk in store.iter_chunks(symbol, start, end, interval, chunk_bars))
+    if n_rows <= 10:
+        raise ValueError(f"Not enough usable {interval} bars for {symbol}: {n_rows}")
+
+    features = ChunkedFeatures()
+    # One training row per kept feature row but the last
+    trainer = StreamingTrainer(n_rows - 1)
+    recent = None
+    with span('train_model', symbol):
+        for chunk in store.iter_chunks(symbol, start, end, interval, chunk_bars):
+            trainer.update(features.update(chunk))
+            recent = chunk
+
+    model, last = trainer.model, trainer.last_features
+    times = future_times(last.index[-1], bars_ahead, interval)
+    with span('predict_future_prices', symbol):
+        predictions = forecast_linear(model.coef_, model.intercept_,
+                                      last[FEATURE_COLUMNS].to_numpy(dtype=np.float64)[0],
+                                      float(last['price'].iloc[0]), bars_ahead, FEATURE_COLUMNS,
+                                      weekdays=times.dayofweek).tolist()
+
+    current_price = float(recent['Close'].iloc[-1])
+    return recent, {
+        'current_price': current_price,
+        'predicted_price': predictions[-1],
+        'change_percent': (predictions[-1] - current_price) / current_price * 100,
+        'predictions': predictions,
+        'accuracy': trainer.score,
+        'dates': times,
+        'lower': None,
+        'upper': None,
+    }
+
+
+def default_intraday_dir():
+    return os.environ.get(
+        'STOCK_PREDICTOR_INTRADAY_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'stock_predictor', 'intraday'))
+
+
+_default_store = None
+
+
+def get_default_intraday_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = IntradayStore(default_intraday_dir())
+    return _default_store
+
+
+def set_default_intraday_store(store):
+    global _default_store
+    _default_store = store
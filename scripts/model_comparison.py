@@ -0,0 +1,142 @@
+"""
+Compare models across many symbols in parallel
+
+Feature and target matrices are built once for every symbol (through the
+feature registry) and saved as .npy files, which the workers open
+memory-mapped instead of receiving a pickled copy per task. Every
+(symbol, model, hyperparameters) combination is fitted and scored on the
+same 80/20 split train_model uses, in parallel with joblib, and the
+results come back as one tidy table.
+
+    python model_comparison.py AAPL MSFT GOOGL --source synthetic --output results.csv
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureTable
+from forecast import FEATURE_COLUMNS
+
+
+def default_grid():
+    """[(name, estimator class, {param: [values]})] for the models the repo uses"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+
+    return [
+        ('linear', LinearRegression, {}),
+        ('random_forest', RandomForestRegressor,
+         {'n_estimators': [50, 100], 'max_depth': [None, 10], 'random_state': [42], 'n_jobs': [1]}),
+    ]
+
+
+def expand_grid(grid):
+    """One (name, estimator class, params) per hyperparameter combination"""
+    runs = []
+    for name, estimator, params in grid:
+        keys = sorted(params)
+        for values in itertools.product(*(params[key] for key in keys)):
+            runs.append((name, estimator, dict(zip(keys, values))))
+    return runs
+
+
+def build_matrices(bars_by_symbol, directory, feature_columns=FEATURE_COLUMNS):
+    """Save X (today's features) and y (tomorrow's price) per symbol
+
+    Returns {symbol: (X_path, y_path)}; symbols with too little data are left out.
+    """
+    symbols = list(bars_by_symbol)
+    columns = list(dict.fromkeys(['price'] + list(feature_columns)))
+    frames = FeatureTable([bars_by_symbol[symbol] for symbol in symbols]).frames(columns)
+
+    paths = {}
+    for symbol, frame in zip(symbols, frames):
+        if len(frame) < 10:
+            continue
+        X_path = os.path.join(directory, f"{symbol}.X.npy")
+        y_path = os.path.join(directory, f"{symbol}.y.npy")
+        np.save(X_path, frame[list(feature_columns)].to_numpy(dtype=np.float64)[:-1])
+        np.save(y_path, frame['price'].to_numpy(dtype=np.float64)[1:])
+        paths[symbol] = (X_path, y_path)
+    return paths
+
+
+def fit_and_score(symbol, X_path, y_path, name, estimator, params, split=0.8):
+    """Fit one model on one symbol and return a row of the results table"""
+    X = np.load(X_path, mmap_mode='r')
+    y = np.load(y_path, mmap_mode='r')
+    split_point = int(len(X) * split)
+
+    model = estimator(**params)
+    start = time.perf_counter()
+    model.fit(X[:split_point], y[:split_point])
+    fit_seconds = time.perf_counter() - start
+
+    predicted = model.predict(X[split_point:])
+    actual = np.asarray(y[split_point:])
+    error = predicted - actual
+    return {
+        'symbol': symbol,
+        'model': name,
+        'params': ', '.join(f"{key}={value}" for key, value in sorted(params.items())),
+        'r2': 1 - np.sum(error ** 2) / np.sum((actual - actual.mean()) ** 2),
+        'rmse': float(np.sqrt(np.mean(error ** 2))),
+        'mae': float(np.mean(np.abs(error))),
+        'fit_seconds': fit_seconds,
+        'n_train': split_point,
+        'n_test': len(actual),
+    }
+
+
+def compare_models(bars_by_symbol, grid=None, feature_columns=FEATURE_COLUMNS, n_jobs=-1, cache_dir=None):
+    """Tidy DataFrame with one row per (symbol, model, params)"""
+    from joblib import Parallel, delayed
+
+    runs = expand_grid(grid if grid is not None else default_grid())
+    directory = cache_dir or tempfile.mkdtemp(prefix='model_comparison_')
+    os.makedirs(directory, exist_ok=True)
+    try:
+        matrices = build_matrices(bars_by_symbol, directory, feature_columns)
+        rows = Parallel(n_jobs=n_jobs)(
+            delayed(fit_and_score)(symbol, X_path, y_path, name, estimator, params)
+            for symbol, (X_path, y_path) in matrices.items()
+            for name, estimator, params in runs)
+    finally:
+        if cache_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    columns = ['symbol', 'model', 'params', 'r2', 'rmse', 'mae', 'fit_seconds', 'n_train', 'n_test']
+    return pd.DataFrame(rows, columns=columns)
+
+
+def main(argv=None):
+    from cli import make_store
+    from prediction import get_stock_data
+
+    parser = argparse.ArgumentParser(description='Compare models across symbols')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--history', type=int, default=365 * 3, help='days of history per symbol')
+    parser.add_argument('--source', default='yahoo', help="'yahoo', 'csv:<dir>' or 'synthetic'")
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel workers (-1 = all cores)')
+    parser.add_argument('--output', help='write the table to this CSV file')
+    args = parser.parse_args(argv)
+
+    store = make_store(args.source)
+    bars = {symbol.upper(): get_stock_data(symbol.upper(), args.history, store) for symbol in args.symbols}
+    table = compare_models(bars, n_jobs=args.jobs)
+
+    print(table.groupby(['model', 'params'])[['r2', 'rmse', 'fit_seconds']].mean().to_string())
+    if args.output:
+        table.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Cache of trained linear models, keyed by what they were trained on
+
+A key covers the symbol, the history window, a hash of the exact bars,
+the feature-set version and the model type, so a repeat prediction on
+unchanged bars skips training and any new bar simply gives a new key.
+Entries live in memory (LRU) and on disk under
+<root>/<SYMBOL>/<model type>-<window>-<hash>.npz, and older entries for
+the same symbol, model type and window are dropped when a newer one is
+saved. A 1-year and a 2-year model of one symbol therefore both stay.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import count
+
+
+def bars_digest(data):
+    """Hash of the dates, column names and values of a bars frame"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(data.index.values.astype('datetime64[ns]')).tobytes())
+    for col in data.columns:
+        digest.update(str(col).encode())
+        digest.update(np.ascontiguousarray(data[col].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+class CachedLinearModel:
+    """Enough of a fitted LinearRegression for prediction, without sklearn"""
+
+    def __init__(self, coef, intercept, feature_names):
+        self.coef_ = np.asarray(coef, dtype=np.float64)
+        self.intercept_ = intercept if np.ndim(intercept) else float(intercept)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    def predict(self, X):
+        if hasattr(X, 'to_numpy'):
+            X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float64)
+        return np.asarray(X, dtype=np.float64) @ self.coef_.T + self.intercept_
+
+
+class ModelRegistry:
+    """Trained models by (symbol, window, bars hash, feature version, model type)"""
+
+    def __init__(self, root, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._window_locks = {}
+
+    def lock(self, key):
+        """Lock shared by every key of one symbol, model type and window, for get-or-train"""
+        with self._lock:
+            return self._window_locks.setdefault(key[:3], threading.Lock())
+
+    def key(self, symbol, data, model_type='linear', feature_version=1, window=None):
+        """window: days of history the bars cover (e.g. 365); without it, the first bar's date"""
+        if window is None:
+            window = 'from' + (data.index[0].strftime('%Y%m%d') if len(data) else 'none')
+        else:
+            window = f"{int(window)}d"
+        return (symbol.upper(), model_type, window, f"v{feature_version}-{bars_digest(data)}")
+
+    def _path(self, key):
+        symbol, model_type, window, digest = key
+        return os.path.join(self.root, symbol, f"{model_type}-{window}-{digest}.npz")
+
+    def get(self, key):
+        """Return (model, score, feature_names) or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+
+        path = self._path(key)
+        if entry is not None:
+            # Keep the file's age in step with the memory LRU
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            count('model_cache', 'hit', key[0])
+            return entry
+
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                names = saved['feature_names'].tolist()
+                entry = (CachedLinearModel(saved['coef'], saved['intercept'], names),
+                         float(saved['score']), names)
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            count('model_cache', 'miss', key[0])
+            return None
+
+        count('model_cache', 'disk', key[0])
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, model, score, feature_names):
+        names = [str(name) for name in feature_names]
+        entry = (CachedLinearModel(model.coef_, model.intercept_, names), float(score), names)
+        self._remember(key, entry)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file of this writer's own first, so readers
+        # never see half a model and concurrent puts of one key don't collide
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp.npz')
+        os.close(fd)
+        try:
+            np.savez(tmp, coef=entry[0].coef_, intercept=np.asarray(entry[0].intercept_),
+                     score=np.float64(score), feature_names=np.array(names))
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        self._drop_stale(key)
+        self._enforce_size()
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            # Bars in a window only ever move forward, so older keys are dead
+            for old in [k for k in self._memory if k[:3] == key[:3] and k != key]:
+                del self._memory[old]
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _drop_stale(self, key):
+        symbol, model_type, window, _ = key
+        keep = os.path.basename(self._path(key))
+        directory = os.path.join(self.root, symbol)
+        for name in os.listdir(directory):
+            if name.startswith(f"{model_type}-{window}-v") and name.endswith('.npz') and name != keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def _enforce_size(self):
+        # Least recently used files go first; get() touches files it reads
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.npz') and not name.endswith('.tmp.npz'):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                if not os.listdir(os.path.dirname(path)):
+                    os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(directory, name))
+
+
+def default_registry_dir():
+    return os.environ.get(
+        'STOCK_PREDICTOR_MODEL_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'stock_predictor', 'models'))
+
+
+_default_registry = None
+
+
+def get_default_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ModelRegistry(default_registry_dir())
+    return _default_registry
+
+
+def set_default_registry(registry):
+    """Swap the registry used by forecast_symbol and the GUI"""
+    global _default_registry
+    _default_registry = registry
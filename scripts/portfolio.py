@@ -0,0 +1,192 @@
+"""
+Portfolio weights from shrunk covariance and predicted returns
+
+    returns, dates, symbols = return_matrix(bars_by_symbol)
+    estimate = ShrinkageCovariance(len(symbols))
+    estimate.update(returns)                      # later: estimate.update(new_day_returns)
+    covariance, shrinkage = estimate.covariance()
+    weights = min_variance_weights(covariance)
+    weights = mean_variance_weights(covariance, predicted_returns(features_list), risk_aversion=5)
+
+The covariance is the Ledoit-Wolf estimate (shrunk towards a scaled
+identity, as sklearn.covariance.ledoit_wolf gives it), computed from
+running sums: the (assets x assets) sum of outer products plus a few
+vectors and scalars. A new day is a rank-k update of those sums instead
+of a rebuild over the whole history, and the shrinkage intensity needs
+no second (assets x assets) matrix. For 3,000 assets every (assets x
+assets) array is 72 MB, so they are built in place.
+"""
+import numpy as np
+import pandas as pd
+
+from forecast import forecast_linear
+
+
+def return_matrix(bars_by_symbol, symbols=None, column='Close'):
+    """Daily simple returns on the dates every symbol has a bar
+
+    Returns (returns, dates, symbols): returns is a (days, assets) array
+    whose row t is the return from dates[t] to dates[t + 1].
+    """
+    symbols = list(symbols or bars_by_symbol)
+    dates = None
+    for symbol in symbols:
+        index = bars_by_symbol[symbol].index
+        dates = index if dates is None else dates.intersection(index)
+    dates = pd.DatetimeIndex([] if dates is None else dates)
+
+    prices = np.empty((len(dates), len(symbols)))
+    for j, symbol in enumerate(symbols):
+        series = bars_by_symbol[symbol][column]
+        prices[:, j] = series.to_numpy(dtype=np.float64)[series.index.get_indexer(dates)]
+
+    returns = prices[1:]
+    returns /= prices[:-1]
+    returns -= 1
+    return returns, dates[:-1], symbols
+
+
+class ShrinkageCovariance:
+    """Ledoit-Wolf covariance of a growing (or sliding) window of return rows
+
+    Keeps n, the column sums, the sum of outer products and the terms the
+    shrinkage intensity needs; update() adds rows and downdate() removes
+    rows that leave a rolling window.
+    """
+
+    def __init__(self, n_assets):
+        self.n_assets = n_assets
+        self.n = 0
+        self.sums = np.zeros(n_assets)
+        self.products = np.zeros((n_assets, n_assets))
+        # For the shrinkage intensity: sums of a_t = |x_t|^2, a_t^2 and a_t * x_t
+        self.norms = 0.0
+        self.norms_squared = 0.0
+        self.weighted_sums = np.zeros(n_assets)
+
+    def _add(self, rows, sign):
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        if rows.shape[1] != self.n_assets:
+            raise ValueError(f"Expected {self.n_assets} columns, got {rows.shape[1]}")
+        norms = np.einsum('ti,ti->t', rows, rows)
+        self.n += sign * len(rows)
+        self.sums += sign * rows.sum(axis=0)
+        if len(rows) < 64:
+            # A few days: update the sum of outer products in place (BLAS gemm
+            # into the same memory) instead of allocating an (assets x assets) temporary
+            from scipy.linalg.blas import dgemm
+            dgemm(float(sign), rows, rows, beta=1.0, c=self.products.T, trans_a=1, overwrite_c=1)
+        else:
+            # A long history: rows.T @ rows is a symmetric rank-k product (BLAS syrk)
+            self.products += sign * (rows.T @ rows)
+        self.norms += sign * norms.sum()
+        self.norms_squared += sign * (norms @ norms)
+        self.weighted_sums += sign * (norms @ rows)
+
+    def update(self, rows):
+        """Add return rows (days, assets)"""
+        self._add(rows, 1)
+
+    def downdate(self, rows):
+        """Remove rows added earlier, e.g. the day leaving a rolling window"""
+        self._add(rows, -1)
+
+    @property
+    def mean(self):
+        return self.sums / self.n
+
+    def shrinkage(self):
+        """(shrinkage intensity, identity scale mu) for the Ledoit-Wolf estimate
+
+        Everything comes from the running sums; the empirical covariance
+        S = products / n - mean mean' is never formed.
+        """
+        n, p, mean = self.n, self.n_assets, self.mean
+
+        # Centred row norms c_t = |x_t - mean|^2 expand into the running sums
+        mean_norm = mean @ mean
+        mean_sums = self.sums @ mean
+        mean_products = mean @ (self.products @ mean)
+        centred_norms = self.norms - 2 * mean_sums + n * mean_norm
+        centred_norms_squared = (self.norms_squared - 4 * (self.weighted_sums @ mean) + 4 * mean_products
+                                 + 2 * mean_norm * self.norms - 4 * mean_norm * mean_sums + n * mean_norm ** 2)
+        # |S|_F^2 from |products|_F^2, without building S
+        frobenius = (np.vdot(self.products, self.products) / n ** 2 - 2 * mean_products / n + mean_norm ** 2)
+
+        mu = centred_norms / (n * p)
+        beta = (centred_norms_squared / n - frobenius) / (p * n)
+        delta = (frobenius - 2 * mu * (centred_norms / n) + p * mu ** 2) / p
+        beta = min(beta, delta)
+        return (0.0 if beta == 0 else beta / delta), mu
+
+    def _build(self, out, scale, ridge, block=128):
+        # out = scale * (products / n - mean mean') + ridge * I, one block of rows at a time
+        mean = self.mean
+        out = np.empty_like(self.products) if out is None else out
+        for start in range(0, self.n_assets, block):
+            rows = slice(start, start + block)
+            np.multiply(self.products[rows], scale / self.n, out=out[rows])
+            out[rows] -= (scale * mean[rows])[:, None] * mean
+        out.flat[::self.n_assets + 1] += ridge
+        return out
+
+    def empirical(self, out=None):
+        """Maximum likelihood covariance (divides by n), written into out if given"""
+        return self._build(out, 1.0, 0.0)
+
+    def covariance(self, out=None):
+        """(covariance, shrinkage intensity), written into out if given"""
+        shrinkage, mu = self.shrinkage()
+        return self._build(out, 1 - shrinkage, shrinkage * mu), shrinkage
+
+
+def _solve(covariance, rhs, overwrite=False):
+    from scipy.linalg import cho_factor, cho_solve
+
+    # Cholesky: half the work of a general solve, and a shrunk covariance is positive definite
+    factor = cho_factor(covariance, lower=True, overwrite_a=overwrite, check_finite=False)
+    return cho_solve(factor, rhs, check_finite=False)
+
+
+def min_variance_weights(covariance, overwrite=False):
+    """Fully invested minimum-variance weights (shorting allowed), summing to 1
+
+    overwrite=True lets the solve reuse the covariance's memory.
+    """
+    x = _solve(covariance, np.ones(len(covariance)), overwrite)
+    return x / x.sum()
+
+
+def mean_variance_weights(covariance, expected_returns, risk_aversion=1.0, overwrite=False):
+    """Fully invested weights maximising w'mu - risk_aversion / 2 * w'Cw (shorting allowed)"""
+    ones = np.ones(len(covariance))
+    solved = _solve(covariance, np.column_stack([np.asarray(expected_returns, dtype=np.float64), ones]), overwrite)
+    towards_return, towards_min = solved[:, 0], solved[:, 1]
+    # Lagrange multiplier for sum(w) = 1
+    weights = towards_return / risk_aversion
+    return weights + (1 - weights.sum()) / towards_min.sum() * towards_min
+
+
+def predicted_returns(features_list, prediction_days=30):
+    """Expected daily return per symbol from its linear model's forecast
+
+    Uses the model and forecast of predict_future_prices for every symbol
+    at once, and turns the predicted change over prediction_days into a
+    compounded daily rate to match the daily return covariance.
+    """
+    from regression import train_models_batch
+
+    coef, intercept, _, names = train_models_batch(features_list)
+    last_rows = np.array([f[list(names)].to_numpy(dtype=np.float64)[-1] for f in features_list])
+    last_prices = np.array([f['price'].iloc[-1] for f in features_list], dtype=np.float64)
+    paths = forecast_linear(coef, intercept, last_rows, last_prices, prediction_days, list(names))
+    with np.errstate(invalid='ignore'):
+        return (paths[:, -1] / last_prices) ** (1.0 / prediction_days) - 1
+
+
+def portfolio_stats(weights, covariance, expected_returns=None, periods=252):
+    """Annualised volatility (and return, if expected returns are given)"""
+    stats = {'volatility': float(np.sqrt(weights @ covariance @ weights * periods))}
+    if expected_returns is not None:
+        stats['return'] = float(weights @ expected_returns * periods)
+    return stats
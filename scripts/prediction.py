@@ -1,22 +1,40 @@
-import yfinance as yf
+import os
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+from bar_store import get_default_store
+from metrics import span, record_rows, profile_run
+from forecast import FEATURE_COLUMNS, forecast_linear
+from features import FeatureTable, CompactFeatures, FEATURE_SETS
+from simulation import confidence_band, direct_band
+from model_registry import get_default_registry
 
-def get_stock_data(symbol, days=365):
+# Bump whenever prepare_features changes, so cached models are retrained
+FEATURE_VERSION = 1
+
+def get_stock_data(symbol, days=365, store=None, interval='1d'):
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
-    data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+    if interval != '1d':
+        # Intraday bars: an IntradayStore, which raises past MAX_FRAME_BARS (iter_chunks streams those)
+        from intraday import get_default_intraday_store
+        store = store or get_default_intraday_store()
+        return store.get(symbol, start_date, end_date + timedelta(days=1), interval)
     
-    if isinstance(data.columns, pd.MultiIndex):
-        data.columns = [col[0] for col in data.columns.values]
+    # Bars come from the local store, which only downloads the missing days
+    if store is None:
+        store = get_default_store()
     
-    return data
+    return store.get(symbol, start_date, end_date)
 
-def prepare_features(data):
+def prepare_features(data, backend='pandas'):
+    # backend='numpy' computes the same columns with the indicator kernels
+    if backend == 'numpy':
+        return prepare_features_many([data])[0]
+    if backend != 'pandas':
+        raise ValueError(f"Unknown backend: {backend}")
+    
     features = pd.DataFrame()
     
     # Basic price features
@@ -43,11 +61,42 @@ def prepare_features(data):
     
     return features
 
-def train_model(features):
+def prepare_features_many(data_list, compact=False):
+    # Features for many symbols in one pass through the feature registry;
+    # compact=True gives float32 CompactFeatures instead of DataFrames
+    table = FeatureTable(data_list)
+    if compact:
+        return table.compact(FEATURE_SETS['linear'])
+    return table.frames(FEATURE_SETS['linear'])
+
+def train_model(features, mode='recursive', horizon=30):
+    """Fit next-day prices ('recursive') or every day 1..horizon at once ('direct')
+
+    A direct model has one row of coefficients per day ahead, so its
+    forecast needs no feedback loop. Returns (model, test_score, feature_names).
+    """
+    # Imported here so prediction-only tools start quickly
+    from sklearn.linear_model import LinearRegression
+    
+    # Compact features train on views of one design matrix
+    if isinstance(features, CompactFeatures):
+        return _train_compact(features, mode, horizon)
+    
     # Prepare data for training
-    X = features[['volume', 'high', 'low', 'ma5', 'ma20', 'price_change', 'volume_change', 'trend', 'day_of_week']]
-    y = features['price'].shift(-1).dropna()  # Next day's price
-    X = X.iloc[:-1]
+    X = features[FEATURE_COLUMNS]
+    if mode == 'recursive':
+        y = features['price'].shift(-1).dropna()  # Next day's price
+        X = X.iloc[:-1]
+    elif mode == 'direct':
+        # Column h-1 is the price h days after each row
+        price = features['price'].to_numpy()
+        if len(price) <= horizon:
+            raise ValueError(f"Need more than {horizon} feature rows for a {horizon}-day direct model")
+        X = X.iloc[:-horizon]
+        y = pd.DataFrame(np.lib.stride_tricks.sliding_window_view(price[1:], horizon)[:len(X)],
+                         index=X.index, columns=range(1, horizon + 1))
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
     
     # Split into train and test
     split_point = int(len(X) * 0.8)
@@ -60,12 +109,88 @@ def train_model(features):
     model = LinearRegression()
     model.fit(X_train, y_train)
     
-    # Test accuracy
+    # Test accuracy (averaged over the days ahead for a direct model)
     test_score = model.score(X_test, y_test)
     
     return model, test_score, X.columns
 
+def _train_compact(features, mode='recursive', horizon=30):
+    from sklearn.linear_model import LinearRegression
+    
+    # The solve itself runs in float64: raw volumes next to ratios are too
+    # badly scaled for a float32 least-squares fit
+    X = features.matrix(FEATURE_COLUMNS, np.float64)
+    price = features.column('price').astype(np.float64)
+    if mode == 'recursive':
+        X, y = X[:-1], price[1:]
+    elif mode == 'direct':
+        if len(price) <= horizon:
+            raise ValueError(f"Need more than {horizon} feature rows for a {horizon}-day direct model")
+        X = X[:-horizon]
+        y = np.lib.stride_tricks.sliding_window_view(price[1:], horizon)[:len(X)]
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+    
+    # Same 80/20 split as train_model, as views rather than copies
+    split_point = int(len(X) * 0.8)
+    model = LinearRegression()
+    model.fit(X[:split_point], y[:split_point])
+    test_score = model.score(X[split_point:], y[split_point:])
+    return model, test_score, pd.Index(FEATURE_COLUMNS)
+
+def get_trained_model(symbol, data, features, mode='recursive', horizon=30, registry=None, window=None):
+    # Reuse the model trained on exactly these bars, if there is one
+    if registry is None:
+        registry = get_default_registry()
+    model_type = 'linear' if mode == 'recursive' else f'linear-direct{horizon}'
+    key = registry.key(symbol, data, model_type, FEATURE_VERSION, window)
+    
+    # Concurrent requests for the same bars wait for one training run
+    with registry.lock(key):
+        cached = registry.get(key)
+        if cached is not None:
+            return cached
+        
+        model, accuracy, feature_names = train_model(features, mode, horizon)
+        registry.put(key, model, accuracy, feature_names)
+    return model, accuracy, feature_names
+
 def predict_future_prices(model, features, feature_names, days=30):
+    # Only the last row is needed, as a DataFrame
+    if isinstance(features, CompactFeatures):
+        features = features.rows(-1).to_frame()
+    
+    # Direct models already hold one set of coefficients per day ahead
+    if hasattr(model, 'coef_') and np.ndim(model.coef_) == 2:
+        return _predict_direct(model, features, feature_names, days)
+    
+    # Linear models are forecast straight from their coefficients
+    if hasattr(model, 'coef_') and np.ndim(model.coef_) == 1:
+        last_row = features[list(feature_names)].to_numpy(dtype=np.float64)[-1]
+        predictions = forecast_linear(model.coef_, model.intercept_, last_row,
+                                      features['price'].iloc[-1], days, list(feature_names))
+        return predictions.tolist()
+    
+    return _predict_recursive(model, features, feature_names, days)
+
+def predict_future_prices_many(models, features_list, feature_names, days=30):
+    # One forecast per symbol, all computed together; returns (n_symbols, days)
+    coef = np.array([model.coef_ for model in models])
+    intercept = np.array([model.intercept_ for model in models])
+    last_rows = np.array([f[list(feature_names)].to_numpy(dtype=np.float64)[-1] for f in features_list])
+    last_prices = np.array([f['price'].iloc[-1] for f in features_list])
+    return forecast_linear(coef, intercept, last_rows, last_prices, days, list(feature_names))
+
+def _predict_direct(model, features, feature_names, days=30):
+    horizon = len(model.coef_)
+    if days > horizon:
+        raise ValueError(f"Model was trained for {horizon} days ahead, not {days}")
+    
+    # One matrix multiply for the whole horizon
+    last_row = features[list(feature_names)].to_numpy(dtype=np.float64)[-1]
+    return (model.coef_[:days] @ last_row + model.intercept_[:days]).tolist()
+
+def _predict_recursive(model, features, feature_names, days=30):
     predictions = []
     last_row = features.iloc[-1:][feature_names].copy()
     
@@ -90,72 +215,128 @@ def predict_future_prices(model, features, feature_names, days=30):
     
     return predictions
 
-def analyze_stock(symbol='AAPL', prediction_days=30):
-    print(f"Analyzing {symbol}...")
+def analyze_stock(symbol='AAPL', prediction_days=30, profile=None, show=True, output=None):
+    # Sample the whole run when asked, e.g. STOCK_PREDICTOR_PROFILE=profile.txt
+    profile = profile or os.environ.get('STOCK_PREDICTOR_PROFILE')
+    if profile:
+        with profile_run(profile):
+            return _analyze_stock(symbol, prediction_days, show, output)
+    return _analyze_stock(symbol, prediction_days, show, output)
+
+def forecast_symbol(symbol, prediction_days=30, days=365, store=None, verbose=False, band_paths=10_000, seed=None,
+                    mode='recursive', registry=None):
+    # Everything up to the forecast, without plotting; returns (data, result)
+    if verbose:
+        print(f"Analyzing {symbol}...")
     
     # Get data
-    data = get_stock_data(symbol)
-    print(f"Got {len(data)} days of data")
+    with span('download', symbol):
+        data = get_stock_data(symbol, days, store)
+    record_rows('download', len(data), symbol)
+    if len(data) == 0:
+        raise ValueError(f"No data found for {symbol}")
+    if verbose:
+        print(f"Got {len(data)} days of data")
     
     # Prepare features
-    features = prepare_features(data)
-    print(f"Prepared {len(features)} feature rows")
+    with span('prepare_features', symbol):
+        features = prepare_features(data)
+    record_rows('prepare_features', len(features), symbol)
+    if verbose:
+        print(f"Prepared {len(features)} feature rows")
     
     # Train model
-    model, accuracy, feature_names = train_model(features)
-    print(f"Model trained with accuracy: {accuracy:.2%}")
+    with span('train_model', symbol):
+        model, accuracy, feature_names = get_trained_model(symbol, data, features, mode, prediction_days,
+                                                           registry, window=days)
+    if verbose:
+        print(f"Model trained with accuracy: {accuracy:.2%}")
     
     # Make predictions
-    predictions = predict_future_prices(model, features, feature_names, prediction_days)
+    with span('predict_future_prices', symbol):
+        predictions = predict_future_prices(model, features, feature_names, prediction_days)
+    
+    # 90% band from the model's holdout errors, simulated for a recursive model
+    lower = upper = None
+    with span('confidence_band', symbol):
+        if mode == 'direct':
+            lower, upper = direct_band(model, features, feature_names, prediction_days)
+        elif band_paths and np.ndim(getattr(model, 'coef_', None)) == 1:
+            lower, upper = confidence_band(model, features, feature_names, prediction_days,
+                                           band_paths, seed=seed)
     
     # Current info
     current_price = float(data['Close'].iloc[-1])
     predicted_price = predictions[-1]
     change_percent = ((predicted_price - current_price) / current_price) * 100
     
-    print(f"\nCurrent Price: ${current_price:.2f}")
-    print(f"Predicted Price ({prediction_days} days): ${predicted_price:.2f}")
-    print(f"Expected Change: {change_percent:+.1f}%")
-    
     # Create prediction dates
     last_date = data.index[-1]
     future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=prediction_days, freq='B')
     
-    # Plot results
-    plt.figure(figsize=(12, 6))
-    
-    # Plot historical (last 60 days)
-    recent_data = data.tail(60)
-    plt.plot(recent_data.index, recent_data['Close'], label='Historical Price', color='blue', linewidth=2)
-    
-    # Plot predictions
-    plt.plot(future_dates, predictions, label='Predicted Price', color='red', linestyle='--', linewidth=2)
-    
-    # 10% confidence band
-    confidence = np.array(predictions) * 0.1  
-    plt.fill_between(future_dates, 
-                     np.array(predictions) - confidence, 
-                     np.array(predictions) + confidence, 
-                     color='red', alpha=0.2, label='Confidence Band')
-    
-    plt.title(f'{symbol} Price Prediction', fontsize=14)
-    plt.xlabel('Date')
-    plt.ylabel('Price ($)')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
-    
-    return {
+    return data, {
         'current_price': current_price,
         'predicted_price': predicted_price,
         'change_percent': change_percent,
         'predictions': predictions,
         'accuracy': accuracy,
-        'dates': future_dates
+        'dates': future_dates,
+        'lower': lower,
+        'upper': upper
     }
 
+def _analyze_stock(symbol, prediction_days, show=True, output=None):
+    data, result = forecast_symbol(symbol, prediction_days, verbose=True)
+    
+    print(f"\nCurrent Price: ${result['current_price']:.2f}")
+    print(f"Predicted Price ({prediction_days} days): ${result['predicted_price']:.2f}")
+    print(f"Expected Change: {result['change_percent']:+.1f}%")
+    
+    if show or output:
+        plot_prediction(symbol, data, result['predictions'], result['dates'], output,
+                        result['lower'], result['upper'])
+    
+    return result
+
+def plot_prediction(symbol, data, predictions, future_dates, output=None, lower=None, upper=None):
+    # With an output path the chart is rendered off screen (PNG/SVG by extension),
+    # otherwise it opens in a pyplot window
+    with span('plot', symbol):
+        if output:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            fig = Figure(figsize=(12, 6))
+            FigureCanvasAgg(fig)
+        else:
+            import matplotlib.pyplot as plt
+            fig = plt.figure(figsize=(12, 6))
+        ax = fig.add_subplot()
+        
+        # Plot historical (last 60 days)
+        recent_data = data.tail(60)
+        ax.plot(recent_data.index, recent_data['Close'], label='Historical Price', color='blue', linewidth=2)
+        
+        # Plot predictions
+        ax.plot(future_dates, predictions, label='Predicted Price', color='red', linestyle='--', linewidth=2)
+        
+        # Simulated confidence band
+        if lower is not None:
+            ax.fill_between(future_dates, lower, upper,
+                            color='red', alpha=0.2, label='90% Confidence Band')
+        
+        ax.set_title(f'{symbol} Price Prediction', fontsize=14)
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Price ($)')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(axis='x', labelrotation=45)
+        fig.tight_layout()
+    
+    if output:
+        fig.savefig(output)
+    else:
+        plt.show()
+
 if __name__ == "__main__":
     result = analyze_stock('AAPL', 30)
     
@@ -0,0 +1,264 @@
+"""
+Multi-resolution OHLCV pyramid for charts and range summaries
+
+The bars are kept at their own resolution plus coarser aggregates (daily
+-> weekly -> monthly, or minute -> hourly -> daily for intraday bars),
+each with the MA20/MA50 lines the chart draws. A chart of any date range
+reads the finest level that fits the canvas, so drawing 20 years of daily
+bars touches ~240 monthly rows instead of 5,000 days and recomputes no
+averages:
+
+    pyramid = BarPyramid(bars)                  # bars as get_stock_data returns them
+    pyramid.update(new_bars)                    # later bars: only the last buckets are redone
+    data = pyramid.view(start, end, max_points=1000)
+    info = pyramid.summary(start, end)
+
+view() and summary() binary-search the dates, so their cost depends on
+the rows returned, not on the length of the history. The moving averages
+are always those of the base bars (20 days, not 20 weeks), sampled at each
+bucket's last bar, so the lines look the same at every level.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from indicators import sma
+
+# Coarser levels built on top of each base interval
+LEVELS = {
+    '1d': ('1d', '1wk', '1mo'),
+    '1h': ('1h', '1d', '1wk'),
+    '15m': ('15m', '1h', '1d'),
+    '5m': ('5m', '1h', '1d'),
+    '1m': ('1m', '1h', '1d'),
+}
+MA_WINDOWS = (20, 50)
+_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'MA20', 'MA50')
+_DAY = np.int64(86_400 * 10 ** 9)
+
+
+def bucket_start(dates, level):
+    """Start of the bucket (as int64 ns) each date falls into"""
+    dates = np.asarray(dates, dtype=np.int64)
+    if level == '1h':
+        return dates - dates % np.int64(3_600 * 10 ** 9)
+    days = dates // _DAY
+    if level == '1d':
+        return days * _DAY
+    if level == '1wk':
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        return (days - (days + 3) % 7) * _DAY
+    if level == '1mo':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[ns]').astype(np.int64)
+    raise ValueError(f"Unknown level: {level}")
+
+
+class _Level:
+    """Growable column arrays (capacity doubles, so appends are amortised O(1))"""
+
+    def __init__(self, columns, capacity=64):
+        self.n = 0
+        self.data = {name: np.empty(capacity, dtype=np.int64 if name == 'dates' else np.float64)
+                     for name in columns}
+
+    def __getitem__(self, name):
+        return self.data[name][:self.n]
+
+    def replace_tail(self, start, values):
+        """Drop rows from start on and append `values` ({column: array})"""
+        n = start + len(values['dates'])
+        capacity = len(self.data['dates'])
+        if n > capacity:
+            capacity = max(n, 2 * capacity)
+            for name, column in self.data.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:start] = column[:start]
+                self.data[name] = grown
+        for name, column in values.items():
+            self.data[name][start:n] = column
+        self.n = n
+
+
+class BarPyramid:
+    """OHLCV bars plus coarser aggregates, kept up to date incrementally"""
+
+    def __init__(self, bars, interval='1d'):
+        if interval not in LEVELS:
+            raise ValueError(f"Unknown interval: {interval}")
+        self.interval = interval
+        self.levels = {name: _Level(('dates',) + _COLUMNS) for name in LEVELS[interval]}
+        # Running volume total on the base level, for average volume over any range
+        self.levels[interval].data['CumVolume'] = np.empty(64)
+        self._lock = threading.Lock()
+        self.update(bars)
+
+    @property
+    def base(self):
+        return self.levels[self.interval]
+
+    def __len__(self):
+        return self.base.n
+
+    @property
+    def first_date(self):
+        return pd.Timestamp(self.base['dates'][0]) if len(self) else None
+
+    @property
+    def last_date(self):
+        return pd.Timestamp(self.base['dates'][-1]) if len(self) else None
+
+    def update(self, bars):
+        """Add bars (a DataFrame like get_stock_data's); returns the number of new rows
+
+        The first bar may repeat the last stored date, which replaces that
+        bar (e.g. today's, revised while still trading); earlier bars raise
+        ValueError. Only the new base rows and the last bucket of every coarser
+        level are recomputed.
+        """
+        if len(bars) == 0:
+            return 0
+        dates = pd.DatetimeIndex(bars.index).values.astype('datetime64[ns]').astype(np.int64)
+        with self._lock:
+            base = self.base
+            if base.n and dates[0] < base['dates'][-1]:
+                raise ValueError("update() only appends; build a new pyramid for earlier bars")
+            start = int(np.searchsorted(base['dates'], dates[0]))
+            values = {'dates': dates}
+            for name in ('Open', 'High', 'Low', 'Close', 'Volume'):
+                values[name] = bars[name].to_numpy(dtype=np.float64)
+            previous = base['CumVolume'][start - 1] if start else 0.0
+            values['CumVolume'] = np.cumsum(values['Volume']) + previous
+            base.replace_tail(start, values)
+            self._moving_averages(start)
+
+            for name in LEVELS[self.interval][1:]:
+                self._aggregate(self.levels[name], name, start)
+        return len(dates)
+
+    def _moving_averages(self, start):
+        # The new rows need the 49 closes before them
+        base = self.base
+        first = max(start - (max(MA_WINDOWS) - 1), 0)
+        close = base['Close'][first:]
+        for window in MA_WINDOWS:
+            base[f"MA{window}"][start:] = sma(close, window)[start - first:]
+
+    def _aggregate(self, level, name, changed):
+        # Redo this level from the bucket holding the first changed base row
+        base = self.base
+        key = bucket_start(base['dates'][changed:changed + 1], name)[0]
+        cut = int(np.searchsorted(level['dates'], key))
+        first = int(np.searchsorted(base['dates'], key))
+
+        dates = base['dates'][first:]
+        keys = bucket_start(dates, name)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+        values = {
+            'dates': keys[starts],
+            'Open': base['Open'][first:][starts],
+            'High': np.maximum.reduceat(base['High'][first:], starts),
+            'Low': np.minimum.reduceat(base['Low'][first:], starts),
+            'Volume': np.add.reduceat(base['Volume'][first:], starts),
+        }
+        # Close and the averages as of each bucket's last bar
+        for column in ('Close', 'MA20', 'MA50'):
+            values[column] = base[column][first:][ends]
+        level.replace_tail(cut, values)
+
+    def _range(self, level, start, end):
+        dates = level['dates']
+        lo = int(np.searchsorted(dates, pd.Timestamp(start).value)) if start is not None else 0
+        hi = int(np.searchsorted(dates, pd.Timestamp(end).value)) if end is not None else level.n
+        return lo, hi
+
+    def level_for(self, start=None, end=None, max_points=1000):
+        """Finest level with at most max_points rows in [start, end) (else the coarsest)"""
+        for name in LEVELS[self.interval]:
+            lo, hi = self._range(self.levels[name], start, end)
+            if hi - lo <= max_points:
+                return name
+        return name
+
+    def view(self, start=None, end=None, max_points=1000, level=None, pad=0):
+        """Bars in [start, end) from the finest level that fits max_points
+
+        Columns are those of get_stock_data plus MA20 and MA50, as
+        gui.load_chart_data used to add them; pad adds that many rows on
+        either side. The level used is in .attrs['level'].
+        """
+        with self._lock:
+            name = level or self.level_for(start, end, max_points)
+            bars = self.levels[name]
+            lo, hi = self._range(bars, start, end)
+            lo, hi = max(lo - pad, 0), min(hi + pad, bars.n)
+            data = pd.DataFrame({column: bars[column][lo:hi].copy() for column in _COLUMNS},
+                                index=pd.DatetimeIndex(bars['dates'][lo:hi].astype('datetime64[ns]'), name='Date'))
+        data = data[['Close', 'High', 'Low', 'Open', 'Volume', 'MA20', 'MA50']]
+        data.attrs['level'] = name
+        return data
+
+    def summary(self, start=None, end=None):
+        """Current price, total change (%) and average volume of the base bars in [start, end)
+
+        None if there are no bars in the range.
+        """
+        with self._lock:
+            base = self.base
+            lo, hi = self._range(base, start, end)
+            if hi <= lo:
+                return None
+            close, volume = base['Close'], base['CumVolume']
+            first_price, current_price = close[lo], close[hi - 1]
+            total_volume = volume[hi - 1] - (volume[lo - 1] if lo else 0.0)
+            return {
+                'first_price': float(first_price),
+                'current_price': float(current_price),
+                'change_percent': float((current_price - first_price) / first_price * 100),
+                'average_volume': float(total_volume / (hi - lo)),
+                'bars': hi - lo,
+            }
+
+
+class PyramidCache:
+    """One BarPyramid per symbol, topped up from a bar store
+
+    get() only goes to the store for days after the pyramid's last bar
+    (and the store itself only downloads what it does not have), so
+    switching between ranges that are already covered never touches it.
+    An empty result is not cached, and the covered range ends after the
+    last bar, so a failed download or a future end date is asked for again.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.pyramids = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, symbol):
+        # One lock per symbol so downloads for different symbols don't wait on each other
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def get(self, symbol, start, end):
+        symbol = symbol.upper()
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        with self._lock(symbol):
+            pyramid, covered = self.pyramids.get(symbol, (None, None))
+            if pyramid is None or start < covered[0]:
+                # Nothing yet, or an earlier start: build from scratch
+                end = max(end, covered[1]) if covered else end
+                pyramid = BarPyramid(self.store.get(symbol, start, end))
+                if len(pyramid) == 0:
+                    return pyramid
+                covered = (start, end)
+            elif end > covered[1]:
+                # From the last stored bar on, so a bar revised since is replaced too
+                pyramid.update(self.store.get(symbol, pyramid.last_date, end))
+                covered = (covered[0], end)
+            # Days after the last bar may still bring bars
+            covered = (covered[0], min(covered[1], pyramid.last_date + pd.Timedelta(days=1)))
+            self.pyramids[symbol] = (pyramid, covered)
+        return pyramid
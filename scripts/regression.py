@@ -0,0 +1,221 @@
+"""
+Linear regression helpers that work on plain NumPy arrays
+
+train_models_batch fits the same model as prediction.train_model for many
+symbols at once by solving all of the least-squares problems together.
+OnlineLinearModel keeps the sufficient statistics of the same regression
+so a new bar updates the fit without refitting the whole history.
+"""
+from collections import deque
+
+import numpy as np
+
+from forecast import FEATURE_COLUMNS
+
+
+def design_matrix(features, feature_names=FEATURE_COLUMNS):
+    # Same rows as train_model: today's features -> tomorrow's price
+    X = features[list(feature_names)].to_numpy(dtype=np.float64)[:-1]
+    y = features['price'].to_numpy(dtype=np.float64)[1:]
+    return X, y
+
+
+def direct_design_matrix(features, horizon, feature_names=FEATURE_COLUMNS):
+    # Same rows as train_model(mode='direct'): today's features -> the next `horizon` prices
+    price = features['price'].to_numpy(dtype=np.float64)
+    X = features[list(feature_names)].to_numpy(dtype=np.float64)[:-horizon]
+    Y = np.lib.stride_tricks.sliding_window_view(price[1:], horizon)[:len(X)]
+    return X, Y
+
+
+def stack_design_matrices(features_list, feature_names=FEATURE_COLUMNS):
+    """Stack per-symbol design matrices into (symbols, rows, features)
+
+    Shorter histories are zero padded at the end; lengths gives the number
+    of real rows for each symbol.
+    """
+    pairs = [design_matrix(features, feature_names) for features in features_list]
+    lengths = np.array([len(y) for _, y in pairs])
+    n_rows = lengths.max() if len(pairs) else 0
+
+    X = np.zeros((len(pairs), n_rows, len(feature_names)))
+    y = np.zeros((len(pairs), n_rows))
+    for i, (X_i, y_i) in enumerate(pairs):
+        X[i, :len(y_i)] = X_i
+        y[i, :len(y_i)] = y_i
+
+    return X, y, lengths
+
+
+def _solve_centered(Xs, yc, method):
+    if method == 'normal':
+        gram = np.matmul(Xs.transpose(0, 2, 1), Xs)
+        rhs = np.matmul(Xs.transpose(0, 2, 1), yc[:, :, None])
+        try:
+            return np.linalg.solve(gram, rhs)[:, :, 0]
+        except np.linalg.LinAlgError:
+            # Some symbol has collinear columns, fall back to the SVD solve
+            pass
+    return np.matmul(np.linalg.pinv(Xs), yc[:, :, None])[:, :, 0]
+
+
+def train_models_batch(features_list, feature_names=FEATURE_COLUMNS, method='lstsq'):
+    """Fit one linear model per symbol with an 80/20 holdout, all at once
+
+    method is 'lstsq' (batched SVD, handles collinear features like
+    sklearn) or 'normal' (batched normal equations, faster).
+    Returns (coef, intercept, test_scores, feature_names) where coef is
+    (symbols, features) and test_scores is the holdout R^2 per symbol.
+    """
+    X, y, lengths = stack_design_matrices(features_list, feature_names)
+    rows = np.arange(X.shape[1])
+    split = (lengths * 0.8).astype(int)
+
+    train = (rows[None, :] < split[:, None]).astype(np.float64)
+    test = (rows[None, :] >= split[:, None]) & (rows[None, :] < lengths[:, None])
+
+    # Center and scale on the training rows, like LinearRegression does
+    n_train = split[:, None].astype(np.float64)
+    x_mean = np.einsum('st,stk->sk', train, X) / n_train
+    y_mean = np.einsum('st,st->s', train, y) / split
+
+    Xc = (X - x_mean[:, None, :]) * train[:, :, None]
+    yc = (y - y_mean[:, None]) * train
+    scale = np.sqrt(np.einsum('stk,stk->sk', Xc, Xc))
+    scale[scale == 0] = 1.0
+    Xc /= scale[:, None, :]
+
+    coef = _solve_centered(Xc, yc, method) / scale
+    intercept = y_mean - np.einsum('sk,sk->s', x_mean, coef)
+
+    # Holdout R^2 on the last 20% of each symbol
+    pred = np.einsum('stk,sk->st', X, coef) + intercept[:, None]
+    n_test = test.sum(axis=1)
+    y_test_mean = np.where(test, y, 0).sum(axis=1) / n_test
+    ss_res = np.where(test, (y - pred) ** 2, 0).sum(axis=1)
+    ss_tot = np.where(test, (y - y_test_mean[:, None]) ** 2, 0).sum(axis=1)
+    scores = 1 - ss_res / ss_tot
+
+    return coef, intercept, scores, list(feature_names)
+
+
+class OnlineLinearModel:
+    """Linear regression that is updated one (features, next price) row at a time
+
+    Keeps the row count, the feature/target means and the centered
+    cross-products (X'X, X'y) so adding or removing a row is a rank-1
+    update. With window=None the fit expands forever; with window=N the
+    oldest row is removed once more than N rows have been seen.
+    The coefficients are solved lazily from the k x k statistics, so an
+    update never touches the history.
+    """
+
+    def __init__(self, n_features=len(FEATURE_COLUMNS), window=None):
+        self.window = window
+        self.n = 0
+        self.x_mean = np.zeros(n_features)
+        self.y_mean = 0.0
+        self.xx = np.zeros((n_features, n_features))
+        self.xy = np.zeros(n_features)
+        self._rows = deque()
+        self._coef = None
+
+    @classmethod
+    def from_features(cls, features, window=None, feature_names=FEATURE_COLUMNS):
+        model = cls(len(feature_names), window)
+        model.partial_fit(*design_matrix(features, feature_names))
+        return model
+
+    def add(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        self.n += 1
+        dx = x - self.x_mean
+        dy = y - self.y_mean
+        self.x_mean += dx / self.n
+        self.y_mean += dy / self.n
+        # x - new_mean == dx * (n - 1) / n, so this stays a symmetric rank-1 update
+        scale = (self.n - 1) / self.n
+        self.xx += scale * np.outer(dx, dx)
+        self.xy += scale * dx * dy
+        self._coef = None
+
+        if self.window is not None:
+            self._rows.append((x, y))
+            if len(self._rows) > self.window:
+                self.remove(*self._rows.popleft())
+
+    def remove(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        if self.n <= 1:
+            self.n = 0
+            self.x_mean[:] = 0
+            self.y_mean = 0.0
+            self.xx[:] = 0
+            self.xy[:] = 0
+            self._coef = None
+            return
+
+        dx = x - self.x_mean
+        dy = y - self.y_mean
+        scale = self.n / (self.n - 1)
+        self.xx -= scale * np.outer(dx, dx)
+        self.xy -= scale * dx * dy
+        self.n -= 1
+        self.x_mean -= dx / self.n
+        self.y_mean -= dy / self.n
+        self._coef = None
+
+    def partial_fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if self.window is not None or len(y) == 0:
+            # A window has to remember every row to drop it later
+            for x_row, y_value in zip(X, y):
+                self.add(x_row, y_value)
+            return self
+
+        # Merge the block's own means and cross-products in one step (Chan et al.)
+        n_block = len(y)
+        x_mean, y_mean = X.mean(axis=0), y.mean()
+        Xc, yc = X - x_mean, y - y_mean
+        n = self.n + n_block
+        dx, dy = x_mean - self.x_mean, y_mean - self.y_mean
+        weight = self.n * n_block / n
+        self.xx += Xc.T @ Xc + weight * np.outer(dx, dx)
+        self.xy += Xc.T @ yc + weight * dx * dy
+        self.x_mean += dx * n_block / n
+        self.y_mean += dy * n_block / n
+        self.n = n
+        self._coef = None
+        return self
+
+    def observe(self, features):
+        # A new bar gives the target for the previous feature row
+        X, y = design_matrix(features.iloc[-2:])
+        self.add(X[0], y[0])
+
+    def _solve(self):
+        # Solve on the correlation scale; raw volume and trend differ by ~1e10
+        scale = np.sqrt(np.diag(self.xx))
+        scale[scale == 0] = 1.0
+        corr = self.xx / np.outer(scale, scale)
+        coef = np.linalg.lstsq(corr, self.xy / scale, rcond=None)[0]
+        self._coef = coef / scale
+
+    @property
+    def coef_(self):
+        if self._coef is None:
+            self._solve()
+        return self._coef
+
+    @property
+    def intercept_(self):
+        return self.y_mean - self.x_mean @ self.coef_
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+    def score(self, X, y):
+        y = np.asarray(y, dtype=np.float64)
+        residual = y - self.predict(X)
+        return 1 - (residual ** 2).sum() / ((y - y.mean()) ** 2).sum()
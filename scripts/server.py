@@ -0,0 +1,314 @@
+"""
+Local prediction service over HTTP
+
+    python server.py --port 8080
+    curl 'http://localhost:8080/predict?symbol=AAPL&days=30'
+
+Runs on asyncio with no dependencies beyond the pipeline itself. Each
+request runs forecast_symbol (download -> features -> model -> forecast)
+on a worker pool, so the event loop only parses requests and writes
+responses. Identical requests that arrive while one is being computed
+wait for that one instead of starting their own, and finished results
+are served from memory until their TTL runs out.
+
+Endpoints (all GET, all JSON):
+    /predict?symbol=AAPL[&days=30&history=365&mode=recursive]
+    /health     cache and request counters
+    /metrics    metrics.summary() for the process
+
+    python server.py --load-test 500 --source synthetic   # offline load test
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from metrics import count, summary
+
+# Tickers such as AAPL, BRK.B, BF-B, ^GSPC, EURUSD=X; never '.' or '..'
+SYMBOL_PATTERN = re.compile(r'^[A-Za-z0-9^][A-Za-z0-9.\-^=]{0,14}$')
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class PredictionService:
+    """Coalesced, TTL-cached forecasts computed on a worker pool"""
+
+    def __init__(self, store=None, registry=None, ttl=300.0, max_entries=1024, workers=4, executor=None,
+                 clock=time.monotonic):
+        self.store = store
+        self.registry = registry
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.executor = executor or ThreadPoolExecutor(workers, thread_name_prefix='predict')
+        self.clock = clock
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.stats = {'requests': 0, 'hits': 0, 'coalesced': 0, 'computed': 0, 'errors': 0}
+
+    def key(self, symbol, days=30, history=365, mode='recursive'):
+        return (symbol.upper(), int(days), int(history), mode)
+
+    async def predict(self, symbol, days=30, history=365, mode='recursive'):
+        """JSON-ready forecast, as cli.to_json gives it"""
+        key = self.key(symbol, days, history, mode)
+        self.stats['requests'] += 1
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            expires, result = cached
+            if self.clock() < expires:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                count('prediction_cache', 'hit', key[0])
+                return result
+            del self._cache[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            count('prediction_cache', 'coalesced', key[0])
+        else:
+            count('prediction_cache', 'miss', key[0])
+            task = asyncio.get_running_loop().create_task(self._compute(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # One caller giving up must not cancel the computation the others wait on
+        return await asyncio.shield(task)
+
+    async def _compute(self, key):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, self._forecast, *key)
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        self.stats['computed'] += 1
+
+        # Failures are not cached, so the next request tries again
+        self._cache[key] = (self.clock() + self.ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    def _forecast(self, symbol, days, history, mode):
+        # Runs on a worker thread
+        from cli import to_json
+        from prediction import forecast_symbol
+
+        _, result = forecast_symbol(symbol, days, history, self.store, mode=mode, registry=self.registry)
+        return to_json(symbol, result)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_predict(query):
+    params = parse_qs(query)
+    symbol = params.get('symbol', [''])[0].strip()
+    if not symbol:
+        raise ValueError("symbol is required")
+    # The symbol becomes part of cache and CSV file paths
+    if not SYMBOL_PATTERN.match(symbol):
+        raise ValueError(f"Invalid symbol: {symbol!r}")
+    days = int(params.get('days', ['30'])[0])
+    history = int(params.get('history', ['365'])[0])
+    mode = params.get('mode', ['recursive'])[0]
+    if not 1 <= days <= 365:
+        raise ValueError("days must be between 1 and 365")
+    if history < 60:
+        raise ValueError("history must be at least 60 days")
+    if mode not in ('recursive', 'direct'):
+        raise ValueError(f"Unknown mode: {mode}")
+    return symbol, days, history, mode
+
+
+async def _respond(service, method, target):
+    """(status, body) for one request"""
+    if method != 'GET':
+        return 405, {'error': f"{method} not supported"}
+    url = urlsplit(target)
+    if url.path == '/health':
+        return 200, {'status': 'ok', 'cached': len(service._cache), 'inflight': len(service._inflight),
+                     **service.stats}
+    if url.path == '/metrics':
+        return 200, summary()
+    if url.path != '/predict':
+        return 404, {'error': f"No such endpoint: {url.path}"}
+
+    try:
+        symbol, days, history, mode = _parse_predict(url.query)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    try:
+        return 200, await service.predict(symbol, days, history, mode)
+    except Exception as e:
+        return 500, {'symbol': symbol.upper(), 'error': str(e)}
+
+
+async def _handle_connection(service, reader, writer):
+    # HTTP/1.1 with keep-alive; request bodies are ignored
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                length = -1
+            if length > 0:
+                await reader.readexactly(length)
+
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+            except ValueError:
+                status, body, version = 400, {'error': 'Malformed request line'}, 'HTTP/1.0'
+            else:
+                if length < 0:
+                    status, body = 400, {'error': 'Malformed Content-Length header'}
+                else:
+                    status, body = await _respond(service, method, target)
+
+            # Without a valid length the body cannot be skipped, so the connection ends here
+            keep_alive = (version == 'HTTP/1.1' and length >= 0
+                          and headers.get('connection', '').lower() != 'close')
+            payload = json.dumps(body).encode()
+            writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                          f"Content-Type: application/json\r\n"
+                          f"Content-Length: {len(payload)}\r\n"
+                          f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(service, host='127.0.0.1', port=8080):
+    """asyncio.Server for `service`; port 0 picks a free port"""
+    return await asyncio.start_server(lambda r, w: _handle_connection(service, r, w), host, port)
+
+
+async def fetch(host, port, target, reader_writer=None):
+    """GET target and return (status, json body); reuses an open (reader, writer) if given"""
+    reader, writer = reader_writer or await asyncio.open_connection(host, port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = json.loads(await reader.readexactly(length))
+    if reader_writer is None:
+        writer.close()
+    return status, body
+
+
+async def load_test(service, symbols, n_requests=500, concurrency=50, days=30):
+    """Fire n_requests over `concurrency` keep-alive connections; returns a report dict"""
+    server = await start_server(service, port=0)
+    host, port = server.sockets[0].getsockname()[:2]
+    latencies = []
+    statuses = []
+    queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(f"/predict?symbol={symbols[i % len(symbols)]}&days={days}")
+
+    async def client():
+        connection = await asyncio.open_connection(host, port)
+        try:
+            while not queue.empty():
+                target = queue.get_nowait()
+                start = time.perf_counter()
+                status, _ = await fetch(host, port, target, connection)
+                latencies.append(time.perf_counter() - start)
+                statuses.append(status)
+        finally:
+            connection[1].close()
+
+    start = time.perf_counter()
+    async with server:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    return {
+        'requests': n_requests,
+        'seconds': elapsed,
+        'requests_per_second': n_requests / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'max_ms': float(latencies.max() * 1000),
+        'ok': statuses.count(200),
+        'computed': service.stats['computed'],
+        'coalesced': service.stats['coalesced'],
+        'hits': service.stats['hits'],
+    }
+
+
+def main(argv=None):
+    from cli import add_monitoring_args, make_store, start_monitoring
+    from model_registry import ModelRegistry, default_registry_dir
+
+    parser = argparse.ArgumentParser(description='Serve predictions over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--source', default='yahoo', help="'yahoo', 'csv:<dir>' or 'synthetic'")
+    parser.add_argument('--ttl', type=float, default=300, help='seconds to keep a result')
+    parser.add_argument('--workers', type=int, default=4, help='threads running the pipeline')
+    parser.add_argument('--load-test', type=int, metavar='N', help='send N requests to a local instance and exit')
+    parser.add_argument('--symbols', nargs='+', default=['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA'],
+                        help='symbols the load test asks for')
+    parser.add_argument('--concurrency', type=int, default=50)
+    add_monitoring_args(parser)
+    args = parser.parse_args(argv)
+    start_monitoring(args)
+
+    service = PredictionService(make_store(args.source), ModelRegistry(default_registry_dir()),
+                                ttl=args.ttl, workers=args.workers)
+    try:
+        if args.load_test:
+            report = asyncio.run(load_test(service, args.symbols, args.load_test, args.concurrency))
+            print(json.dumps(report, indent=2))
+            return 0
+
+        async def serve():
+            server = await start_server(service, args.host, args.port)
+            print(f"Serving on http://{args.host}:{args.port}")
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        return 0
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
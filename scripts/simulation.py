@@ -0,0 +1,80 @@
+"""
+Monte Carlo confidence bands for the linear forecast
+
+The model's one-day errors on its holdout rows are resampled (bootstrap)
+or modelled as normal noise and added to every simulated day, and all
+paths go through forecast_linear together as rows of one array. The
+spread of the paths at each day gives the band.
+
+    lower, upper = confidence_band(model, features, feature_names, days=30)
+
+A direct multi-horizon model needs no simulation: direct_band takes the
+percentiles of its holdout errors at each day ahead.
+"""
+import numpy as np
+
+from forecast import FEATURE_COLUMNS, forecast_linear
+from regression import design_matrix, direct_design_matrix
+
+
+def holdout_residuals(model, features, feature_names=FEATURE_COLUMNS):
+    """Actual minus predicted next-day price on train_model's 20% holdout"""
+    X, y = design_matrix(features, feature_names)
+    split = int(len(y) * 0.8)
+    return y[split:] - (X[split:] @ np.asarray(model.coef_) + model.intercept_)
+
+
+def draw_shocks(residuals, n_paths, days, method='bootstrap', rng=None):
+    residuals = np.asarray(residuals, dtype=np.float64)
+    residuals = residuals[np.isfinite(residuals)]
+    if len(residuals) == 0:
+        raise ValueError("No residuals to simulate from")
+    rng = np.random.default_rng(rng)
+
+    if method == 'bootstrap':
+        return rng.choice(residuals, size=(n_paths, days))
+    if method == 'normal':
+        scale = residuals.std(ddof=1) if len(residuals) > 1 else abs(residuals[0])
+        return rng.normal(0.0, scale, size=(n_paths, days))
+    raise ValueError(f"Unknown method: {method}")
+
+
+def simulate_paths(coef, intercept, last_row, last_price, residuals, days=30, n_paths=10_000,
+                   method='bootstrap', seed=None, feature_names=FEATURE_COLUMNS):
+    """Return (n_paths, days) simulated prices from one symbol's last feature row"""
+    shocks = draw_shocks(residuals, n_paths, days, method, seed)
+    rows = np.tile(np.asarray(last_row, dtype=np.float64), (n_paths, 1))
+    return forecast_linear(coef, intercept, rows, last_price, days, list(feature_names), shocks=shocks)
+
+
+def percentile_bands(paths, percentiles=(5, 95)):
+    """(len(percentiles), days) array of per-day percentiles across paths"""
+    return np.percentile(paths, percentiles, axis=0)
+
+
+def confidence_band(model, features, feature_names=FEATURE_COLUMNS, days=30, n_paths=10_000,
+                    level=0.9, method='bootstrap', seed=None):
+    """Return (lower, upper) arrays holding `level` of the simulated paths each day"""
+    names = list(feature_names)
+    residuals = holdout_residuals(model, features, names)
+    last_row = features[names].to_numpy(dtype=np.float64)[-1]
+    paths = simulate_paths(model.coef_, model.intercept_, last_row, features['price'].iloc[-1],
+                           residuals, days, n_paths, method, seed, names)
+    tail = (1 - level) / 2 * 100
+    lower, upper = percentile_bands(paths, (tail, 100 - tail))
+    return lower, upper
+
+
+def direct_band(model, features, feature_names=FEATURE_COLUMNS, days=30, level=0.9):
+    """(lower, upper) for a direct model from its holdout errors at each day ahead"""
+    names = list(feature_names)
+    coef = np.asarray(model.coef_)[:days]
+    intercept = np.asarray(model.intercept_)[:days]
+    X, Y = direct_design_matrix(features, len(model.coef_), names)
+    split = int(len(X) * 0.8)
+    residuals = Y[split:, :days] - (X[split:] @ coef.T + intercept)
+
+    tail = (1 - level) / 2 * 100
+    low, high = np.percentile(residuals, (tail, 100 - tail), axis=0)
+    forecast = coef @ features[names].to_numpy(dtype=np.float64)[-1] + intercept
+    return forecast + low, forecast + high
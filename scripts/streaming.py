@@ -0,0 +1,153 @@
+"""
+Streaming version of prediction.prepare_features
+
+Each symbol keeps a small amount of state (ring buffers for ma5/ma20 and
+the previous close/volume) so a new bar produces its feature row in
+constant time instead of rebuilding the whole DataFrame.
+"""
+import math
+
+import pandas as pd
+
+from forecast import FEATURE_COLUMNS
+
+FEATURE_ROW = ['price'] + FEATURE_COLUMNS
+
+
+class RollingMean:
+    """Fixed-window mean updated in O(1) per value
+
+    Uses the same compensated running sum as pandas' rolling().mean(), so
+    the results match prepare_features exactly rather than to a tolerance.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = [math.nan] * window
+        self.count = 0
+        self.nobs = 0
+        self.sum = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.neg_ct = 0
+        self.same_count = 0
+        self.prev_value = math.nan
+
+    def _add(self, value):
+        if value != value:
+            return
+        self.nobs += 1
+        y = value - self.compensation_add
+        t = self.sum + y
+        self.compensation_add = t - self.sum - y
+        self.sum = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        if value == self.prev_value:
+            self.same_count += 1
+        else:
+            self.same_count = 1
+        self.prev_value = value
+
+    def _remove(self, value):
+        if value != value:
+            return
+        self.nobs -= 1
+        y = -value - self.compensation_remove
+        t = self.sum + y
+        self.compensation_remove = t - self.sum - y
+        self.sum = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value):
+        value = float(value)
+        slot = self.count % self.window
+        if self.count >= self.window:
+            self._remove(self.buffer[slot])
+        self._add(value)
+        self.buffer[slot] = value
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        if self.nobs < self.window:
+            return math.nan
+        if self.same_count >= self.nobs:
+            return self.prev_value
+        result = self.sum / self.nobs
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+
+def _pct_change(current, previous):
+    # Same as pandas: current / previous - 1, with numpy's division by zero
+    if previous == 0:
+        if current == 0 or current != current:
+            return math.nan
+        return math.copysign(math.inf, current)
+    return current / previous - 1
+
+
+class StreamingFeatures:
+    """Feature state for one symbol"""
+
+    def __init__(self):
+        self.ma5 = RollingMean(5)
+        self.ma20 = RollingMean(20)
+        self.last_close = math.nan
+        self.last_volume = math.nan
+
+    def update(self, timestamp, high, low, close, volume):
+        """Add one bar; returns its feature row, or None while still warming up"""
+        close = float(close)
+        ma5 = self.ma5.update(close)
+        ma20 = self.ma20.update(close)
+        price_change = _pct_change(close, self.last_close)
+        volume_change = _pct_change(float(volume), self.last_volume)
+        self.last_close = close
+        self.last_volume = float(volume)
+
+        trend = (ma5 - ma20) / ma20 if ma20 == ma20 else math.nan
+        row = {
+            'price': close,
+            'volume': volume,
+            'high': float(high),
+            'low': float(low),
+            'ma5': ma5,
+            'ma20': ma20,
+            'price_change': price_change,
+            'volume_change': volume_change,
+            'trend': trend,
+            'day_of_week': pd.Timestamp(timestamp).dayofweek,
+        }
+
+        # prepare_features drops any row with a missing value
+        if any(value != value for value in row.values()):
+            return None
+        return row
+
+
+class StreamingFeatureEngine:
+    """Streaming features for a whole watchlist, keyed by symbol"""
+
+    def __init__(self):
+        self.states = {}
+
+    def update(self, symbol, timestamp, high, low, close, volume):
+        state = self.states.get(symbol)
+        if state is None:
+            state = self.states[symbol] = StreamingFeatures()
+        return state.update(timestamp, high, low, close, volume)
+
+    def warm_up(self, symbol, data):
+        """Feed a history of bars (as from get_stock_data); returns the last row"""
+        row = None
+        for timestamp, high, low, close, volume in zip(
+                data.index, data['High'], data['Low'], data['Close'], data['Volume']):
+            row = self.update(symbol, timestamp, high, low, close, volume)
+        return row
@@ -0,0 +1,81 @@
+"""
+Seeded synthetic OHLCV bars for offline tests and benchmarks
+
+Prices follow geometric Brownian motion. The same seed always gives the
+same bars, so timings and test results do not depend on Yahoo.
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+ORIGIN = pd.Timestamp('2000-01-03')
+
+
+def generate_bars(n_bars, seed=0, start=ORIGIN, s0=100.0, mu=0.05, sigma=0.2, freq='B'):
+    """Return a DataFrame shaped like get_stock_data's output"""
+    rng = np.random.default_rng(seed)
+    dt = 1 / 252
+
+    # Geometric Brownian motion for the close
+    shocks = rng.standard_normal(n_bars)
+    log_returns = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+    close = s0 * np.exp(np.cumsum(log_returns))
+
+    # Open near the previous close, high/low around the day's range
+    open_ = np.concatenate(([s0], close[:-1])) * (1 + rng.normal(0, 0.002, n_bars))
+    spread = np.abs(rng.normal(0, 0.01, n_bars))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(np.log(5_000_000), 0.4, n_bars).astype(np.int64)
+
+    index = pd.date_range(start=start, periods=n_bars, freq=freq, name='Date')
+    return pd.DataFrame({
+        'Close': close,
+        'High': high,
+        'Low': low,
+        'Open': open_,
+        'Volume': volume,
+    }, index=index)
+
+
+def generate_universe(n_symbols, n_bars, seed=0):
+    """Return {symbol: bars} for n_symbols independent series"""
+    return {f"SYM{i:04d}": generate_bars(n_bars, seed=seed + i) for i in range(n_symbols)}
+
+
+def symbol_seed(symbol):
+    return zlib.crc32(symbol.upper().encode())
+
+
+class SyntheticSource:
+    """Bar store data source that never touches the network
+
+    Each symbol has one fixed path starting at ORIGIN, so any date range
+    (and any top-up of it) always returns the same bars. Intraday bars are
+    a seeded path per session that starts at the previous daily Close.
+    """
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        end = pd.Timestamp(end)
+        n_bars = len(pd.bdate_range(ORIGIN, end)) + 1
+        bars = generate_bars(n_bars, seed=symbol_seed(symbol))
+        mask = (bars.index >= pd.Timestamp(start).normalize()) & (bars.index < end)
+        if interval == '1d':
+            return bars.loc[mask]
+
+        from intraday import session_times
+
+        sessions = []
+        # The daily closes (unlike the other columns) do not depend on how many bars were drawn
+        previous_close = bars['Close'].shift(1, fill_value=100.0)
+        for day, open_ in previous_close[mask].items():
+            times = session_times([day], interval)
+            # Same daily drift and volatility, spread over the session's bars
+            session = generate_bars(len(times), seed=symbol_seed(symbol) + day.toordinal(), s0=open_,
+                                    mu=0.05 / len(times), sigma=0.2 / np.sqrt(len(times)))
+            sessions.append(session.set_axis(times))
+        if not sessions:
+            return bars.iloc[:0]
+        data = pd.concat(sessions)
+        return data[(data.index >= pd.Timestamp(start)) & (data.index < end)]
@@ -0,0 +1,87 @@
+"""
+Background work for the Tk GUI
+
+Tk widgets may only be touched from the main thread, so work runs on a
+thread pool and finished results are picked up by polling with
+window.after. Each request has a key (e.g. 'chart'); when a newer request
+with the same key is submitted, the older one's result is dropped.
+"""
+import itertools
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskRunner:
+    def __init__(self, window, max_workers=4, poll_ms=50):
+        self.window = window
+        self.poll_ms = poll_ms
+        self.pool = ThreadPoolExecutor(max_workers)
+        self.finished = queue.Queue()
+        self.latest = {}
+        self.active = {}
+        self._tokens = itertools.count(1)
+        self._polling = False
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, label=None):
+        """Run fn(*args) in the background; on_done(result) runs on the Tk thread"""
+        token = next(self._tokens)
+        self.latest[key] = token
+        future = self.pool.submit(fn, *args)
+        self.active[token] = (key, future, on_done, on_error, label or key)
+        # add_done_callback runs on the worker thread, so only touch the queue here
+        future.add_done_callback(lambda _, token=token: self.finished.put(token))
+        self._schedule_poll()
+        return token
+
+    def cancel(self, key=None):
+        """Forget the newest request for key (or for every key)"""
+        keys = list(self.latest) if key is None else [key]
+        for k in keys:
+            token = self.latest.pop(k, None)
+            if token in self.active:
+                # Queued work is cancelled; running work finishes but is ignored
+                self.active[token][1].cancel()
+
+    def is_current(self, token):
+        return token in self.active and self.latest.get(self.active[token][0]) == token
+
+    def pending_labels(self):
+        return [entry[4] for token, entry in self.active.items() if self.is_current(token)]
+
+    def busy(self):
+        return bool(self.pending_labels())
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.window.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                token = self.finished.get_nowait()
+            except queue.Empty:
+                break
+
+            current = self.is_current(token)
+            key, future, on_done, on_error, _ = self.active.pop(token)
+            if not current or future.cancelled():
+                continue  # Superseded or cancelled, don't overwrite newer results
+            del self.latest[key]
+
+            try:
+                result = future.result()
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+            else:
+                if on_done:
+                    on_done(result)
+
+        if self.active:
+            self._schedule_poll()
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
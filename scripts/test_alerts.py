@@ -0,0 +1,126 @@
+"""
+Tests for the vectorized alert engine against a per-rule loop over pandas averages
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from alerts import AlertEngine, ReplayFeed
+from synthetic import generate_universe
+
+
+def expected_alerts(bars_by_symbol, rules, predicted):
+    """[(bar position, rule id)] from a plain loop, with MA20/MA50 as gui.py computes them"""
+    fired = []
+    for rule_id, (symbol, kind, level) in enumerate(rules):
+        close = bars_by_symbol[symbol]['Close']
+        reference = {'price': pd.Series(level, index=close.index),
+                     'ma20': close.rolling(window=20).mean(),
+                     'ma50': close.rolling(window=50).mean(),
+                     'change': pd.Series(level, index=close.index)}[kind.split('_')[0]]
+        value = (predicted[symbol] - close) / close * 100 if kind.startswith('change') else close
+        difference = (value - reference) * (1 if kind.endswith('above') else -1)
+
+        previous = None
+        for position, d in enumerate(difference):
+            if np.isnan(d):
+                continue
+            if previous is not None and d > 0 and not previous:
+                fired.append((position, rule_id))
+            previous = d > 0
+    return sorted(fired)
+
+
+class TestAlertEngine(unittest.TestCase):
+    def setUp(self):
+        self.bars = generate_universe(6, 160)
+        self.symbols = list(self.bars)
+        first = {symbol: self.bars[symbol]['Close'].iloc[0] for symbol in self.symbols}
+        self.predicted = {symbol: first[symbol] * 1.03 for symbol in self.symbols}
+        self.rules = []
+        for symbol in self.symbols:
+            self.rules += [(symbol, 'price_above', first[symbol] * 1.02), (symbol, 'price_below', first[symbol] * 0.98),
+                           (symbol, 'ma20_above', None), (symbol, 'ma20_below', None),
+                           (symbol, 'ma50_above', None), (symbol, 'ma50_below', None),
+                           (symbol, 'change_above', 2.0), (symbol, 'change_below', -1.0)]
+
+    def make_engine(self):
+        engine = AlertEngine(self.symbols)
+        for symbol, kind, level in self.rules:
+            engine.add_rule(symbol, kind, level)
+        engine.set_predictions(self.symbols, [self.predicted[symbol] for symbol in self.symbols])
+        return engine
+
+    def test_matches_per_rule_loop(self):
+        engine = self.make_engine()
+        fired = []
+        for position, (_, index, prices) in enumerate(ReplayFeed(self.bars)):
+            fired += [(position, int(rule)) for rule in engine.on_ticks(index, prices)]
+
+        expected = expected_alerts(self.bars, self.rules, self.predicted)
+        self.assertGreater(len(expected), 20)
+        self.assertEqual(sorted(fired), expected)
+
+        ma20, ma50 = engine.moving_averages()
+        np.testing.assert_allclose(ma20, [self.bars[s]['Close'].rolling(20).mean().iloc[-1] for s in self.symbols])
+        np.testing.assert_allclose(ma50, [self.bars[s]['Close'].rolling(50).mean().iloc[-1] for s in self.symbols])
+
+    def test_partial_and_repeated_batches(self):
+        # Same ticks, but one symbol at a time in a shuffled batch order per bar, two bars per batch
+        whole = self.make_engine()
+        split = self.make_engine()
+        feed = list(ReplayFeed(self.bars))
+        expected, fired = [], []
+        rng = np.random.default_rng(0)
+        for start in range(0, len(feed), 2):
+            index = np.concatenate([feed[i][1] for i in range(start, start + 2)])
+            prices = np.concatenate([feed[i][2] for i in range(start, start + 2)])
+            for i in range(start, start + 2):
+                expected += whole.on_ticks(feed[i][1], feed[i][2]).tolist()
+            # Shuffle within each bar only, so each symbol's ticks stay in order
+            order = np.concatenate([rng.permutation(len(index) // 2), len(index) // 2 + rng.permutation(len(index) // 2)])
+            fired += split.on_ticks(index[order], prices[order]).tolist()
+        self.assertEqual(sorted(fired), sorted(expected))
+
+    def test_existing_condition_only_primes(self):
+        engine = AlertEngine(['AAA'])
+        rule = engine.add_rule('AAA', 'price_above', 10.0)
+        self.assertEqual(len(engine.on_ticks([0], [12.0])), 0)
+        self.assertEqual(len(engine.on_ticks([0], [9.0])), 0)
+        self.assertEqual(engine.on_ticks([0], [11.0]).tolist(), [rule])
+        self.assertEqual(len(engine.on_ticks([0], [12.0])), 0)
+
+        engine.on_ticks([0], [9.0])
+        engine.remove_rules([rule])
+        self.assertEqual(len(engine.on_ticks([0], [11.0])), 0)
+
+    def test_warm_up_seeds_averages(self):
+        closes = np.vstack([self.bars[symbol]['Close'].to_numpy() for symbol in self.symbols])
+        engine = AlertEngine(self.symbols)
+        engine.add_rules(self.symbols, 'ma20_above')
+        engine.warm_up(closes[:, :100])
+
+        cold = AlertEngine(self.symbols)
+        cold.add_rules(self.symbols, 'ma20_above')
+        for column in closes[:, :100].T:
+            cold.on_ticks(np.arange(len(self.symbols)), column)
+        for column in closes[:, 100:].T:
+            index = np.arange(len(self.symbols))
+            self.assertEqual(engine.on_ticks(index, column).tolist(), cold.on_ticks(index, column).tolist())
+
+    def test_describe_and_errors(self):
+        engine = AlertEngine(['aaa'])
+        rule = engine.add_rule('AAA', 'price_below', 5.0)
+        engine.on_symbol_ticks(['AAA'], [6.0])
+        alerts = engine.describe(engine.on_symbol_ticks(['AAA'], [4.0]))
+        self.assertEqual(alerts, [{'rule': rule, 'symbol': 'AAA', 'kind': 'price_below', 'level': 5.0, 'price': 4.0}])
+
+        with self.assertRaises(ValueError):
+            engine.add_rule('AAA', 'price_above')
+        with self.assertRaises(ValueError):
+            engine.add_rule('AAA', 'volume_above', 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for the walk-forward backtest against refitting with sklearn at every origin
+"""
+import unittest
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from backtest import walk_forward, horizon_metrics, backtest
+from prediction import prepare_features, _predict_recursive, FEATURE_COLUMNS
+from synthetic import generate_bars
+from test_forecast import make_features
+
+
+def refit(features, start, end, origin, horizon, mode):
+    X = features[FEATURE_COLUMNS].iloc[start:end]
+    price = features['price'].to_numpy()
+    if mode == 'recursive':
+        model = LinearRegression().fit(X, price[start + 1:end + 1])
+        return np.array(_predict_recursive(model, features.iloc[:origin + 1], FEATURE_COLUMNS, horizon))
+    Y = np.array([price[i + 1:i + horizon + 1] for i in range(start, end)])
+    model = LinearRegression().fit(X, Y)
+    return model.predict(features[FEATURE_COLUMNS].iloc[origin:origin + 1])[0]
+
+
+class TestWalkForward(unittest.TestCase):
+    def setUp(self):
+        # Different lengths, so the shorter symbols run out of origins
+        self.features = [prepare_features(generate_bars(260 + 40 * i, seed=i)) for i in range(3)]
+
+    def check_against_refits(self, mode, window):
+        horizon = 8
+        lag = 1 if mode == 'recursive' else horizon
+        predictions, actuals, origins = walk_forward(self.features, horizon, min_train=60, step=9,
+                                                     window=window, mode=mode, chunk_values=5_000)
+        self.assertEqual(predictions.shape, (3, len(origins), horizon))
+
+        for s, features in enumerate(self.features):
+            price = features['price'].to_numpy()
+            for j, origin in enumerate(origins):
+                if origin + horizon >= len(features):
+                    self.assertTrue(np.isnan(predictions[s, j]).all())
+                    continue
+                end = origin - lag + 1
+                start = 0 if window is None else end - window
+                expected = refit(features, start, end, origin, horizon, mode)
+                np.testing.assert_allclose(predictions[s, j], expected, rtol=1e-8)
+                np.testing.assert_array_equal(actuals[s, j], price[origin + 1:origin + horizon + 1])
+
+    def test_recursive_expanding(self):
+        self.check_against_refits('recursive', None)
+
+    def test_recursive_window(self):
+        self.check_against_refits('recursive', 100)
+
+    def test_direct_expanding(self):
+        self.check_against_refits('direct', None)
+
+    def test_direct_window(self):
+        self.check_against_refits('direct', 100)
+
+    def test_collinear_features_stay_finite(self):
+        # make_features sets high and low to fixed multiples of the close
+        predictions, actuals, _ = walk_forward([make_features(0, 300)], 10, min_train=60, step=5)
+        self.assertTrue(np.isfinite(predictions).all())
+        self.assertLess(np.nanmean(np.abs(predictions - actuals)), 10)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            walk_forward(self.features, mode='sideways')
+        predictions, _, origins = walk_forward(self.features, 30, min_train=1_000)
+        self.assertEqual(len(origins), 0)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_tidy_table(self):
+        predictions = np.array([[[1.0, 2.0], [3.0, np.nan]]])
+        actuals = np.array([[[2.0, 2.0], [1.0, 4.0]]])
+        table = horizon_metrics(predictions, actuals, ['AAA'])
+
+        self.assertEqual(list(table.columns), ['symbol', 'horizon', 'n', 'mae', 'rmse', 'mape'])
+        self.assertEqual(table['n'].tolist(), [2, 1])
+        self.assertEqual(table['mae'].tolist(), [1.5, 0.0])
+        self.assertAlmostEqual(table['rmse'][0], np.sqrt(2.5))
+        self.assertAlmostEqual(table['mape'][0], 125.0)
+
+    def test_backtest_by_symbol(self):
+        bars = {'AAA': generate_bars(300, seed=1), 'BBB': generate_bars(300, seed=2)}
+        table = backtest(bars, horizon=5, min_train=100, step=10)
+        self.assertEqual(len(table), 10)
+        self.assertEqual(table.groupby('symbol')['n'].first().to_dict(), {'AAA': 18, 'BBB': 18})
+        # Errors grow with the horizon on a random walk
+        mean_rmse = table.groupby('horizon')['rmse'].mean()
+        self.assertGreater(mean_rmse[5], mean_rmse[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
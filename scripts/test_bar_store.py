@@ -0,0 +1,115 @@
+"""
+Tests for the local bar store (offline, no Yahoo access)
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, LocalFileSource
+
+
+def make_bars(start='2024-01-01', periods=300):
+    index = pd.bdate_range(start, periods=periods, name='Date')
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, periods))
+    return pd.DataFrame({
+        'Close': close,
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Open': close,
+        'Volume': np.arange(periods, dtype=np.int64) + 1_000_000,
+    }, index=index)
+
+
+class CountingSource:
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def fetch(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        mask = (self.bars.index >= start) & (self.bars.index < end)
+        return self.bars.loc[mask]
+
+
+class TestBarStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bars = make_bars()
+        self.source = CountingSource(self.bars)
+        self.store = BarStore(self.tmp.name, self.source)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_repeat_request_hits_disk(self):
+        first = self.store.get('AAPL', '2024-01-01', '2024-06-01')
+        second = self.store.get('AAPL', '2024-01-01', '2024-06-01')
+
+        self.assertEqual(len(self.source.calls), 1)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertGreater(len(first), 0)
+
+    def test_only_trailing_days_are_fetched(self):
+        self.store.get('AAPL', '2024-01-01', '2024-06-01')
+        data = self.store.get('AAPL', '2024-01-01', '2024-07-01')
+
+        self.assertEqual(len(self.source.calls), 2)
+        _, start, end = self.source.calls[1]
+        self.assertEqual(pd.Timestamp(start), pd.Timestamp('2024-06-01'))
+        self.assertEqual(pd.Timestamp(end), pd.Timestamp('2024-07-01'))
+
+        expected = self.bars.loc['2024-01-01':'2024-06-30']
+        np.testing.assert_array_equal(data['Close'].values, expected['Close'].values)
+        self.assertTrue(data.index.is_monotonic_increasing)
+
+    def test_failed_download_is_retried(self):
+        # The top-up comes back empty once, as yf.download does on a network error
+        fetch = self.source.fetch
+        failures = [True]
+
+        def flaky(symbol, start, end):
+            if pd.Timestamp(start) >= pd.Timestamp('2024-06-01') and failures:
+                failures.pop()
+                return self.bars.iloc[:0]
+            return fetch(symbol, start, end)
+
+        self.source.fetch = flaky
+        self.store.get('AAPL', '2024-01-01', '2024-06-01')
+        self.assertEqual(len(self.store.get('AAPL', '2024-01-01', '2024-07-01')), 110)
+        self.assertEqual(len(self.store.get('AAPL', '2024-01-01', '2024-07-01')), 130)
+
+    def test_coverage_stops_at_today(self):
+        store = BarStore(self.tmp.name, self.source, clock=lambda: pd.Timestamp('2024-03-01 11:00'))
+        store.get('AAPL', '2024-01-01', '2024-12-31')
+        _, meta = store.load('AAPL')
+        self.assertEqual(meta['fetched_to'], '2024-03-01')
+
+        # Later days are fetched once they have happened
+        store.clock = lambda: pd.Timestamp('2024-06-01')
+        data = store.get('AAPL', '2024-01-01', '2024-12-31')
+        self.assertEqual(self.source.calls[-1][1:], (pd.Timestamp('2024-03-01'), pd.Timestamp('2024-12-31')))
+        self.assertEqual(data.index[-1], pd.Timestamp('2024-12-30'))
+        self.assertEqual(store.load('AAPL')[1]['fetched_to'], '2024-06-01')
+
+    def test_unknown_symbol_is_not_stored(self):
+        data = BarStore(self.tmp.name, LocalFileSource(self.tmp.name)).get('NOPE', '2024-01-01', '2024-02-01')
+        self.assertEqual(len(data), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'NOPE')))
+
+    def test_local_file_source(self):
+        csv_dir = os.path.join(self.tmp.name, 'csv')
+        os.makedirs(csv_dir)
+        self.bars.to_csv(os.path.join(csv_dir, 'MSFT.csv'))
+
+        store = BarStore(os.path.join(self.tmp.name, 'store'), LocalFileSource(csv_dir))
+        data = store.get('MSFT', '2024-02-01', '2024-03-01')
+
+        expected = self.bars.loc['2024-02-01':'2024-02-29']
+        np.testing.assert_allclose(data['Close'].values, expected['Close'].values)
+        self.assertEqual(list(data.columns), ['Close', 'High', 'Low', 'Open', 'Volume'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Tests for the synthetic data generator and the benchmark harness
+"""
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+from benchmark import compare_to_baseline, main, load_results
+from synthetic import generate_bars, SyntheticSource
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_seeded_and_well_formed(self):
+        first = generate_bars(500, seed=4)
+        pd.testing.assert_frame_equal(first, generate_bars(500, seed=4))
+        self.assertFalse(first.equals(generate_bars(500, seed=5)))
+
+        self.assertEqual(list(first.columns), ['Close', 'High', 'Low', 'Open', 'Volume'])
+        self.assertTrue((first['High'] >= first[['Open', 'Close']].max(axis=1)).all())
+        self.assertTrue((first['Low'] <= first[['Open', 'Close']].min(axis=1)).all())
+        self.assertTrue((first['Close'] > 0).all())
+
+    def test_source_is_stable_across_ranges(self):
+        source = SyntheticSource()
+        long = source.fetch('AAPL', pd.Timestamp('2020-01-01'), pd.Timestamp('2021-01-01'))
+        short = source.fetch('AAPL', pd.Timestamp('2020-06-01'), pd.Timestamp('2020-07-01'))
+        np.testing.assert_array_equal(short['Close'].values, long.loc[short.index, 'Close'].values)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_compare_flags_slowdowns_only(self):
+        baseline = {'a': 0.010, 'b': 0.010, 'c': 0.0001}
+        results = {'a': 0.011, 'b': 0.020, 'c': 0.0009, 'd': 1.0}
+        self.assertEqual(compare_to_baseline(results, baseline, tolerance=0.25), [('b', 0.010, 0.020)])
+
+    def test_small_run_writes_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'results.json')
+            self.assertEqual(main(['--sizes', '250', '--symbols', '2', '--repeat', '1', '--sections', 'history', 'symbols',
+                                   '--output', path]), 0)
+
+            timings = load_results(path)
+            self.assertIn('train_model/bars=250', timings)
+            self.assertIn('train_models_batch/symbols=2', timings)
+
+            # A baseline that was impossibly fast flags everything as a regression
+            with open(path) as f:
+                saved = json.load(f)
+            saved['timings'] = {name: 1e-9 for name in timings}
+            with open(path, 'w') as f:
+                json.dump(saved, f)
+            self.assertEqual(main(['--sizes', '250', '--symbols', '2', '--repeat', '1', '--sections', 'history', 'symbols',
+                                   '--baseline', path]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Tests for the reusable GUI price chart, drawn off screen with Agg
+"""
+import gc
+import io
+import unittest
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.backend_bases import MouseEvent
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from charts import PriceChart
+from test_bar_store import make_bars
+
+
+class CountingCanvas(FigureCanvasAgg):
+    full_draws = 0
+    blits = 0
+
+    def draw(self):
+        self.full_draws += 1
+        super().draw()
+
+    def blit(self, bbox=None):
+        self.blits += 1
+
+
+class TestPriceChart(unittest.TestCase):
+    def setUp(self):
+        self.data = make_bars(periods=300)
+        self.data['MA20'] = self.data['Close'].rolling(20).mean()
+        self.data['MA50'] = self.data['Close'].rolling(50).mean()
+        self.chart = PriceChart(canvas_factory=CountingCanvas)
+
+    def predict(self, scale=1.0):
+        dates = pd.bdate_range(self.data.index[-1] + pd.Timedelta(days=1), periods=30)
+        return np.full(30, float(self.data['Close'].iloc[-1])) * scale, dates
+
+    def test_artists_are_reused(self):
+        self.chart.show_history(self.data)
+        predictions, dates = self.predict()
+        for _ in range(20):
+            self.chart.show_prediction(self.data, predictions, dates)
+            self.chart.show_history(self.data)
+
+        self.assertEqual(len(self.chart.ax.lines), 4)
+        self.assertLessEqual(len(self.chart.ax.collections), 1)
+        self.assertEqual(plt.get_fignums(), [])
+
+    def test_same_limits_redraw_with_blit(self):
+        predictions, dates = self.predict()
+        lower, upper = predictions * 0.8, predictions * 1.2
+        self.chart.show_prediction(self.data, predictions, dates, lower, upper)
+        draws = self.chart.canvas.full_draws
+
+        # New prediction inside the same band keeps the axes limits: no full redraw
+        self.chart.show_prediction(self.data, predictions * 1.001, dates, lower, upper)
+        self.assertEqual(self.chart.canvas.full_draws, draws)
+        self.assertGreater(self.chart.canvas.blits, 0)
+
+        # Switching views changes the legend, which needs a full draw
+        self.chart.show_history(self.data)
+        self.assertEqual(self.chart.canvas.full_draws, draws + 1)
+
+    def test_scroll_zooms_and_resamples(self):
+        self.chart.show_history(self.data)
+        left, right = self.chart.ax.get_xlim()
+        x, y = self.chart.ax.transAxes.transform((0.5, 0.5))
+        for _ in range(5):
+            self.chart.canvas.callbacks.process('scroll_event', MouseEvent(
+                'scroll_event', self.chart.canvas, x, y, button='up', step=1))
+
+        new_left, new_right = self.chart.ax.get_xlim()
+        self.assertAlmostEqual(new_right - new_left, (right - left) * 0.8 ** 5)
+        # Only the bars in view (plus one either side) are left on the line
+        shown = self.chart.lines['price'].get_xdata()
+        self.assertLess(len(shown), len(self.data) * 0.4)
+        self.assertLessEqual(shown[0], new_left)
+
+    def test_saved_file_has_the_lines(self):
+        self.chart.show_history(self.data)
+        out = io.StringIO()
+        self.chart.figure.savefig(out, format='svg')
+        # The price line is blue; animated lines would be missing from the file
+        self.assertIn('stroke: #0000ff', out.getvalue())
+        self.assertTrue(self.chart.lines['price'].get_animated())
+
+    def test_memory_stays_flat(self):
+        predictions, dates = self.predict()
+        for i in range(5):
+            self.chart.show_prediction(self.data, predictions * (1 + i * 0.01), dates)
+            self.chart.show_history(self.data)
+
+        gc.collect()
+        before = len(gc.get_objects())
+        for i in range(25):
+            self.chart.show_prediction(self.data, predictions * (1 + i * 0.01), dates)
+            self.chart.show_history(self.data)
+        gc.collect()
+        after = len(gc.get_objects())
+
+        # A new figure per redraw used to leave thousands of objects behind
+        self.assertLess(after - before, 500)
+
+if __name__ == '__main__':
+    unittest.main()
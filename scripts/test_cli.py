@@ -0,0 +1,85 @@
+"""
+Tests for the headless command line predictor (synthetic data, no network)
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+import cli
+import metrics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {'STOCK_PREDICTOR_DATA_DIR': self.tmp.name,
+                                                'STOCK_PREDICTOR_MODEL_DIR': self.tmp.name + '/models'})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_json_for_many_symbols(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            code = cli.main(['AAPL', 'msft', '--source', 'synthetic', '--days', '5', '--json'])
+
+        self.assertEqual(code, 0)
+        results = json.loads(out.getvalue())
+        self.assertEqual([r['symbol'] for r in results], ['AAPL', 'MSFT'])
+        self.assertEqual(len(results[0]['predictions']), 5)
+        self.assertEqual(len(results[0]['dates']), 5)
+
+    def test_direct_mode(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            cli.main(['AAPL', '--source', 'synthetic', '--days', '7', '--mode', 'direct', '--json'])
+        result = json.loads(out.getvalue())[0]
+        self.assertEqual(len(result['predictions']), 7)
+        self.assertEqual(len(result['upper']), 7)
+
+    def test_chart_files(self):
+        chart_dir = os.path.join(self.tmp.name, 'charts')
+        with redirect_stdout(io.StringIO()):
+            cli.main(['AAPL', '--source', 'synthetic', '--chart-dir', chart_dir, '--format', 'svg'])
+        with open(os.path.join(chart_dir, 'AAPL.svg')) as f:
+            self.assertIn('<svg', f.read(500))
+
+    def test_prediction_only_run_skips_plotting_imports(self):
+        code = ("import sys, cli; cli.main(['AAPL', '--source', 'synthetic', '--json']);"
+                "sys.exit(int(any(m in sys.modules for m in ('matplotlib', 'tkinter', 'yfinance'))))")
+        done = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True,
+                              env=dict(os.environ))
+        self.assertEqual(done.returncode, 0, done.stderr.decode())
+
+    def test_monitoring_options(self):
+        profile = os.path.join(self.tmp.name, 'profile.txt')
+        handlers = list(metrics.logger.handlers)
+        err = io.StringIO()
+        env = {'STOCK_PREDICTOR_PROFILE': profile}
+        with mock.patch('cli.start_metrics_server') as server, mock.patch.dict(os.environ, env), \
+                redirect_stdout(io.StringIO()), redirect_stderr(err):
+            try:
+                cli.main(['AAPL', '--source', 'synthetic', '--json', '--log-json', '--metrics-port', '9100'])
+            finally:
+                for handler in metrics.logger.handlers[len(handlers):]:
+                    metrics.logger.removeHandler(handler)
+
+        server.assert_called_once_with(9100)
+        events = [json.loads(line) for line in err.getvalue().splitlines()]
+        self.assertIn('span', {event.get('event') for event in events})
+        self.assertIn('profile', {event.get('event') for event in events})
+        self.assertGreater(os.path.getsize(profile), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests for chart downsampling
+"""
+import unittest
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from charts import PriceChart
+from downsample import lttb, minmax, visible_slice
+
+
+class TestDownsample(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = np.arange(10_000, dtype=float)
+        self.y = np.cumsum(rng.normal(0, 1, 10_000))
+        self.y[5_000] = 500  # spike that must survive
+
+    def test_lttb_keeps_endpoints_and_spike(self):
+        keep = lttb(self.x, self.y, 500)
+        self.assertEqual(len(keep), 500)
+        self.assertEqual(keep[0], 0)
+        self.assertEqual(keep[-1], 9_999)
+        self.assertIn(5_000, keep)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_lttb_short_series_and_nans(self):
+        y = self.y[:100].copy()
+        y[:20] = np.nan
+        np.testing.assert_array_equal(lttb(self.x[:100], y, 500), np.arange(20, 100))
+        self.assertTrue(np.all(~np.isnan(y[lttb(self.x[:100], y, 30)])))
+
+    def test_minmax_keeps_extremes(self):
+        keep = minmax(self.x, self.y, 200)
+        self.assertLessEqual(len(keep), 400)
+        self.assertIn(int(np.argmax(self.y)), keep)
+        self.assertIn(int(np.argmin(self.y)), keep)
+
+    def test_visible_slice(self):
+        self.assertEqual(visible_slice(self.x, 100.5, 200.5), (100, 202))
+        self.assertEqual(visible_slice(self.x, -10, 20_000), (0, 10_000))
+
+
+class TestChartDownsampling(unittest.TestCase):
+    def test_long_history_is_reduced_and_zoom_restores_detail(self):
+        index = pd.bdate_range('2005-01-03', periods=5_000)
+        close = 100 + np.cumsum(np.random.default_rng(2).normal(0, 1, 5_000))
+        data = pd.DataFrame({'Close': close}, index=index)
+        data['MA20'] = data['Close'].rolling(20).mean()
+        data['MA50'] = data['Close'].rolling(50).mean()
+
+        chart = PriceChart(canvas_factory=FigureCanvasAgg)
+        chart.show_history(data)
+        width = int(chart.ax.bbox.width)
+        self.assertLessEqual(len(chart.lines['price'].get_xdata()), width)
+
+        # Zoom to 100 bars: every bar in view is drawn
+        x = mdates.date2num(index)
+        chart.ax.set_xlim(x[1_000], x[1_099])
+        shown = chart.lines['price'].get_xdata()
+        self.assertTrue(np.isin(x[1_000:1_100], shown).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
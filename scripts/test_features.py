@@ -0,0 +1,123 @@
+"""
+Tests for the declarative feature registry
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+import features
+from features import FeatureTable, FEATURE_SETS, resolve
+from prediction import prepare_features, train_model, predict_future_prices
+from synthetic import generate_universe
+
+
+def notebook_features(data):
+    # create_features from notebooks/stock_analysis.ipynb, with the registry's column names
+    df = pd.DataFrame(index=data.index)
+    df['price'] = data['Close']
+    df['volume'] = data['Volume']
+    df['price_change'] = data['Close'].pct_change()
+    df['volume_change'] = data['Volume'].pct_change()
+    df['ma5'] = data['Close'].rolling(window=5).mean()
+    df['ma20'] = data['Close'].rolling(window=20).mean()
+    df['volatility'] = df['price_change'].rolling(window=20).std()
+    return df.dropna()
+
+
+class TestFeatureRegistry(unittest.TestCase):
+    def setUp(self):
+        self.universe = list(generate_universe(3, 300).values())
+        self.universe[2] = self.universe[2].iloc[60:]
+
+    def test_resolve_orders_and_prunes(self):
+        order = resolve(['trend'])
+        self.assertEqual(set(order), {'price', 'ma5', 'ma20', 'trend'})
+        self.assertLess(order.index('ma5'), order.index('trend'))
+        self.assertLess(order.index('price'), order.index('ma20'))
+
+        with self.assertRaises(KeyError):
+            resolve(['no_such_feature'])
+
+    def test_cycles_are_reported(self):
+        features.feature('loop_a', 'loop_b')(lambda b: b)
+        features.feature('loop_b', 'loop_a')(lambda a: a)
+        try:
+            with self.assertRaisesRegex(ValueError, 'loop_a -> loop_b -> loop_a'):
+                resolve(['loop_a'])
+        finally:
+            del features.FEATURES['loop_a'], features.FEATURES['loop_b']
+
+    def test_linear_set_matches_prepare_features(self):
+        table = FeatureTable(self.universe)
+        for data, frame in zip(self.universe, table.frames(FEATURE_SETS['linear'])):
+            pd.testing.assert_frame_equal(frame, prepare_features(data), rtol=1e-10)
+        # Nothing outside the linear set was computed
+        self.assertNotIn('volatility', table.computed)
+        self.assertNotIn('rsi14', table.computed)
+
+    def test_second_model_reuses_shared_columns(self):
+        table = FeatureTable(self.universe)
+        table.frames(FEATURE_SETS['linear'])
+        before = list(table.computed)
+
+        frames = table.frames(FEATURE_SETS['notebook'])
+        self.assertEqual(table.computed[len(before):], ['volatility'])
+        for data, frame in zip(self.universe, frames):
+            pd.testing.assert_frame_equal(frame, notebook_features(data), rtol=1e-8)
+
+    def test_extra_features(self):
+        data = self.universe[0]
+        table = FeatureTable([data])
+        ratio = table.get('close_ma5_ratio')[0]
+        expected = data['Close'] / data['Close'].rolling(5).mean()
+        np.testing.assert_allclose(ratio, expected.to_numpy(), rtol=1e-10)
+        np.testing.assert_allclose(table.get('high_low_ratio')[0], (data['High'] / data['Low']).to_numpy())
+        np.testing.assert_allclose(table.get('price_diff')[0][1:], data['Close'].diff().to_numpy()[1:])
+
+
+class TestCompactFeatures(unittest.TestCase):
+    def setUp(self):
+        self.universe = list(generate_universe(3, 300).values())
+        self.universe[2] = self.universe[2].iloc[60:]
+        self.compact = FeatureTable(self.universe).compact(FEATURE_SETS['linear'])
+
+    def test_matches_frames_in_float32(self):
+        for data, compact in zip(self.universe, self.compact):
+            expected = prepare_features(data)
+            frame = compact.to_frame()
+            self.assertEqual(list(frame.columns), list(expected.columns))
+            self.assertEqual(frame['day_of_week'].dtype, np.int8)
+            self.assertTrue((frame.drop(columns='day_of_week').dtypes == np.float32).all())
+            pd.testing.assert_frame_equal(frame, expected, check_dtype=False, rtol=1e-6)
+
+    def test_rows_are_views_of_one_block(self):
+        first, second = self.compact[0], self.compact[1]
+        self.assertTrue(first.values.flags['C_CONTIGUOUS'])
+        self.assertIs(first.values.base, second.values.base)
+
+        train, test = first.split(0.8)
+        self.assertEqual((len(train), len(test)), (int(len(first) * 0.8), len(first) - int(len(first) * 0.8)))
+        self.assertTrue(np.shares_memory(train.values, first.values))
+        self.assertTrue(np.shares_memory(test.column('price'), first.values))
+        self.assertTrue(np.shares_memory(test.column('day_of_week'), first.codes))
+
+    def test_intermediates_are_freed(self):
+        table = FeatureTable(self.universe)
+        table.get('ma5')
+        table.compact(FEATURE_SETS['linear'])
+        # Only what was computed before the call is kept
+        self.assertEqual(list(table.values), ['price', 'ma5'])
+
+    def test_train_and_predict(self):
+        data, compact = self.universe[0], self.compact[0]
+        frame = prepare_features(data)
+        for mode in ('recursive', 'direct'):
+            model, score, names = train_model(compact, mode, horizon=10)
+            expected_model, expected_score, _ = train_model(frame, mode, horizon=10)
+            self.assertAlmostEqual(score, expected_score, places=4)
+            np.testing.assert_allclose(predict_future_prices(model, compact, names, 10),
+                                       predict_future_prices(expected_model, frame, names, 10), rtol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
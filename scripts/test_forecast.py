@@ -0,0 +1,91 @@
+"""
+Tests for the array forecast engine against the original per-day loop
+"""
+import unittest
+import numpy as np
+
+from forecast import forecast_linear
+from prediction import (prepare_features, train_model, predict_future_prices,
+                        predict_future_prices_many, _predict_recursive)
+from simulation import direct_band
+from test_bar_store import make_bars
+
+
+def make_features(seed, periods=400):
+    rng = np.random.default_rng(seed)
+    bars = make_bars(periods=periods)
+    bars['Close'] = 100 + np.cumsum(rng.normal(0, 1, periods))
+    bars['High'] = bars['Close'] * 1.01
+    bars['Low'] = bars['Close'] * 0.99
+    bars['Volume'] = rng.integers(1_000_000, 100_000_000, periods)
+    return prepare_features(bars)
+
+
+class TestForecast(unittest.TestCase):
+    def setUp(self):
+        self.features = [make_features(seed) for seed in range(3)]
+        self.fits = [train_model(f) for f in self.features]
+
+    def test_matches_recursive_loop(self):
+        for features, (model, _, names) in zip(self.features, self.fits):
+            fast = predict_future_prices(model, features, names, 60)
+            slow = _predict_recursive(model, features, names, 60)
+            np.testing.assert_array_equal(np.array(fast), np.array(slow))
+
+    def test_batch_of_symbols(self):
+        models = [fit[0] for fit in self.fits]
+        names = self.fits[0][2]
+        batch = predict_future_prices_many(models, self.features, names, 30)
+
+        self.assertEqual(batch.shape, (3, 30))
+        for i, (features, model) in enumerate(zip(self.features, models)):
+            expected = _predict_recursive(model, features, names, 30)
+            np.testing.assert_array_equal(batch[i], np.array(expected))
+
+    def test_shared_model_over_many_rows(self):
+        model, _, names = self.fits[0]
+        rows = np.array([f[list(names)].to_numpy(dtype=float)[-1] for f in self.features])
+        prices = np.array([f['price'].iloc[-1] for f in self.features])
+
+        batch = forecast_linear(model.coef_, model.intercept_, rows, prices, 25, list(names))
+        for i, features in enumerate(self.features):
+            expected = _predict_recursive(model, features, names, 25)
+            np.testing.assert_allclose(batch[i], expected, rtol=1e-12)
+
+
+class TestDirectForecast(unittest.TestCase):
+    def setUp(self):
+        self.features = make_features(5)
+        self.model, self.score, self.names = train_model(self.features, mode='direct', horizon=30)
+
+    def test_one_output_per_day_ahead(self):
+        self.assertEqual(self.model.coef_.shape, (30, len(self.names)))
+        expected = self.model.predict(self.features[list(self.names)].iloc[-1:])[0]
+
+        predictions = predict_future_prices(self.model, self.features, self.names, 30)
+        np.testing.assert_allclose(predictions, expected, rtol=1e-12)
+        np.testing.assert_allclose(predictions[:10],
+                                   predict_future_prices(self.model, self.features, self.names, 10))
+
+        with self.assertRaises(ValueError):
+            predict_future_prices(self.model, self.features, self.names, 31)
+
+    def test_first_day_matches_recursive_fit(self):
+        # Day one of a direct model is the same regression as the next-day model,
+        # trained on the rows that also have 30 days of future prices
+        recursive, _, _ = train_model(self.features.iloc[:-29])
+        np.testing.assert_allclose(self.model.coef_[0], recursive.coef_, rtol=1e-6, atol=1e-12)
+
+    def test_band_and_mode_errors(self):
+        lower, upper = direct_band(self.model, self.features, self.names, days=12)
+        self.assertEqual(lower.shape, (12,))
+        self.assertTrue(np.all(lower < upper))
+
+        with self.assertRaises(ValueError):
+            train_model(self.features, mode='sideways')
+        with self.assertRaises(ValueError):
+            train_model(self.features.iloc[:20], mode='direct', horizon=30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the NumPy indicator kernels against the pandas versions
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+import indicators
+from prediction import prepare_features, prepare_features_many
+from synthetic import generate_universe
+
+
+def assert_matches(test, actual, expected, rtol=1e-8):
+    expected = np.asarray(expected, dtype=float)
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=rtol, atol=1e-12)
+
+
+class TestIndicators(unittest.TestCase):
+    def setUp(self):
+        universe = list(generate_universe(4, 600).values())
+        self.close = np.vstack([data['Close'].to_numpy() for data in universe])
+        self.high = np.vstack([data['High'].to_numpy() for data in universe])
+        self.low = np.vstack([data['Low'].to_numpy() for data in universe])
+        # A late listing and a missing bar
+        self.gappy = self.close.copy()
+        self.gappy[1, :40] = np.nan
+        self.gappy[2, 300] = np.nan
+
+    def per_row(self, values, fn):
+        return [fn(pd.Series(row)) for row in values]
+
+    def test_rolling_kernels(self):
+        for values in (self.close, self.gappy):
+            assert_matches(self, indicators.sma(values, 20), self.per_row(values, lambda s: s.rolling(20).mean()))
+            assert_matches(self, indicators.rolling_std(values, 20),
+                           self.per_row(values, lambda s: s.rolling(20).std()))
+            assert_matches(self, indicators.pct_change(values),
+                           self.per_row(values, lambda s: s.pct_change(fill_method=None)))
+            assert_matches(self, indicators.volatility(values),
+                           self.per_row(values, lambda s: s.pct_change(fill_method=None).rolling(20).std()))
+
+        middle, upper, lower = indicators.bollinger(self.close, 20, k=2)
+        std = self.per_row(self.close, lambda s: s.rolling(20).std())
+        assert_matches(self, upper, middle + 2 * np.array(std))
+        assert_matches(self, lower, middle - 2 * np.array(std))
+
+    def test_exponential_kernels(self):
+        late_start = self.gappy[:2]
+        assert_matches(self, indicators.ema(late_start, span=12),
+                       self.per_row(late_start, lambda s: s.ewm(span=12, adjust=False).mean()))
+
+        def wilder(s):
+            delta = s.diff()
+            gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+            loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+            return 100 - 100 / (1 + gain / loss)
+        assert_matches(self, indicators.rsi(self.close), self.per_row(self.close, wilder))
+
+        expected = []
+        for high, low, close in zip(self.high, self.low, self.close):
+            high, low, previous = pd.Series(high), pd.Series(low), pd.Series(close).shift()
+            true_range = pd.concat([high - low, (high - previous).abs(), (low - previous).abs()], axis=1).max(axis=1)
+            expected.append(true_range.ewm(alpha=1 / 14, adjust=False, min_periods=14).mean())
+        assert_matches(self, indicators.atr(self.high, self.low, self.close), expected)
+
+    def test_one_symbol_and_edge_cases(self):
+        row = self.close[0]
+        self.assertEqual(indicators.sma(row, 5).shape, row.shape)
+        np.testing.assert_array_equal(indicators.sma(row, 5), indicators.sma(self.close, 5)[0])
+
+        rising = np.arange(1.0, 40.0)
+        self.assertTrue(np.all(indicators.rsi(rising)[14:] == 100))
+        flat = np.full(30, 7.0)
+        np.testing.assert_array_equal(indicators.rolling_std(flat, 10)[9:], 0.0)
+
+
+class TestPrepareFeaturesBackend(unittest.TestCase):
+    def test_numpy_backend_matches_pandas(self):
+        universe = list(generate_universe(3, 400).values())
+        universe[1] = universe[1].iloc[150:]
+
+        for data, features in zip(universe, prepare_features_many(universe)):
+            expected = prepare_features(data)
+            pd.testing.assert_frame_equal(features, expected, rtol=1e-10)
+            pd.testing.assert_frame_equal(prepare_features(data, backend='numpy'), expected, rtol=1e-10)
+
+        with self.assertRaises(ValueError):
+            prepare_features(universe[0], backend='polars')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+"""
+Tests for chunked intraday ingestion, features and training (offline)
+"""
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from bar_store import LocalFileSource, exchange_now
+from forecast import FEATURE_COLUMNS
+from intraday import (FETCH_DAYS, ChunkedFeatures, IntradayStore, StreamingTrainer, forecast_intraday,
+                      future_times, session_times)
+from prediction import prepare_features, train_model
+from synthetic import SyntheticSource
+
+
+class CountingSource(SyntheticSource):
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        self.calls.append((pd.Timestamp(start), pd.Timestamp(end), interval))
+        return super().fetch(symbol, start, end, interval)
+
+
+class ClockedSource(SyntheticSource):
+    """Only returns bars that have started by the store's clock"""
+
+    def __init__(self):
+        self.now = pd.Timestamp('2024-01-10 11:00')
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        data = super().fetch(symbol, start, end, interval)
+        return data[data.index < self.now]
+
+
+class ThinSource(SyntheticSource):
+    """Every 7th bar trades nothing"""
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        data = super().fetch(symbol, start, end, interval)
+        if interval != '1d':
+            data = data.copy()
+            data.iloc[::7, data.columns.get_loc('Volume')] = 0
+        return data
+
+
+class TestIntraday(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = CountingSource()
+        self.store = IntradayStore(self.tmp.name, self.source)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_session_calendar(self):
+        times = session_times(['2024-03-01'], '5m')
+        self.assertEqual(len(times), 78)
+        self.assertEqual(times[0], pd.Timestamp('2024-03-01 09:30'))
+        self.assertEqual(times[-1], pd.Timestamp('2024-03-01 15:55'))
+
+        # Friday afternoon rolls over the weekend
+        future = future_times(pd.Timestamp('2024-03-01 15:50'), 3, '5m')
+        self.assertEqual(list(future), [pd.Timestamp('2024-03-01 15:55'), pd.Timestamp('2024-03-04 09:30'),
+                                        pd.Timestamp('2024-03-04 09:35')])
+
+    def test_ingest_is_chunked_and_resumable(self):
+        self.store.ingest('AAA', '2024-01-01', '2024-01-20', '1m')
+        # No request spans more than FETCH_DAYS
+        self.assertEqual(len(self.source.calls), 3)
+        self.assertTrue(all(end - start <= pd.Timedelta(days=FETCH_DAYS['1m']) for start, end, _ in self.source.calls))
+        self.assertEqual(self.store.count('AAA', '2024-01-01', '2024-01-20', '1m'), 15 * 390)
+
+        # A repeat request is served from disk; a longer one only fetches the new days
+        self.store.ingest('AAA', '2024-01-01', '2024-01-20', '1m')
+        self.assertEqual(len(self.source.calls), 3)
+        self.store.ingest('AAA', '2024-01-01', '2024-01-25', '1m')
+        self.assertEqual(self.source.calls[-1][:2], (pd.Timestamp('2024-01-20'), pd.Timestamp('2024-01-25')))
+
+        expected = self.source.fetch('AAA', '2024-01-01', '2024-01-25', '1m')
+        stored = self.store.get('AAA', '2024-01-01', '2024-01-25', '1m')
+        np.testing.assert_array_equal(stored.index.values, expected.index.values)
+        np.testing.assert_allclose(stored.to_numpy(), expected[stored.columns].to_numpy())
+
+    def test_interrupted_ingest_resumes(self):
+        failing = CountingSource()
+        fetch = failing.fetch
+
+        def fetch_twice(symbol, start, end, interval='1d'):
+            if len(failing.calls) == 2:
+                raise ConnectionError('network down')
+            return fetch(symbol, start, end, interval)
+
+        failing.fetch = fetch_twice
+        with self.assertRaises(ConnectionError):
+            IntradayStore(self.tmp.name, failing).ingest('AAA', '2024-01-01', '2024-01-29', '1m')
+
+        # The retry starts with the window that failed, not at 2024-01-01
+        self.store.ingest('AAA', '2024-01-01', '2024-01-29', '1m')
+        self.assertEqual(self.source.calls[0][:2], (pd.Timestamp('2024-01-15'), pd.Timestamp('2024-01-22')))
+        self.assertEqual(self.store.count('AAA', '2024-01-01', '2024-01-29', '1m'), 20 * 390)
+
+        # The same for filling in before what is stored
+        failing.calls = []
+        with self.assertRaises(ConnectionError):
+            IntradayStore(self.tmp.name, failing).ingest('AAA', '2023-12-04', '2024-01-29', '1m')
+        self.source.calls = []
+        self.store.ingest('AAA', '2023-12-04', '2024-01-29', '1m')
+        self.assertEqual(self.source.calls[0][:2], (pd.Timestamp('2023-12-11'), pd.Timestamp('2023-12-18')))
+        self.assertEqual(self.store.count('AAA', '2023-12-04', '2024-01-29', '1m'), 40 * 390)
+
+    def test_empty_window_is_fetched_again(self):
+        fetch = self.source.fetch
+        failures = [True]
+
+        def flaky(symbol, start, end, interval='1d'):
+            if len(self.source.calls) == 1 and failures:
+                failures.pop()
+                return fetch(symbol, start, end, interval).iloc[:0]
+            return fetch(symbol, start, end, interval)
+
+        self.source.fetch = flaky
+        # The second window comes back empty, as yf.download does on a network error
+        self.assertEqual(self.store.ingest('AAA', '2024-01-01', '2024-01-20', '1m'), 5 * 390)
+        self.assertEqual(self.store.ingest('AAA', '2024-01-01', '2024-01-20', '1m'), 15 * 390)
+        self.assertEqual(self.source.calls[-2][0], pd.Timestamp('2024-01-08'))
+
+    def test_clock_is_new_york_time(self):
+        self.assertIs(IntradayStore(self.tmp.name).clock, exchange_now)
+        new_york = pd.Timestamp.now(tz='UTC').tz_convert('America/New_York').tz_localize(None)
+        self.assertLess(abs(exchange_now() - new_york), pd.Timedelta(minutes=1))
+
+    def test_get_refuses_long_histories(self):
+        with self.assertRaisesRegex(ValueError, 'iter_chunks'):
+            self.store.get('AAA', '2024-01-01', '2024-01-20', '1m', max_bars=1_000)
+        self.assertEqual(len(self.store.get('AAA', '2024-01-01', '2024-01-20', '1m', max_bars=None)), 15 * 390)
+
+    def test_open_session_is_fetched_again(self):
+        source = ClockedSource()
+        store = IntradayStore(self.tmp.name, source, clock=lambda: source.now)
+        # 11:00: today's session has 18 of its 78 bars so far
+        self.assertEqual(store.ingest('AAA', '2024-01-08', '2024-01-11', '5m'), 2 * 78 + 18)
+
+        source.now = pd.Timestamp('2024-01-10 16:30')
+        self.assertEqual(store.ingest('AAA', '2024-01-08', '2024-01-11', '5m'), 3 * 78)
+        source.now = pd.Timestamp('2024-01-11 10:00')
+        self.assertEqual(store.ingest('AAA', '2024-01-08', '2024-01-12', '5m'), 3 * 78 + 6)
+        self.assertEqual(store.count('AAA', '2024-01-10', '2024-01-11', '5m'), 78)
+
+    def test_chunks_are_whole_sessions(self):
+        chunks = list(self.store.iter_chunks('AAA', '2024-01-01', '2024-02-01', '5m', chunk_bars=200))
+        self.assertEqual([len(chunk) for chunk in chunks], [234] * 7 + [156])
+        self.assertTrue(all(chunk.index[-1].time() == pd.Timestamp('15:55').time() for chunk in chunks))
+
+    def test_chunked_features_match_full_frame(self):
+        full = prepare_features(self.store.get('AAA', '2024-01-01', '2024-03-01', '5m'))
+        features = ChunkedFeatures()
+        chunked = pd.concat([features.update(chunk) for chunk in
+                             self.store.iter_chunks('AAA', '2024-01-01', '2024-03-01', '5m', chunk_bars=100)])
+        pd.testing.assert_index_equal(chunked.index, full.index)
+        np.testing.assert_allclose(chunked.to_numpy(), full.to_numpy(), rtol=1e-10)
+
+    def test_streaming_fit_matches_train_model(self):
+        full = prepare_features(self.store.get('AAA', '2024-01-01', '2024-03-01', '5m'))
+        model, score, _ = train_model(full)
+
+        features = ChunkedFeatures()
+        trainer = StreamingTrainer(len(full) - 1)
+        for chunk in self.store.iter_chunks('AAA', '2024-01-01', '2024-03-01', '5m', chunk_bars=300):
+            trainer.update(features.update(chunk))
+        np.testing.assert_allclose(trainer.model.coef_, model.coef_, rtol=1e-6, atol=1e-8)
+        self.assertAlmostEqual(trainer.model.intercept_, model.intercept_, places=5)
+        self.assertAlmostEqual(trainer.score, score, places=8)
+        self.assertEqual(list(trainer.last_features.columns), list(full.columns))
+        self.assertEqual(trainer.last_features.index[-1], full.index[-1])
+        self.assertEqual(list(trainer.feature_names), FEATURE_COLUMNS)
+
+    def test_zero_volume_bars_are_skipped(self):
+        store = IntradayStore(self.tmp.name, ThinSource())
+        full = prepare_features(store.get('AAA', '2024-01-01', '2024-03-01', '5m'))
+        self.assertTrue(np.isinf(full['volume_change']).any())
+        kept = full[np.isfinite(full[FEATURE_COLUMNS + ['price']].to_numpy()).all(axis=1)]
+        model, score, _ = train_model(kept)
+
+        features = ChunkedFeatures()
+        trainer = StreamingTrainer(len(kept) - 1)
+        for chunk in store.iter_chunks('AAA', '2024-01-01', '2024-03-01', '5m', chunk_bars=300):
+            trainer.update(features.update(chunk))
+        np.testing.assert_allclose(trainer.model.coef_, model.coef_, rtol=1e-6, atol=1e-8)
+        self.assertAlmostEqual(trainer.score, score, places=8)
+
+        with mock.patch('intraday.datetime') as clock:
+            clock.now.return_value = datetime(2024, 3, 1, 17, 0)
+            _, result = forecast_intraday('AAA', 10, 30, '5m', store)
+        self.assertTrue(np.isfinite(result['predictions']).all())
+        self.assertTrue(np.isfinite(result['accuracy']))
+
+    def test_local_csv_source(self):
+        bars = self.source.fetch('AAA', '2024-01-01', '2024-01-10', '15m')
+        bars.to_csv(os.path.join(self.tmp.name, 'AAA_15m.csv'))
+        source = LocalFileSource(self.tmp.name, chunksize=50)
+        data = source.fetch('AAA', '2024-01-03', '2024-01-05', '15m')
+        self.assertEqual(len(data), 2 * 26)
+        np.testing.assert_allclose(data.to_numpy(), bars.loc['2024-01-03':'2024-01-04'].to_numpy())
+
+    def test_cli_intraday_end_to_end(self):
+        from cli import main
+
+        env = {'STOCK_PREDICTOR_INTRADAY_DIR': self.tmp.name, 'STOCK_PREDICTOR_DATA_DIR': self.tmp.name,
+               'STOCK_PREDICTOR_MODEL_DIR': self.tmp.name + '/models'}
+        output = io.StringIO()
+        with mock.patch.dict(os.environ, env), redirect_stdout(output):
+            status = main(['AAA', '--source', 'synthetic', '--interval', '1h', '--days', '10', '--history', '60',
+                           '--json'])
+        self.assertEqual(status, 0)
+        result = json.loads(output.getvalue())[0]
+        self.assertEqual(len(result['predictions']), 10)
+        self.assertEqual(len(result['dates']), 10)
+        # Hourly bars: session opens on the half hour
+        self.assertTrue(all(date.endswith(':30') for date in result['dates']))
+        self.assertGreater(result['accuracy'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for pipeline timing, counters and the sampling profiler
+"""
+import logging
+import tempfile
+import time
+import unittest
+
+import metrics
+from bar_store import BarStore
+from test_bar_store import CountingSource, make_bars
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.handler = RecordingHandler()
+        metrics.logger.addHandler(self.handler)
+        metrics.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        metrics.logger.removeHandler(self.handler)
+
+    def test_span_logs_structured_record(self):
+        with metrics.span('train_model', symbol='AAPL'):
+            time.sleep(0.01)
+        metrics.record_rows('prepare_features', 230, symbol='AAPL')
+
+        span_record = self.handler.records[0].metrics
+        self.assertEqual(span_record['stage'], 'train_model')
+        self.assertEqual(span_record['symbol'], 'AAPL')
+        self.assertGreaterEqual(span_record['seconds'], 0.01)
+        self.assertEqual(self.handler.records[1].metrics['rows'], 230)
+
+        stages = metrics.summary()['stages']
+        self.assertEqual(stages['train_model']['count'], 1)
+
+        # JSON output carries the same fields
+        line = metrics.JsonFormatter().format(self.handler.records[0])
+        self.assertIn('"stage": "train_model"', line)
+
+    def test_failed_span_is_marked(self):
+        with self.assertRaises(ValueError):
+            with metrics.span('download'):
+                raise ValueError('boom')
+        self.assertEqual(self.handler.records[-1].metrics['status'], 'error')
+
+    def test_bar_cache_hits_and_misses(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = BarStore(tmp, CountingSource(make_bars()))
+            store.get('AAPL', '2024-01-01', '2024-03-01')
+            store.get('AAPL', '2024-01-01', '2024-03-01')
+            store.get('AAPL', '2024-01-01', '2024-04-01')
+
+        counters = metrics.summary()['counters']
+        self.assertEqual(counters['bar_cache/miss'], 1)
+        self.assertEqual(counters['bar_cache/hit'], 1)
+        self.assertEqual(counters['bar_cache/topup'], 1)
+
+    def test_sampling_profiler_finds_hot_function(self):
+        def busy_loop():
+            end = time.perf_counter() + 0.2
+            while time.perf_counter() < end:
+                pass
+
+        with metrics.profile_run(interval=0.002) as profiler:
+            busy_loop()
+
+        # Self time: the loop itself, not the test and pytest frames around it
+        hot = profiler.hot_functions()
+        self.assertEqual(hot[0][0], 'test_metrics.py:busy_loop')
+        self.assertGreater(hot[0][1], 0.5)
+        self.assertLess(dict(hot).get('test_metrics.py:test_sampling_profiler_finds_hot_function', 0), 0.1)
+
+        inclusive = dict(profiler.hot_functions(top=None, inclusive=True))
+        self.assertGreater(inclusive['test_metrics.py:test_sampling_profiler_finds_hot_function'], 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
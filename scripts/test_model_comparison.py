@@ -0,0 +1,54 @@
+"""
+Tests for the parallel model-comparison harness
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.linear_model import LinearRegression, Ridge
+
+from model_comparison import compare_models, expand_grid, build_matrices
+from prediction import prepare_features, train_model
+from synthetic import generate_bars
+
+
+class TestModelComparison(unittest.TestCase):
+    def setUp(self):
+        self.bars = {'AAA': generate_bars(300, seed=1), 'BBB': generate_bars(240, seed=2)}
+        self.grid = [('linear', LinearRegression, {}),
+                     ('ridge', Ridge, {'alpha': [0.1, 10.0]})]
+
+    def test_expand_grid(self):
+        runs = expand_grid(self.grid)
+        self.assertEqual([(name, params) for name, _, params in runs],
+                         [('linear', {}), ('ridge', {'alpha': 0.1}), ('ridge', {'alpha': 10.0})])
+
+    def test_matrices_are_memory_mapped_views_of_the_features(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = build_matrices(self.bars, directory)
+            features = prepare_features(self.bars['AAA'], backend='numpy')
+            X = np.load(paths['AAA'][0], mmap_mode='r')
+            self.assertIsInstance(X, np.memmap)
+            np.testing.assert_array_equal(X, features.drop(columns='price').to_numpy(dtype=np.float64)[:-1])
+
+    def test_table_covers_every_symbol_and_model(self):
+        table = compare_models(self.bars, self.grid, n_jobs=2)
+        self.assertEqual(len(table), 2 * 3)
+        self.assertEqual(sorted(table['params'].unique()), ['', 'alpha=0.1', 'alpha=10.0'])
+        self.assertTrue((table['n_train'] + table['n_test'] > 100).all())
+
+        # Same split and score as the model the predictor trains
+        for symbol, bars in self.bars.items():
+            _, score, _ = train_model(prepare_features(bars))
+            row = table[(table['symbol'] == symbol) & (table['model'] == 'linear')]
+            self.assertAlmostEqual(row['r2'].iloc[0], score, places=8)
+
+    def test_cache_dir_is_kept(self):
+        with tempfile.TemporaryDirectory() as directory:
+            compare_models(self.bars, self.grid[:1], n_jobs=1, cache_dir=directory)
+            self.assertEqual(sorted(os.listdir(directory)), ['AAA.X.npy', 'AAA.y.npy', 'BBB.X.npy', 'BBB.y.npy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
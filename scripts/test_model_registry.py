@@ -0,0 +1,137 @@
+"""
+Tests for the trained-model registry
+"""
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+
+import metrics
+import prediction
+from model_registry import ModelRegistry, bars_digest
+from prediction import get_trained_model, prepare_features, predict_future_prices, train_model
+from synthetic import generate_bars
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(self.tmp.name)
+        self.bars = generate_bars(300, seed=3)
+        self.features = prepare_features(self.bars)
+        metrics.reset()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def counters(self):
+        return metrics.summary()['counters']
+
+    def test_repeat_skips_training(self):
+        first = get_trained_model('aapl', self.bars, self.features, registry=self.registry)
+        with mock.patch.object(prediction, 'train_model', side_effect=AssertionError('retrained')):
+            model, score, names = get_trained_model('AAPL', self.bars, self.features, registry=self.registry)
+
+        self.assertEqual(score, first[1])
+        self.assertEqual(list(names), list(first[2]))
+        np.testing.assert_array_equal(predict_future_prices(model, self.features, names, 30),
+                                      predict_future_prices(first[0], self.features, first[2], 30))
+        self.assertEqual(self.counters()['model_cache/miss'], 1)
+        self.assertEqual(self.counters()['model_cache/hit'], 1)
+
+    def test_survives_restart(self):
+        model, score, names = train_model(self.features, 'direct', 10)
+        key = self.registry.key('AAPL', self.bars, 'linear-direct10')
+        self.registry.put(key, model, score, names)
+
+        loaded, loaded_score, loaded_names = ModelRegistry(self.tmp.name).get(key)
+        self.assertEqual(loaded_score, score)
+        np.testing.assert_array_equal(loaded.coef_, model.coef_)
+        rows = self.features[list(names)].iloc[-3:]
+        np.testing.assert_allclose(loaded.predict(rows), model.predict(rows))
+        self.assertEqual(self.counters()['model_cache/disk'], 1)
+
+    def test_new_bars_invalidate(self):
+        old = self.registry.key('AAPL', self.bars)
+        self.registry.put(old, *train_model(self.features))
+
+        newer = generate_bars(301, seed=3)
+        self.assertNotEqual(bars_digest(newer), bars_digest(self.bars))
+        get_trained_model('AAPL', newer, prepare_features(newer), registry=self.registry)
+
+        # The model for the old bars is gone from memory and disk
+        self.assertIsNone(ModelRegistry(self.tmp.name).get(old))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, 'AAPL'))), 1)
+        # A different feature version or model type is a different key
+        self.assertNotEqual(self.registry.key('AAPL', newer, feature_version=2),
+                            self.registry.key('AAPL', newer))
+
+    def test_history_windows_do_not_evict_each_other(self):
+        bars = generate_bars(520, seed=5)
+        year, two_years = bars.iloc[-252:], bars
+        for data, window in ((year, 365), (two_years, 730)):
+            get_trained_model('AAPL', data, prepare_features(data), registry=self.registry, window=window)
+
+        # Switching back and forth between the windows never retrains
+        with mock.patch.object(prediction, 'train_model', side_effect=AssertionError('retrained')):
+            for data, window in ((year, 365), (two_years, 730), (year, 365)):
+                get_trained_model('AAPL', data, prepare_features(data), registry=self.registry, window=window)
+
+        # A newer 1-year window only replaces the old 1-year model
+        newer = generate_bars(521, seed=5).iloc[-252:]
+        get_trained_model('AAPL', newer, prepare_features(newer), registry=self.registry, window=365)
+        restarted = ModelRegistry(self.tmp.name)
+        self.assertIsNone(restarted.get(self.registry.key('AAPL', year, window=365)))
+        self.assertIsNotNone(restarted.get(self.registry.key('AAPL', two_years, window=730)))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, 'AAPL'))), 2)
+
+        # Without a window, bars from another first date are another window
+        self.assertNotEqual(self.registry.key('AAPL', year)[2], self.registry.key('AAPL', two_years)[2])
+        self.assertEqual(self.registry.key('AAPL', year)[2], self.registry.key('AAPL', year.iloc[:-1])[2])
+
+    def test_concurrent_requests_train_once(self):
+        calls = []
+
+        def counting_train(*args):
+            calls.append(args)
+            return train_model(*args)
+
+        with mock.patch.object(prediction, 'train_model', side_effect=counting_train), \
+                ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(lambda _: get_trained_model('AAPL', self.bars, self.features,
+                                                                registry=self.registry, window=365), range(32)))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(score == results[0][1] for _, score, _ in results))
+
+        # Puts of one key from many threads never trip over each other's temporary files
+        key = self.registry.key('MSFT', self.bars)
+        fit = train_model(self.features)
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(lambda _: self.registry.put(key, *fit), range(64)))
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'MSFT')), [os.path.basename(self.registry._path(key))])
+
+    def test_size_limits(self):
+        fit = train_model(self.features)
+        self.registry.put(self.registry.key('X', self.bars), *fit)
+        size = os.path.getsize(self.registry._path(self.registry.key('X', self.bars)))
+
+        registry = ModelRegistry(os.path.join(self.tmp.name, 'limited'), max_entries=2, max_bytes=int(size * 2.5))
+        keys = [registry.key(symbol, self.bars) for symbol in ('A', 'B', 'C', 'D')]
+        for i, key in enumerate(keys[:3]):
+            registry.put(key, *fit)
+            os.utime(registry._path(key), (i, i))
+
+        # The oldest file goes once the directory is over its byte budget
+        self.assertEqual(sorted(os.listdir(registry.root)), ['B', 'C'])
+        self.assertEqual(list(registry._memory), keys[1:3])
+
+        # Reading B makes C the oldest
+        registry.get(keys[1])
+        registry.put(keys[3], *fit)
+        self.assertEqual(sorted(os.listdir(registry.root)), ['B', 'D'])
+        self.assertEqual(list(registry._memory), [keys[1], keys[3]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the portfolio module against sklearn's Ledoit-Wolf and pandas
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.covariance import ledoit_wolf
+
+from portfolio import (ShrinkageCovariance, mean_variance_weights, min_variance_weights, predicted_returns,
+                       return_matrix)
+from prediction import prepare_features, train_model, predict_future_prices
+from synthetic import generate_universe
+
+
+class TestPortfolio(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Correlated returns through a shared market factor
+        self.returns = rng.normal(0.0005, 0.02, (300, 40)) + rng.normal(0, 0.01, (300, 1))
+
+    def test_return_matrix_aligns_dates(self):
+        bars = generate_universe(3, 120)
+        symbols = list(bars)
+        bars[symbols[1]] = bars[symbols[1]].drop(bars[symbols[1]].index[[5, 50]])
+        bars[symbols[2]] = bars[symbols[2]].iloc[10:]
+
+        returns, dates, names = return_matrix(bars)
+        closes = pd.concat({s: bars[s]['Close'] for s in symbols}, axis=1, join='inner')
+        expected = closes.pct_change().iloc[1:]
+        self.assertEqual(names, symbols)
+        self.assertEqual(returns.shape, (len(closes) - 1, 3))
+        self.assertTrue((dates == closes.index[:-1]).all())
+        np.testing.assert_allclose(returns, expected.to_numpy(), rtol=1e-12)
+
+    def test_matches_sklearn_ledoit_wolf(self):
+        estimate = ShrinkageCovariance(40)
+        estimate.update(self.returns)
+        covariance, shrinkage = estimate.covariance()
+        expected, expected_shrinkage = ledoit_wolf(self.returns)
+        self.assertAlmostEqual(shrinkage, expected_shrinkage, places=10)
+        np.testing.assert_allclose(covariance, expected, rtol=1e-9, atol=1e-15)
+        np.testing.assert_allclose(estimate.empirical(), np.cov(self.returns.T, bias=True), rtol=1e-9, atol=1e-15)
+
+    def test_incremental_and_rolling_updates(self):
+        estimate = ShrinkageCovariance(40)
+        estimate.update(self.returns[:200])
+        for day in range(200, 300):
+            estimate.update(self.returns[day])
+            estimate.downdate(self.returns[day - 200])
+        out = np.empty((40, 40))
+        covariance, shrinkage = estimate.covariance(out)
+        self.assertIs(covariance, out)
+
+        expected, expected_shrinkage = ledoit_wolf(self.returns[100:])
+        self.assertAlmostEqual(shrinkage, expected_shrinkage, places=8)
+        np.testing.assert_allclose(covariance, expected, rtol=1e-8, atol=1e-14)
+
+        with self.assertRaises(ValueError):
+            estimate.update(np.zeros((1, 39)))
+
+    def test_weights(self):
+        estimate = ShrinkageCovariance(40)
+        estimate.update(self.returns)
+        covariance, _ = estimate.covariance()
+
+        weights = min_variance_weights(covariance)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        # Optimal: every asset has the same marginal variance
+        marginal = covariance @ weights
+        np.testing.assert_allclose(marginal, marginal.mean(), rtol=1e-8)
+
+        expected_returns = np.linspace(-0.001, 0.002, 40)
+        weights = mean_variance_weights(covariance, expected_returns, risk_aversion=5.0)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        # Optimal: mu - risk_aversion * C w is the same for every asset (the budget multiplier)
+        gradient = expected_returns - 5.0 * covariance @ weights
+        np.testing.assert_allclose(gradient, gradient.mean(), atol=1e-12)
+        self.assertGreater(weights @ expected_returns, min_variance_weights(covariance) @ expected_returns)
+
+    def test_predicted_returns_follow_the_model(self):
+        bars = list(generate_universe(3, 300).values())
+        features_list = [prepare_features(data) for data in bars]
+        returns = predicted_returns(features_list, 10)
+        for features, daily in zip(features_list, returns):
+            model, _, names = train_model(features)
+            predictions = predict_future_prices(model, features, names, 10)
+            expected = (predictions[-1] / features['price'].iloc[-1]) ** (1 / 10) - 1
+            self.assertAlmostEqual(daily, expected, places=8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Tests for the multi-resolution bar pyramid against pandas resampling
+"""
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from bar_store import BarStore
+from charts import PriceChart
+from pyramid import BarPyramid, PyramidCache
+from synthetic import SyntheticSource, generate_bars
+from test_bar_store import CountingSource
+
+
+def resampled(bars, rule):
+    """The expected level: OHLCV and base MA20/MA50 at each bucket's last bar"""
+    data = bars.assign(MA20=bars['Close'].rolling(20).mean(), MA50=bars['Close'].rolling(50).mean())
+    grouped = data.resample(rule, label='left', closed='left')
+    expected = pd.DataFrame({
+        'Close': grouped['Close'].last(), 'High': grouped['High'].max(), 'Low': grouped['Low'].min(),
+        'Open': grouped['Open'].first(), 'Volume': grouped['Volume'].sum(),
+        'MA20': grouped['MA20'].last(), 'MA50': grouped['MA50'].last(),
+    })
+    return expected[grouped['Close'].count() > 0]
+
+
+class TestBarPyramid(unittest.TestCase):
+    def setUp(self):
+        self.bars = generate_bars(1_500, seed=3)
+
+    def assert_level(self, pyramid, level, expected):
+        data = pyramid.view(level=level)
+        np.testing.assert_array_equal(data.index.values, expected.index.values)
+        # Rolling sums in indicators.sma vs pandas: same to ~1e-12
+        np.testing.assert_allclose(data.to_numpy(), expected[data.columns].to_numpy(), rtol=1e-10)
+
+    def test_levels_match_pandas(self):
+        pyramid = BarPyramid(self.bars)
+        self.assert_level(pyramid, '1d', resampled(self.bars, 'D').dropna(subset=['Close']))
+        self.assert_level(pyramid, '1wk', resampled(self.bars, 'W-MON'))
+        self.assert_level(pyramid, '1mo', resampled(self.bars, 'MS'))
+
+    def test_incremental_updates_match_rebuild(self):
+        pyramid = BarPyramid(self.bars.iloc[:1_000])
+        for start in range(1_000, 1_500, 37):
+            pyramid.update(self.bars.iloc[start:start + 37])
+        # A revised last bar replaces the stored one
+        revised = self.bars.iloc[-1:].copy()
+        revised['Close'] *= 1.01
+        pyramid.update(revised)
+        expected = pd.concat([self.bars.iloc[:-1], revised])
+
+        rebuilt = BarPyramid(expected)
+        for level in ('1d', '1wk', '1mo'):
+            pd.testing.assert_frame_equal(pyramid.view(level=level), rebuilt.view(level=level))
+        with self.assertRaises(ValueError):
+            pyramid.update(self.bars.iloc[:1])
+
+    def test_view_picks_level_that_fits(self):
+        pyramid = BarPyramid(self.bars)
+        start, end = self.bars.index[100], self.bars.index[400]
+        self.assertEqual(pyramid.view(start, end, max_points=500).attrs['level'], '1d')
+        self.assertEqual(pyramid.view(start, end, max_points=100).attrs['level'], '1wk')
+        self.assertEqual(pyramid.view(max_points=100).attrs['level'], '1mo')
+
+        data = pyramid.view(start, end, max_points=500)
+        pd.testing.assert_index_equal(data.index, self.bars.index[100:400], check_names=False)
+        self.assertEqual(len(pyramid.view(start, end, max_points=500, pad=1)), 302)
+
+    def test_summary_matches_gui_formula(self):
+        pyramid = BarPyramid(self.bars)
+        start, end = self.bars.index[250], self.bars.index[900]
+        window = self.bars[(self.bars.index >= start) & (self.bars.index < end)]
+        info = pyramid.summary(start, end)
+        self.assertAlmostEqual(info['current_price'], window['Close'].iloc[-1])
+        self.assertAlmostEqual(info['change_percent'],
+                               (window['Close'].iloc[-1] - window['Close'].iloc[0]) / window['Close'].iloc[0] * 100)
+        self.assertAlmostEqual(info['average_volume'], window['Volume'].mean(), places=4)
+        self.assertIsNone(pyramid.summary('1990-01-01', '1990-02-01'))
+
+    def test_intraday_levels(self):
+        bars = SyntheticSource().fetch('AAA', '2024-01-01', '2024-02-01', '5m')
+        pyramid = BarPyramid(bars, interval='5m')
+        self.assert_level(pyramid, '1h', resampled(bars, 'h'))
+        self.assert_level(pyramid, '1d', resampled(bars, 'D'))
+
+    def test_cache_only_fetches_new_days(self):
+        source = CountingSource(generate_bars(600, start='2020-01-01'))
+        with tempfile.TemporaryDirectory() as root:
+            cache = PyramidCache(BarStore(root, source))
+            pyramid = cache.get('AAA', '2020-01-01', '2021-06-01')
+            calls = len(source.calls)
+            # Narrower ranges inside what is covered do not touch the store
+            self.assertIs(cache.get('AAA', '2020-06-01', '2021-01-01'), pyramid)
+            self.assertEqual(len(source.calls), calls)
+            # A later end tops the same pyramid up
+            self.assertIs(cache.get('AAA', '2020-01-01', '2022-01-01'), pyramid)
+            self.assertEqual(pyramid.last_date, source.bars.index[source.bars.index < '2022-01-01'][-1])
+
+    def test_cache_retries_empty_and_future_ranges(self):
+        source = CountingSource(generate_bars(600, start='2020-01-01'))
+        fetch = source.fetch
+        failures = [True]
+
+        def flaky(symbol, start, end):
+            if failures:
+                failures.pop()
+                return source.bars.iloc[:0]
+            return fetch(symbol, start, end)
+
+        source.fetch = flaky
+        with tempfile.TemporaryDirectory() as root:
+            store = BarStore(root, source, clock=lambda: pd.Timestamp('2022-04-20'))
+            cache = PyramidCache(store)
+            self.assertIsNone(cache.get('AAA', '2020-01-01', '2021-01-01').summary())
+            # The failed download is not remembered
+            self.assertIsNotNone(cache.get('AAA', '2020-01-01', '2021-01-01').summary())
+
+            # An end past the last bar leaves the later days to be asked for again
+            pyramid = cache.get('AAA', '2020-01-01', '2030-01-01')
+            self.assertEqual(pyramid.last_date, source.bars.index[-1])
+            source.bars = generate_bars(620, start='2020-01-01')
+            store.clock = lambda: pd.Timestamp('2022-05-20')
+            self.assertEqual(cache.get('AAA', '2020-01-01', '2030-01-01').last_date, source.bars.index[-1])
+
+    def test_cache_downloads_symbols_in_parallel(self):
+        source = CountingSource(generate_bars(300, start='2020-01-01'))
+        fetch, release = source.fetch, threading.Event()
+
+        def slow(symbol, start, end):
+            if symbol == 'SLOW':
+                release.wait(10)
+            return fetch(symbol, start, end)
+
+        source.fetch = slow
+        with tempfile.TemporaryDirectory() as root:
+            cache = PyramidCache(BarStore(root, source))
+            waiting = threading.Thread(target=cache.get, args=('SLOW', '2020-01-01', '2021-01-01'))
+            waiting.start()
+            try:
+                # Not held up by the download in progress for SLOW
+                self.assertGreater(len(cache.get('FAST', '2020-01-01', '2021-01-01')), 0)
+                self.assertTrue(waiting.is_alive())
+            finally:
+                release.set()
+                waiting.join()
+
+    def test_chart_zoom_reads_pyramid(self):
+        pyramid = BarPyramid(generate_bars(5_000, seed=1))
+        chart = PriceChart(canvas_factory=FigureCanvasAgg)
+        chart.show_history(pyramid.view(max_points=chart._target_points()), pyramid)
+        self.assertLessEqual(len(chart.lines['price'].get_xdata()), chart._target_points())
+
+        # Zooming to a few months switches to the daily bars of that range
+        dates = pyramid.view(level='1d').index
+        chart.ax.set_xlim(matplotlib.dates.date2num(dates[[1000, 1100]]))
+        x = chart.series['price'][0]
+        self.assertEqual(len(x), 102)
+        self.assertEqual(x[1], matplotlib.dates.date2num(dates[1000]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for the array based regression helpers
+"""
+import unittest
+import numpy as np
+
+from sklearn.linear_model import LinearRegression
+
+from regression import train_models_batch, design_matrix, OnlineLinearModel
+from prediction import train_model, predict_future_prices
+from forecast import FEATURE_COLUMNS
+from test_forecast import make_features
+
+
+def noisy_features(seed, periods=400):
+    # Independent noise on high/low so the design matrix has full rank
+    features = make_features(seed, periods)
+    rng = np.random.default_rng(seed + 100)
+    features['high'] = features['price'] * (1 + rng.uniform(0, 0.02, len(features)))
+    features['low'] = features['price'] * (1 - rng.uniform(0, 0.02, len(features)))
+    return features
+
+
+class TestBatchTraining(unittest.TestCase):
+    def setUp(self):
+        # Different lengths to exercise the padding
+        self.features = [noisy_features(seed, 300 + 50 * seed) for seed in range(4)]
+
+    def check_against_sklearn(self, method):
+        coef, intercept, scores, names = train_models_batch(self.features, method=method)
+
+        self.assertEqual(coef.shape, (4, 9))
+        for i, features in enumerate(self.features):
+            model, score, columns = train_model(features)
+            self.assertEqual(list(columns), names)
+            np.testing.assert_allclose(coef[i], model.coef_, rtol=1e-6, atol=1e-12)
+            self.assertAlmostEqual(intercept[i], model.intercept_, places=5)
+            self.assertAlmostEqual(scores[i], score, places=8)
+
+    def test_lstsq_matches_train_model(self):
+        self.check_against_sklearn('lstsq')
+
+    def test_normal_equations_match_train_model(self):
+        self.check_against_sklearn('normal')
+
+
+class TestOnlineLinearModel(unittest.TestCase):
+    def setUp(self):
+        self.features = noisy_features(7, 400)
+        self.X, self.y = design_matrix(self.features)
+
+    def assert_same_fit(self, online, X, y):
+        reference = LinearRegression().fit(X, y)
+        np.testing.assert_allclose(online.coef_, reference.coef_, rtol=1e-5, atol=1e-12)
+        self.assertAlmostEqual(online.intercept_, reference.intercept_, places=4)
+
+    def test_expanding_window(self):
+        online = OnlineLinearModel.from_features(self.features.iloc[:200])
+        self.assert_same_fit(online, self.X[:199], self.y[:199])
+
+        # Feed the remaining bars one at a time
+        for end in range(201, len(self.features) + 1):
+            online.observe(self.features.iloc[:end])
+        self.assertEqual(online.n, len(self.y))
+        self.assert_same_fit(online, self.X, self.y)
+
+    def test_blocks_merge_like_rows(self):
+        online = OnlineLinearModel()
+        for start in range(0, len(self.y), 150):
+            online.partial_fit(self.X[start:start + 150], self.y[start:start + 150])
+        self.assertEqual(online.n, len(self.y))
+        self.assert_same_fit(online, self.X, self.y)
+
+    def test_sliding_window(self):
+        online = OnlineLinearModel(window=120).partial_fit(self.X, self.y)
+        self.assertEqual(online.n, 120)
+        self.assert_same_fit(online, self.X[-120:], self.y[-120:])
+
+    def test_forecast_uses_online_coefficients(self):
+        online = OnlineLinearModel.from_features(self.features)
+        reference = LinearRegression().fit(self.X, self.y)
+
+        np.testing.assert_allclose(predict_future_prices(online, self.features, FEATURE_COLUMNS, 10),
+                                   predict_future_prices(reference, self.features, FEATURE_COLUMNS, 10), rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+Tests for the local prediction service (synthetic data, no network)
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bar_store import BarStore
+from model_registry import ModelRegistry
+from server import PredictionService, start_server, fetch, load_test
+from synthetic import SyntheticSource
+
+
+class SlowService(PredictionService):
+    """Counts computations and holds each one until released"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+        self.release = threading.Event()
+
+    def _forecast(self, symbol, days, history, mode):
+        self.calls.append(symbol)
+        self.release.wait(5)
+        if symbol == 'FAIL':
+            raise ValueError(f"No data found for {symbol}")
+        return {'symbol': symbol, 'predictions': [1.0] * days}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPredictionService(unittest.TestCase):
+    def test_identical_requests_are_coalesced(self):
+        service = SlowService()
+
+        async def scenario():
+            requests = [asyncio.ensure_future(service.predict('aapl', 5)) for _ in range(20)]
+            other = asyncio.ensure_future(service.predict('AAPL', 10))
+            await asyncio.sleep(0.05)
+            service.release.set()
+            return await asyncio.gather(*requests), await other
+
+        results, other = asyncio.run(scenario())
+        service.close()
+        self.assertEqual(service.calls, ['AAPL', 'AAPL'])
+        self.assertEqual(service.stats['coalesced'], 19)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(len(other['predictions']), 10)
+
+    def test_results_expire_after_ttl(self):
+        clock = FakeClock()
+        service = SlowService(ttl=60, clock=clock)
+        service.release.set()
+
+        async def scenario():
+            await service.predict('AAPL')
+            clock.now = 59
+            await service.predict('AAPL')
+            clock.now = 61
+            await service.predict('AAPL')
+
+        asyncio.run(scenario())
+        service.close()
+        self.assertEqual(len(service.calls), 2)
+        self.assertEqual(service.stats['hits'], 1)
+
+    def test_failures_are_not_cached(self):
+        service = SlowService()
+        service.release.set()
+
+        async def scenario():
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    await service.predict('FAIL')
+
+        asyncio.run(scenario())
+        service.close()
+        self.assertEqual(service.calls, ['FAIL', 'FAIL'])
+
+    def test_event_loop_stays_responsive(self):
+        service = SlowService()
+
+        async def scenario():
+            server = await start_server(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                slow = asyncio.ensure_future(fetch('127.0.0.1', port, '/predict?symbol=AAPL'))
+                await asyncio.sleep(0.05)
+                start = time.perf_counter()
+                status, health = await fetch('127.0.0.1', port, '/health')
+                waited = time.perf_counter() - start
+                service.release.set()
+                return (status, health, waited), await slow
+
+        (status, health, waited), (slow_status, body) = asyncio.run(scenario())
+        service.close()
+        self.assertEqual((status, health['inflight']), (200, 1))
+        self.assertLess(waited, 1.0)
+        self.assertEqual((slow_status, body['symbol']), (200, 'AAPL'))
+
+
+class TestHttp(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        store = BarStore(os.path.join(self.tmp.name, 'bars'), SyntheticSource())
+        self.service = PredictionService(store, ModelRegistry(os.path.join(self.tmp.name, 'models')), workers=2)
+
+    def tearDown(self):
+        self.service.close()
+        self.tmp.cleanup()
+
+    def test_endpoints(self):
+        async def scenario():
+            server = await start_server(self.service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return [await fetch('127.0.0.1', port, target) for target in
+                        ['/predict?symbol=msft&days=5', '/predict?days=5', '/predict?symbol=MSFT&mode=sideways',
+                         '/nowhere', '/predict?symbol=../../x', '/predict?symbol=a%2Fb', '/predict?symbol=..',
+                         '/predict?symbol=BRK.B&days=5', '/health']]
+
+        (status, body), missing, bad_mode, not_found, traversal, slash, dots, dotted, (_, health) = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertEqual(body['symbol'], 'MSFT')
+        self.assertEqual(len(body['predictions']), 5)
+        self.assertEqual(len(body['upper']), 5)
+        self.assertEqual(missing[0], 400)
+        self.assertEqual(bad_mode[0], 400)
+        self.assertEqual(not_found[0], 404)
+        self.assertEqual(traversal[0], 400)
+        self.assertEqual(slash[0], 400)
+        self.assertEqual(dots[0], 400)
+        self.assertEqual(dotted[0], 200)
+        self.assertEqual(health['computed'], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'x')))
+
+    def test_bad_content_length(self):
+        async def scenario():
+            server = await start_server(self.service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(b"GET /health HTTP/1.1\r\nContent-Length: lots\r\n\r\n")
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                return response
+
+        response = asyncio.run(scenario())
+        self.assertTrue(response.startswith(b"HTTP/1.1 400 "))
+        self.assertIn(b"Connection: close", response)
+
+    def test_load_test_offline(self):
+        report = asyncio.run(load_test(self.service, ['AAA', 'BBB'], n_requests=60, concurrency=10, days=5))
+        self.assertEqual(report['ok'], 60)
+        self.assertEqual(report['computed'], 2)
+        self.assertEqual(report['hits'] + report['coalesced'], 58)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for the Monte Carlo confidence bands
+"""
+import unittest
+import numpy as np
+
+from forecast import forecast_linear
+from prediction import train_model, _predict_recursive
+from simulation import holdout_residuals, simulate_paths, percentile_bands, confidence_band
+from test_forecast import make_features
+
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        self.features = make_features(0)
+        self.model, _, names = train_model(self.features)
+        self.names = list(names)
+        self.last_row = self.features[self.names].to_numpy(dtype=float)[-1]
+        self.last_price = self.features['price'].iloc[-1]
+
+    def test_holdout_residuals_match_model(self):
+        residuals = holdout_residuals(self.model, self.features, self.names)
+        X = self.features[self.names].iloc[:-1]
+        y = self.features['price'].to_numpy()[1:]
+        split = int(len(X) * 0.8)
+        expected = y[split:] - self.model.predict(X.iloc[split:])
+        np.testing.assert_allclose(residuals, expected, atol=1e-9)
+
+    def test_zero_shocks_give_the_point_forecast(self):
+        paths = simulate_paths(self.model.coef_, self.model.intercept_, self.last_row, self.last_price,
+                               [0.0], days=40, n_paths=3, feature_names=self.names)
+        expected = _predict_recursive(self.model, self.features, self.names, 40)
+        for path in paths:
+            np.testing.assert_allclose(path, expected, rtol=1e-12)
+
+    def test_shocks_feed_the_next_day(self):
+        shocks = np.zeros((1, 10))
+        shocks[0, 0] = 5.0
+        base = forecast_linear(self.model.coef_, self.model.intercept_, self.last_row[None], self.last_price,
+                               10, self.names)
+        moved = forecast_linear(self.model.coef_, self.model.intercept_, self.last_row[None], self.last_price,
+                                10, self.names, shocks=shocks)
+        self.assertAlmostEqual(moved[0, 0] - base[0, 0], 5.0)
+        # Day 2 sees the shocked day 1 through price_change and the averages
+        self.assertNotAlmostEqual(moved[0, 1], base[0, 1])
+
+    def test_band_widens_with_horizon_and_contains_forecast(self):
+        lower, upper = confidence_band(self.model, self.features, self.names, days=60, n_paths=4_000, seed=1)
+        predictions = np.array(_predict_recursive(self.model, self.features, self.names, 60))
+        width = upper - lower
+
+        self.assertEqual(lower.shape, (60,))
+        self.assertTrue(np.all(width > 0))
+        self.assertGreater(width[-1], width[0])
+        self.assertTrue(np.all((predictions > lower) & (predictions < upper)))
+
+    def test_seeded_runs_repeat(self):
+        a = confidence_band(self.model, self.features, self.names, days=20, n_paths=500, seed=7)
+        b = confidence_band(self.model, self.features, self.names, days=20, n_paths=500, seed=7)
+        np.testing.assert_array_equal(a, b)
+
+    def test_normal_method_and_percentiles(self):
+        residuals = holdout_residuals(self.model, self.features, self.names)
+        paths = simulate_paths(self.model.coef_, self.model.intercept_, self.last_row, self.last_price,
+                               residuals, days=5, n_paths=20_000, method='normal', seed=3,
+                               feature_names=self.names)
+        low, mid, high = percentile_bands(paths, (5, 50, 95))
+        # One day ahead the spread is just the residual noise: 90% of a normal is +-1.645 sigma
+        self.assertAlmostEqual((high[0] - low[0]) / (2 * 1.645 * residuals.std(ddof=1)), 1.0, delta=0.05)
+        self.assertTrue(np.all(low < mid) and np.all(mid < high))
+
+        with self.assertRaises(ValueError):
+            simulate_paths(self.model.coef_, self.model.intercept_, self.last_row, self.last_price,
+                           residuals, method='laplace')
+
+
+if __name__ == '__main__':
+    unittest.main()
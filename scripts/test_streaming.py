@@ -0,0 +1,59 @@
+"""
+Tests that the streaming features match prepare_features exactly
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from prediction import prepare_features
+from streaming import StreamingFeatureEngine, FEATURE_ROW
+from test_bar_store import make_bars
+
+
+def stream_all(engine, symbol, data):
+    rows, index = [], []
+    for timestamp, bar in data.iterrows():
+        row = engine.update(symbol, timestamp, bar['High'], bar['Low'], bar['Close'], bar['Volume'])
+        if row is not None:
+            rows.append(row)
+            index.append(timestamp)
+    return pd.DataFrame(rows, index=index, columns=FEATURE_ROW)
+
+
+class TestStreamingFeatures(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.data = make_bars(periods=500)
+        self.data['Close'] = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, 500)))
+        self.data['High'] = self.data['Close'] * 1.01
+        self.data['Low'] = self.data['Close'] * 0.99
+        self.data['Volume'] = rng.integers(1_000_000, 50_000_000, 500)
+
+    def assert_matches_batch(self, data):
+        expected = prepare_features(data)
+        streamed = stream_all(StreamingFeatureEngine(), 'TEST', data)
+
+        self.assertEqual(list(streamed.index), list(expected.index))
+        for column in FEATURE_ROW:
+            np.testing.assert_array_equal(streamed[column].to_numpy(dtype=float),
+                                          expected[column].to_numpy(dtype=float), err_msg=column)
+
+    def test_matches_prepare_features_exactly(self):
+        self.assert_matches_batch(self.data)
+
+    def test_flat_prices_and_zero_volume(self):
+        data = self.data.copy()
+        data.iloc[100:130, data.columns.get_loc('Close')] = 42.0
+        data.iloc[200:203, data.columns.get_loc('Volume')] = 0
+        self.assert_matches_batch(data)
+
+    def test_warm_up_returns_latest_row(self):
+        engine = StreamingFeatureEngine()
+        row = engine.warm_up('TEST', self.data)
+        expected = prepare_features(self.data).iloc[-1]
+        for column in FEATURE_ROW:
+            self.assertEqual(float(row[column]), float(expected[column]))
+
+
+if __name__ == '__main__':
+    unittest.main()
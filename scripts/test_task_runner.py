@@ -0,0 +1,90 @@
+"""
+Tests for the GUI background task runner, using a fake Tk window
+"""
+import threading
+import time
+import unittest
+
+from task_runner import TaskRunner
+
+
+class FakeWindow:
+    """Stands in for tk.Tk: after() callbacks are run by pump()"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+    def pump(self, timeout=5):
+        deadline = time.time() + timeout
+        while self.callbacks and time.time() < deadline:
+            callbacks, self.callbacks = self.callbacks, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.01)
+
+
+class TestTaskRunner(unittest.TestCase):
+    def setUp(self):
+        self.window = FakeWindow()
+        self.runner = TaskRunner(self.window, max_workers=4)
+        self.delivered = []
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_result_is_delivered_through_after(self):
+        self.runner.submit('chart', lambda x: x * 2, 21, on_done=self.delivered.append)
+        self.assertEqual(self.delivered, [])
+
+        self.window.pump()
+        self.assertEqual(self.delivered, [42])
+        self.assertFalse(self.runner.busy())
+
+    def test_superseded_result_is_dropped(self):
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return 'old'
+
+        self.runner.submit('chart', slow, on_done=self.delivered.append)
+        self.runner.submit('chart', lambda: 'new', on_done=self.delivered.append)
+        self.window.pump(timeout=0.5)
+        release.set()
+        self.window.pump()
+
+        self.assertEqual(self.delivered, ['new'])
+
+    def test_different_keys_run_together(self):
+        both_running = threading.Barrier(2, timeout=5)
+
+        def work(name):
+            both_running.wait()
+            return name
+
+        self.runner.submit('chart', work, 'chart', on_done=self.delivered.append)
+        self.runner.submit('prediction', work, 'prediction', on_done=self.delivered.append)
+        self.window.pump()
+
+        self.assertEqual(sorted(self.delivered), ['chart', 'prediction'])
+
+    def test_cancel_and_errors(self):
+        errors = []
+        release = threading.Event()
+        self.runner.submit('chart', release.wait, 5, on_done=self.delivered.append)
+        self.runner.submit('prediction', lambda: 1 / 0, on_error=errors.append)
+        self.assertEqual(len(self.runner.pending_labels()), 2)
+
+        self.runner.cancel('chart')
+        release.set()
+        self.window.pump()
+
+        self.assertEqual(self.delivered, [])
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+
+
+if __name__ == '__main__':
+    unittest.main()
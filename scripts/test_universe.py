@@ -0,0 +1,74 @@
+"""
+Tests for the multi-symbol process pool runner (offline, local CSV bars)
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, LocalFileSource
+from prediction import get_stock_data, prepare_features, train_model, predict_future_prices
+import universe
+from universe import analyze_universe
+
+
+def write_recent_bars(directory, symbol, seed, periods=300):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=datetime.now(), periods=periods, name='Date')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+    bars = pd.DataFrame({
+        'Close': close,
+        'High': close * (1 + rng.uniform(0, 0.02, periods)),
+        'Low': close * (1 - rng.uniform(0, 0.02, periods)),
+        'Open': close,
+        'Volume': rng.integers(1_000_000, 10_000_000, periods),
+    }, index=index)
+    bars.to_csv(os.path.join(directory, f"{symbol}.csv"))
+
+
+class TestAnalyzeUniverse(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        csv_dir = os.path.join(self.tmp.name, 'csv')
+        os.makedirs(csv_dir)
+        self.symbols = ['AAA', 'BBB', 'CCC']
+        for seed, symbol in enumerate(self.symbols):
+            write_recent_bars(csv_dir, symbol, seed)
+        self.store = BarStore(os.path.join(self.tmp.name, 'store'), LocalFileSource(csv_dir))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_results_stream_back_and_failures_are_reported(self):
+        results = list(analyze_universe(self.symbols + ['MISSING'], prediction_days=10,
+                                        max_workers=2, store=self.store))
+
+        by_symbol = {result['symbol']: result for result in results}
+        self.assertEqual(set(by_symbol), set(self.symbols + ['MISSING']))
+        self.assertIn('error', by_symbol['MISSING'])
+
+        for symbol in self.symbols:
+            features = prepare_features(get_stock_data(symbol, 365, self.store))
+            model, accuracy, names = train_model(features)
+            expected = predict_future_prices(model, features, names, 10)
+
+            result = by_symbol[symbol]
+            np.testing.assert_allclose(result['predictions'], expected, rtol=1e-9)
+            self.assertAlmostEqual(result['accuracy'], accuracy, places=9)
+            self.assertEqual(len(result['dates']), 10)
+
+
+    def test_short_history_fails_in_the_worker(self):
+        write_recent_bars(os.path.join(self.tmp.name, 'csv'), 'TINY', 9, periods=30)
+        result, = analyze_universe(['TINY'], max_workers=1, store=self.store)
+        self.assertIn('feature rows', result['error'])
+
+    def test_workers_are_not_forked(self):
+        # Forking next to running fetch threads can copy a held lock into the child
+        self.assertIn(universe._mp_context().get_start_method(), ('forkserver', 'spawn'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Run analyze_stock style predictions over many symbols using every core
+
+Bars are fetched on a thread pool (downloads wait on the network, not
+the CPU), the raw OHLCV arrays are handed to worker processes through
+shared memory, and the workers compute the features, fit and forecast, so
+everything CPU-bound runs outside the parent's GIL. Results are yielded as
+each symbol finishes. A symbol that fails produces an {'symbol', 'error'}
+result instead of stopping the batch.
+"""
+import multiprocessing
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from bar_store import COLUMNS
+from forecast import forecast_linear
+from prediction import get_stock_data, prepare_features
+from streaming import FEATURE_ROW
+
+MIN_ROWS = 30
+
+
+def _mp_context():
+    # Workers start while the fetch threads hold locks (imports, logging, the
+    # bar store); a forked child could inherit one held and hang on it
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _load_bars(symbol, days, store):
+    # Runs on a fetch thread: only the download and packing the arrays
+    data = get_stock_data(symbol, days, store)
+    if len(data) == 0:
+        raise ValueError(f"No data found for {symbol}")
+
+    # OHLCV columns plus the dates as epoch seconds (exact in float64)
+    matrix = np.empty((len(data), len(COLUMNS) + 1))
+    matrix[:, :-1] = data[COLUMNS].to_numpy(dtype=np.float64)
+    matrix[:, -1] = data.index.values.astype('datetime64[s]').astype(np.int64)
+    return matrix, data.index[-1], float(data['Close'].iloc[-1])
+
+
+def _to_shared(matrix):
+    shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+    np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[:] = matrix
+    return shm
+
+
+def _fit_matrix(matrix, prediction_days):
+    from sklearn.linear_model import LinearRegression
+
+    # Same rows and 80/20 split as train_model
+    X = matrix[:-1, 1:]
+    y = matrix[1:, 0]
+    split_point = int(len(X) * 0.8)
+    model = LinearRegression()
+    model.fit(X[:split_point], y[:split_point])
+    accuracy = model.score(X[split_point:], y[split_point:])
+
+    predictions = forecast_linear(model.coef_, model.intercept_, matrix[-1, 1:],
+                                  matrix[-1, 0], prediction_days, FEATURE_ROW[1:])
+    return predictions.tolist(), accuracy
+
+
+def _features_matrix(bars):
+    data = pd.DataFrame(bars[:, :-1], columns=COLUMNS,
+                        index=pd.DatetimeIndex(bars[:, -1].astype('datetime64[s]'), name='Date'))
+    features = prepare_features(data)
+    if len(features) < MIN_ROWS:
+        raise ValueError(f"Only {len(features)} feature rows")
+    return features[FEATURE_ROW].to_numpy(dtype=np.float64)
+
+
+def _fit_and_forecast(shm_name, shape, prediction_days):
+    # Runs in a worker process; the bars are read straight from shared memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        matrix = _features_matrix(np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+    finally:
+        shm.close()
+    return _fit_matrix(matrix, prediction_days)
+
+
+def analyze_universe(symbols, prediction_days=30, days=365, max_workers=None,
+                     fetch_workers=8, store=None):
+    """Yield a result dict per symbol, in completion order"""
+    segments = {}
+    pending = {}
+
+    with ThreadPoolExecutor(fetch_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers, mp_context=_mp_context()) as pool:
+        try:
+            for symbol in symbols:
+                future = fetch_pool.submit(_load_bars, symbol, days, store)
+                pending[future] = ('fetch', symbol, None)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, symbol, info = pending.pop(future)
+
+                    if stage == 'fetch':
+                        try:
+                            matrix, last_date, current_price = future.result()
+                        except Exception as e:
+                            yield {'symbol': symbol, 'error': str(e)}
+                            continue
+
+                        shm = _to_shared(matrix)
+                        job = pool.submit(_fit_and_forecast, shm.name, matrix.shape, prediction_days)
+                        segments[job] = shm
+                        pending[job] = ('fit', symbol, (last_date, current_price))
+                        continue
+
+                    shm = segments.pop(future)
+                    shm.close()
+                    shm.unlink()
+
+                    try:
+                        predictions, accuracy = future.result()
+                    except Exception as e:
+                        yield {'symbol': symbol, 'error': str(e)}
+                        continue
+
+                    last_date, current_price = info
+                    predicted_price = predictions[-1]
+                    yield {
+                        'symbol': symbol,
+                        'current_price': current_price,
+                        'predicted_price': predicted_price,
+                        'change_percent': ((predicted_price - current_price) / current_price) * 100,
+                        'predictions': predictions,
+                        'accuracy': accuracy,
+                        'dates': pd.date_range(start=last_date + timedelta(days=1),
+                                               periods=prediction_days, freq='B'),
+                    }
+        finally:
+            # Generator closed early: drop anything still queued
+            for future in pending:
+                future.cancel()
+            for shm in segments.values():
+                shm.close()
+                shm.unlink()
+
+
+if __name__ == "__main__":
+    symbols = sys.argv[1:] or ['AAPL', 'MSFT', 'GOOGL']
+    for result in analyze_universe(symbols):
+        if 'error' in result:
+            print(f"{result['symbol']}: failed - {result['error']}")
+        else:
+            print(f"{result['symbol']}: ${result['current_price']:.2f} -> "
+                  f"${result['predicted_price']:.2f} ({result['change_percent']:+.1f}%)")